@@ -8,10 +8,103 @@ class Settings:
     dvf_api_url: str = ""
     file_cleanup_minutes: int = 5
     max_file_size_mb: int = 10
+    # uploads are read by chunks, kept in memory up to upload_spool_memory_mb then spooled to disk
+    upload_chunk_size_kb: int = 64
+    upload_spool_memory_mb: int = 2
+    # admission control of /api/analyze-lease: analyses and upload bytes in flight, then a bounded queue
+    admission_max_active_analyses: int = 4
+    admission_max_inflight_upload_mb: int = 40
+    admission_max_queue: int = 16
+    admission_queue_timeout_seconds: float = 10.0
+    admission_retry_after_seconds: int = 5
+
+    # document extraction process pool (0 workers: extraction in a thread)
+    extraction_workers: int = int(os.getenv("EXTRACTION_WORKERS", "2"))
+    extraction_max_queue: int = 8
+    extraction_timeout_seconds: float = 30.0
+    extraction_documents_per_worker: int = 50
+    # long PDFs are split in page ranges extracted in parallel
+    pdf_min_pages_per_shard: int = 10
+    # streamed PDFs are cut in more ranges than workers: the first pages come early, closing the stream skips the rest
+    pdf_stream_ranges_per_worker: int = 4
+    pdf_slow_page_seconds: float = 1.0
 
     legifrance_client_id: str = os.getenv("LEGIFRANCE_CLIENT_ID")
     legifrance_client_secret: str = os.getenv("LEGIFRANCE_CLIENT_SECRET")
+    legifrance_token_refresh_margin_seconds: float = 300.0
+    legifrance_token_default_ttl_seconds: float = 3600.0
+    # local store of the Code de commerce articles
+    legal_article_store_path: str = "cache/legal_articles.json"
+    legal_article_ttl_seconds: float = 7 * 24 * 3600
     openai_model : str = "gpt-4.1-mini"
+    # characters of the lease read by each analysis stage (None: whole document),
+    # the text extraction stops once every stage has enough (long annexes are not read)
+    analysis_text_chars: dict = {
+        "basic_extraction": 400000,
+        "legal_compliance": 400000,
+        "enrichment": 4000
+    }
+    # leases split in sections, each prompt receives its best BM25 sections within a token budget
+    lease_segmentation_cache_max_entries: int = 64
+    lease_context_top_k: int = 6
+    lease_context_tokens: dict = {
+        "indexation": 750,
+        "deadlines": 1000,
+        "clauses": 1000,
+        "basic_data": 2000
+    }
+    # map-reduce on long leases: when the relevant sections exceed the budget of a prompt, they are
+    # split in chunks of that budget, extracted concurrently and the results merged
+    # shorter leases (about 50 pages) get the best BM25 sections within one prompt
+    map_reduce_enabled: bool = True
+    map_reduce_min_chars: int = 150000
+    map_reduce_concurrency: int = 4
+    map_reduce_max_chunks: int = 12
+    # indexation indices detected by regex, the LLM only checks the clauses that may rule out an obsolete index
+    indexation_fast_path_enabled: bool = True
+    # surface, rent, address and city read by patterns first, the LLM only asked for the missing fields
+    basic_data_heuristics_enabled: bool = True
+    # critical deadlines computed from the lease start date and duration, the LLM only reads those dates
+    deadline_engine_enabled: bool = True
+
+    # shared async LLM gateway
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_timeout_seconds: float = 60.0
+
+    # LLM response cache: in-memory LRU + optional disk tier (None disables it)
+    llm_cache_enabled: bool = True
+    llm_cache_max_entries: int = 512
+    llm_cache_dir: str = os.getenv("LLM_CACHE_DIR")
+    llm_cache_max_disk_mb: int = 100
+
+    # complete analysis cache, keyed by document hash, market data version and model
+    analysis_cache_max_entries: int = 256
+    analysis_cache_ttl_seconds: float = 24 * 3600
+
+    # app-lifetime HTTP client pool (LegiFrance, Google Sheets)
+    http_max_connections: int = 50
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http_timeout_seconds: float = 15.0
+
+    # per-check timeouts of the compliance analysis (seconds)
+    compliance_check_timeouts: dict = {
+        "indexation": 30.0,
+        "deadlines": 30.0,
+        "clauses": 60.0
+    }
+
+    # parallel clause verification
+    clause_verification_concurrency: int = 4
+    clause_verification_timeout_seconds: float = 20.0
+    clause_verification_budget_seconds: float = 50.0
+    # the verifications end this long before the timeout of the clauses check, their verdicts are kept
+    clause_verification_deadline_margin_seconds: float = 1.0
+    # "batch" verifies several clauses per LLM request, "per_clause" one request per clause
+    clause_verification_mode: str = "batch"
+    clause_batch_token_budget: int = 3000
+    clause_batch_max_size: int = 8
 
     carte_loyers_api: str = "https://www.data.gouv.fr/api/1/datasets/"
     sheet_id: str = "1EMbc_r7HHA6PoUG2f9SZV7nlAZ3oFhxjum69mr3xkpw"
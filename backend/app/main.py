@@ -1,10 +1,19 @@
+import asyncio
 import logging
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
 from app.services.document_parser import DocumentParser
+from app.services.extraction_pool import ExtractionPoolBusyError
 from app.services.leaseboost_service import LeaseBoostService
+from app.services.text_normalizer import LeaseTextNormalizer
 from app.utils.file_cleanup import FileCleanupService
+from app.utils.http_client import http_client_registry
+from app.utils.single_flight import SingleFlight
+from app.utils.upload_reader import read_upload, UploadFormatError, UploadTooLargeError
+from app.utils.admission_controller import AdmissionController, AdmissionRejectedError
+from app.services.llm_response_cache import llm_cache_bypass
+from app.services.analysis_result_cache import AnalysisResultCache
 from app.config import Settings
 from pathlib import Path
 from datetime import datetime
@@ -71,8 +80,16 @@ app.add_middleware(
 file_cleanup_service = FileCleanupService(logger=app_logger)
 
 leaseboost_service = LeaseBoostService(openai_api_key=Settings.openai_api_key, legifrance_client_id=Settings.legifrance_client_id,
-                                        legifrance_client_secret=Settings.legifrance_client_secret, logger=app_logger)
+                                        legifrance_client_secret=Settings.legifrance_client_secret, logger=app_logger,
+                                        http_client_registry=http_client_registry)
 document_parser = DocumentParser(logger=app_logger)
+analysis_result_cache = AnalysisResultCache(logger=app_logger)
+# identical uploads analysed at the same time share a single pipeline run
+analysis_single_flight = SingleFlight(logger=app_logger)
+# below this, the upload is considered unreadable (scanned document, empty file)
+MIN_LEASE_TEXT_CHARS = 200
+# bounds the analyses and upload bytes in flight, sized with the admission metrics
+admission_controller = AdmissionController(logger=app_logger)
 
 
 
@@ -80,11 +97,20 @@ document_parser = DocumentParser(logger=app_logger)
 @app.on_event("startup")
 async def startup_event():
     #file_cleanup_service.start_cleanup_scheduler() # in memory for now
+    await http_client_registry.start()
+    # articles are fetched in background, requests never wait on LegiFrance in steady state
+    app.state.legal_article_warmup = asyncio.create_task(
+        leaseboost_service.legal_compliance_service.warm_legal_article_store()
+    )
     app_logger.info("LeaseBoost Service started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     #file_cleanup_service.stop_cleanup_scheduler() # in memory for now
+    app.state.legal_article_warmup.cancel()
+    await leaseboost_service.llm_gateway.aclose()
+    await http_client_registry.close()
+    document_parser.extraction_pool.shutdown()
     app_logger.info("LeaseBoost Service stopped")
 
 @app.get("/")
@@ -102,7 +128,8 @@ async def root():
 @app.post("/api/analyze-lease", response_model=LeaseAnalysisResponse)
 async def analyze_lease(
     background_tasks: BackgroundTasks,
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    bypass_cache: bool = Query(False, description="Re-run every LLM prompt instead of using cached answers")
 ):
     # 1. file validation
     app_logger.info(f"New file upload: {file.filename}")
@@ -112,27 +139,113 @@ async def analyze_lease(
     ]:
         raise HTTPException(status_code=400, detail="Invalid file format")
 
-    file_content = await file.read()
+    # the multipart body is already spooled by Starlette, its size is reserved until the analysis ends
+    upload_bytes = file.size if file.size is not None else Settings.max_file_size_mb * 1024 * 1024
+    try:
+        async with admission_controller.admit(upload_bytes):
+            return await _analyze_upload(file, background_tasks, bypass_cache)
+    except AdmissionRejectedError as e:
+        app_logger.warning(f"Analysis rejected for file {file.filename}: {e}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry in a few seconds",
+                            headers={"Retry-After": str(e.retry_after)})
 
-    if len(file_content) > Settings.max_file_size_mb * 1024 * 1024:
-        raise HTTPException(status_code=400, 
-                            detail="File size limit exceeded. Maximun is {Settings.max_file_size_mb}MB")
+async def _analyze_upload(file: UploadFile, background_tasks: BackgroundTasks, bypass_cache: bool) -> LeaseAnalysisResponse:
+    # the upload is read by chunks and rejected as soon as it is over the limit
+    try:
+        upload = await read_upload(file, logger=app_logger)
+    except UploadTooLargeError:
+        raise HTTPException(status_code=400,
+                            detail=f"File size limit exceeded. Maximun is {Settings.max_file_size_mb}MB")
+    except UploadFormatError:
+        raise HTTPException(status_code=400, detail="Invalid file format")
 
-    # 2. file processing
-    app_logger.info(f"Processing file: {file.filename}")
-    extracted_text = await document_parser.extract_text_from_file(file_content, file.filename)
+    # the upload belongs to this request until it starts the shared analysis, which then closes it
+    upload_handed_over = False
+    try:
+        # 2. previous analysis of the same document, with the same market data and model
+        document_hash = analysis_result_cache.hash_document(upload.view())
+        market_data_version = leaseboost_service.get_market_data_version()
 
-    if not extracted_text or len(extracted_text.strip()) < 200:
-        raise HTTPException(status_code=400, detail="Invalid file content : text too short, check that your file contains readable text")
+        if not bypass_cache and market_data_version is not None:
+            cached_analysis = analysis_result_cache.get(
+                analysis_result_cache.make_key(document_hash, market_data_version, Settings.openai_model)
+            )
+            if cached_analysis is not None:
+                app_logger.info(f"Analysis served from cache for file: {file.filename}")
+                return cached_analysis
 
-    # 3. analysis
-    app_logger.info(f"Starting analysis for file: {file.filename}")
-    try:
-        analysis_results = await leaseboost_service.analyze_lease(extracted_text, background_tasks)
+        async def run_analysis() -> LeaseAnalysisResponse:
+            # 3. file processing, the text is streamed to the analysis stages as pages are extracted
+            # and normalized (hyphenation, page headers and footers, whitespace) to spare prompt tokens
+            app_logger.info(f"Processing file: {file.filename}")
+            text_normalizer = LeaseTextNormalizer(logger=app_logger)
+            text_stream = leaseboost_service.open_text_stream(text_normalizer.normalize_chunks(
+                document_parser.stream_text_chunks(upload.view(), file.filename, upload.file_format)
+            ))
+            text_stream.require("validation", MIN_LEASE_TEXT_CHARS)
+            try:
+                try:
+                    lease_start = await text_stream.text("validation")
+                except ExtractionPoolBusyError as e:
+                    app_logger.warning(f"Extraction rejected for file {file.filename}: {e}")
+                    raise HTTPException(status_code=503, detail="Server busy, please retry in a few seconds",
+                                        headers={"Retry-After": str(Settings.admission_retry_after_seconds)})
+
+                if len(lease_start.strip()) < MIN_LEASE_TEXT_CHARS:
+                    raise HTTPException(status_code=400, detail="Invalid file content : text too short, check that your file contains readable text")
 
-        return analysis_results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f" Error during analysis:{str(e)}")
+                # 4. analysis
+                app_logger.info(f"Starting analysis for file: {file.filename}")
+                try:
+                    analysis_results = await leaseboost_service.analyze_lease(text_stream, background_tasks)
+
+                    # the analysis may have refreshed the market data, store it under the version it used,
+                    # a partial analysis is not served again for the day
+                    market_data_version = leaseboost_service.get_market_data_version()
+                    if analysis_results.degraded_stages:
+                        app_logger.warning(f"Partial analysis not cached for file {file.filename}: "
+                                           f"{', '.join(analysis_results.degraded_stages)}")
+                    elif market_data_version is not None:
+                        analysis_result_cache.set(
+                            analysis_result_cache.make_key(document_hash, market_data_version, Settings.openai_model),
+                            analysis_results
+                        )
+
+                    return analysis_results
+                except Exception as e:
+                    raise HTTPException(status_code=500, detail=f" Error during analysis:{str(e)}")
+            finally:
+                # the upload is not needed once the stages have their text
+                await text_stream.close()
+                upload.close()
+
+        def start_analysis():
+            # called only when this request starts the analysis, callers joining it keep their own upload
+            nonlocal upload_handed_over
+            upload_handed_over = True
+            return run_analysis()
+
+        # a retry or double submit of the same document joins the running analysis,
+        # cancelling the request that started it does not release the upload under the shared task
+        llm_cache_bypass.set(bypass_cache)
+        return await analysis_single_flight.run(document_hash, start_analysis)
+    finally:
+        if not upload_handed_over:
+            upload.close()
+
+@app.get("/api/metrics")
+async def metrics():
+    response_cache = leaseboost_service.llm_gateway.response_cache
+    return {
+        "llm_cache": response_cache.stats() if response_cache else None,
+        "analysis_cache": analysis_result_cache.stats(),
+        "analysis_single_flight": analysis_single_flight.stats(),
+        "analysis_stages": leaseboost_service.get_stage_timing_stats(),
+        "indexation_fast_path": leaseboost_service.legal_compliance_service.indexation_detector.stats(),
+        "admission": admission_controller.stats(),
+        "extraction_pool": document_parser.extraction_pool.stats(),
+        "slow_pdf_pages": list(document_parser.slow_pages)
+    }
 
 @app.get("/api/health")
 async def health_check():
@@ -19,6 +19,8 @@ class MarketPosition(BaseModel):
     confidence_level: str
     comparable_count: int
     comparables: List[MarketComparable]
+    # position not computed or computed on simulated comparables
+    is_fallback: bool = False
 
 class LegalAlert(BaseModel):
     severity: str # 'HIGH', 'MEDIUM', 'LOW'
@@ -68,5 +70,14 @@ class LeaseAnalysisResponse(BaseModel):
     # summary
     executive_summary: str
     analysis_confidence: str
+    # stages that failed or answered with fallback data, such an analysis is not cached
+    degraded_stages: List[str] = []
 
 
+
+class LeaseSection(BaseModel):
+    index: int
+    number: Optional[str] = None # article number as written, None for the preamble
+    title: str
+    text: str
+    start: int # offset of the section in the lease text
@@ -0,0 +1,63 @@
+import hashlib
+import time
+import logging
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple, Union
+from app.models.schemas import LeaseAnalysisResponse
+from app.config import Settings
+
+
+class AnalysisResultCache:
+    """
+    In-memory LRU of complete lease analyses.
+    Keys combine the SHA-256 of the uploaded bytes, the market data version, the model name
+    and the current day (deadlines are expressed in days remaining).
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.max_entries = max_entries if max_entries is not None else Settings.analysis_cache_max_entries
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Settings.analysis_cache_ttl_seconds
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._entries: "OrderedDict[str, Tuple[float, LeaseAnalysisResponse]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def hash_document(file_content: Union[bytes, memoryview]) -> str:
+        return hashlib.sha256(file_content).hexdigest()
+
+    @staticmethod
+    def make_key(document_hash: str, market_data_version: int, model: str) -> str:
+        return f"{document_hash}:{market_data_version}:{model}:{date.today().isoformat()}"
+
+    def get(self, key: str) -> Optional[LeaseAnalysisResponse]:
+
+        entry = self._entries.get(key)
+
+        if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, analysis: LeaseAnalysisResponse):
+
+        self._entries[key] = (time.monotonic(), analysis)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries)
+        }
@@ -0,0 +1,166 @@
+import calendar
+import logging
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from app.models.schemas import CriticalDeadline
+from app.services.lease_segmenter import SECTION_HEADING
+from app.utils.data.legal_framework import LEGAL_FRAMEWORK
+from app.utils.french_parser import SENTENCE_END, find_dates, find_durations
+
+DATE_FORMAT = "%d/%m/%Y"
+# days remaining -> urgency
+URGENCY_THRESHOLDS = ((90, "HIGH"), (365, "MEDIUM"))
+
+# "à compter du 1er janvier 2024", "prendra effet le 01/01/2024", "qui commenceront à courir le 1er janvier 2024"
+START_DATE_CUE = re.compile(
+    r"à\s+compter\s+du|à\s+partir\s+du|prend(?:ra)?\s+effet|prise\s+d['’]effet|date\s+d['’]effet|"
+    r"commencer(?:a|ont)\s+à\s+courir|entrée\s+en\s+jouissance",
+    re.IGNORECASE
+)
+# "consenti pour une durée de neuf années"
+DURATION_CUE = re.compile(r"durée|consenti|conclu", re.IGNORECASE)
+# headings of the articles stating the start of the lease: "ARTICLE 3 - DURÉE", "Article 2 - Prise d'effet"
+DURATION_HEADING = re.compile(
+    r"dur[ée]e|prise\s+d['’]effet|date\s+d['’]effet|entr[ée]e\s+en\s+jouissance", re.IGNORECASE
+)
+# a start date follows its cue closely
+START_DATE_CUE_CHARS = 100
+# shorter durations are notice periods, not the duration of the lease
+MIN_LEASE_DURATION_MONTHS = 12
+
+
+def add_months(day: date, months: int) -> date:
+    """
+    same day `months` later, the last day of the month when it doesn't exist (29/02 + 12 months -> 28/02)
+    """
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def find_lease_anchors(text: str) -> Tuple[Optional[date], Optional[int]]:
+    """
+    (start date, duration in months) read in the lease text, None when not stated unambiguously nearby their cue
+    the start date is only read in the duration articles and the sentences stating the duration of the lease,
+    a date "à compter du" in the preamble or the rent clause is not the start of the lease
+    """
+
+    # articles whose heading is about the duration
+    headings = list(SECTION_HEADING.finditer(text))
+    spans = [(heading.start(), headings[index + 1].start() if index + 1 < len(headings) else len(text))
+             for index, heading in enumerate(headings) if DURATION_HEADING.search(heading.group(0))]
+
+    # sentences stating the duration of the lease
+    duration_months = None
+    sentence_start = 0
+    for boundary in [*SENTENCE_END.finditer(text), None]:
+        sentence_end = boundary.start() if boundary else len(text)
+        cue = DURATION_CUE.search(text, sentence_start, sentence_end)
+        if cue:
+            durations = [duration for duration in find_durations(text, cue.end(), sentence_end)
+                         if duration.months >= MIN_LEASE_DURATION_MONTHS]
+            if durations:
+                if duration_months is None:
+                    duration_months = durations[0].months
+                spans.append((sentence_start, sentence_end))
+        sentence_start = boundary.end() if boundary else len(text)
+
+    start_dates = set()
+    for span_start, span_end in spans:
+        for cue in START_DATE_CUE.finditer(text, span_start, span_end):
+            dates = find_dates(text, cue.end(), min(span_end, cue.end() + START_DATE_CUE_CHARS))
+            if dates:
+                start_dates.add(dates[0].value)
+
+    # start dates that disagree are left to the LLM
+    start_date = start_dates.pop() if len(start_dates) == 1 else None
+
+    return start_date, duration_months
+
+
+class DeadlineEngine:
+    """
+    Critical deadlines of a lease computed from its start date and duration with the rules of
+    LEGAL_FRAMEWORK["revision_rules"]: notice of the triennial revisions, prescription of a revision
+    not requested, renewal notice before the end of the lease. Only upcoming deadlines are returned.
+    """
+
+    # a commercial lease lasts at least 9 years (Art. L145-4 Code de commerce)
+    DEFAULT_DURATION_MONTHS = 9 * 12
+
+    def __init__(self, revision_rules: Optional[Dict] = None, logger: Optional[logging.Logger] = None):
+        revision_rules = revision_rules or LEGAL_FRAMEWORK["revision_rules"]
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.triennal_revision = revision_rules["triennal_revision"]
+        self.renouvellement = revision_rules["renouvellement"]
+        # "3 ans" -> 36 months
+        self.revision_period_months = int(self.triennal_revision["frequency"].split()[0]) * 12
+
+    def deadlines(self, start_date: date, duration_months: int, today: Optional[date] = None) -> List[CriticalDeadline]:
+
+        today = today or date.today()
+        end_date = add_months(start_date, duration_months)
+
+        deadlines = []
+        revision_notice_days = self.triennal_revision["notice_period_days"]
+        prescription_months = self.triennal_revision["prescription_years"] * 12
+
+        # every triennial anniversary during the lease
+        revision_months = self.revision_period_months
+        while revision_months < duration_months:
+            revision_date = add_months(start_date, revision_months)
+            # the request is notified before the anniversary, the deadline is the last day to notify it
+            revision_notice_date = revision_date - timedelta(days=revision_notice_days)
+
+            if revision_notice_date > today:
+                deadlines.append(self._deadline(
+                    "Révision triennale", revision_notice_date, today,
+                    f"Notifier la demande de révision {revision_notice_days} jours avant l'échéance du "
+                    f"{revision_date.strftime(DATE_FORMAT)} ({self.triennal_revision['legal_ref']})"
+                ))
+            else:
+                # a revision not notified in time can still be claimed until its prescription
+                prescription_date = add_months(revision_date, prescription_months)
+                if prescription_date > today:
+                    deadlines.append(self._deadline(
+                        "Prescription révision triennale", prescription_date, today,
+                        f"Demander la révision due au {revision_date.strftime(DATE_FORMAT)} avant sa prescription "
+                        f"({self.triennal_revision['legal_ref']})"
+                    ))
+
+            revision_months += self.revision_period_months
+
+        renewal_notice_months = self.renouvellement["notice_period_months"]
+        renewal_notice_date = add_months(end_date, -renewal_notice_months)
+        if renewal_notice_date > today:
+            deadlines.append(self._deadline(
+                "Congé / demande de renouvellement", renewal_notice_date, today,
+                f"Délivrer congé ou demander le renouvellement {renewal_notice_months} mois avant la fin du bail "
+                f"({self.renouvellement['legal_ref']})"
+            ))
+        if end_date > today:
+            deadlines.append(self._deadline(
+                "Échéance du bail", end_date, today,
+                f"Fin du bail, tacite prolongation à défaut de congé ou de renouvellement ({self.renouvellement['legal_ref']})"
+            ))
+        else:
+            self.logger.info(f"Lease ended on {end_date.strftime(DATE_FORMAT)}, no upcoming deadline")
+
+        return sorted(deadlines, key=lambda deadline: deadline.days_remaining)
+
+    @staticmethod
+    def _deadline(deadline_type: str, deadline_date: date, today: date, action: str) -> CriticalDeadline:
+
+        days_remaining = (deadline_date - today).days
+        urgency = next((urgency for days, urgency in URGENCY_THRESHOLDS if days_remaining <= days), "LOW")
+
+        return CriticalDeadline(
+            type=deadline_type,
+            date=deadline_date.strftime(DATE_FORMAT),
+            days_remaining=days_remaining,
+            urgency=urgency,
+            action_required=f"Action requise pour : {action}",
+            potential_loss=f"Impact estimé: {days_remaining * 50}€/ jour si non traité"
+        )
@@ -1,32 +1,186 @@
 import pypdf
-import docx2txt
 import io
-import os
-import tempfile
+import re
+import zipfile
 import logging
-from typing import Optional
+import xml.etree.ElementTree as ET
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from pathlib import Path
+from app.services.extraction_pool import ExtractionDocument, ExtractionPool, ExtractionPoolBusyError
+from app.config import Settings
+
+# (level, message) records produced by an extraction, logged by the parent process
+LogRecords = List[Tuple[int, str]]
+# an upload is handed over as a zero-copy memoryview, bytes in the worker processes
+DocumentContent = Union[bytes, memoryview]
+
+
+def count_pdf_pages(file_content: DocumentContent) -> Tuple[Optional[int], LogRecords]:
+    """
+    number of pages of a PDF, None if it can't be read
+    """
+
+    try:
+        return len(pypdf.PdfReader(io.BytesIO(file_content)).pages), []
+    except Exception as e:
+        return None, [(logging.ERROR, f"Error extracting text from PDF: {str(e)}")]
+
+
+def extract_pdf_page_range(file_content: DocumentContent, first_page: int = 0,
+                           last_page: Optional[int] = None) -> Tuple[List[Tuple[int, Optional[str], float]], LogRecords]:
+    """
+    extract the pages [first_page, last_page) of a PDF, runs in an extraction worker process
+    returns (page number, text, extraction seconds) for each page, an error on a page only loses that page
+    """
+
+    log_records = []
+    pages = []
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(file_content))
+        last_page = len(reader.pages) if last_page is None else min(last_page, len(reader.pages))
+
+        for page_num in range(first_page, last_page):
+            start = time.perf_counter()
+            try:
+                page_text = reader.pages[page_num].extract_text()
+            except Exception as e:
+                page_text = None
+                log_records.append((logging.ERROR, f"Error page {page_num}: {str(e)}"))
+            pages.append((page_num, page_text, time.perf_counter() - start))
+
+    except Exception as e:
+        log_records.append((logging.ERROR, f"Error extracting text from PDF: {str(e)}"))
+
+    return pages, log_records
+
+
+def join_pdf_pages(pages: List[Tuple[int, Optional[str], float]]) -> Optional[str]:
+    """
+    reassemble the pages text in page order, empty pages are skipped
+    """
+    extracted_text = [page_text.strip() for _, page_text, _ in sorted(pages, key=lambda page: page[0])
+                      if page_text and page_text.strip()]
+
+    return "\n".join(extracted_text) if extracted_text else None
+
+
+def extract_pdf_text(file_content: DocumentContent) -> Tuple[Optional[str], LogRecords]:
+    """
+    extract the text of a PDF, runs in an extraction worker process
+    """
+
+    page_count, log_records = count_pdf_pages(file_content)
+
+    if page_count is None:
+        return None, log_records
+
+    if page_count == 0:
+        log_records.append((logging.WARNING, "PDF file is empty"))
+        return None, log_records
+
+    pages, page_log_records = extract_pdf_page_range(file_content)
+    log_records.extend(page_log_records)
+
+    text = join_pdf_pages(pages)
+    if text is None:
+        log_records.append((logging.WARNING, "No text extracted from PDF"))
+
+    return text, log_records
+
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_HEADER_PART = re.compile(r"word/header[0-9]*\.xml")
+DOCX_FOOTER_PART = re.compile(r"word/footer[0-9]*\.xml")
+
+
+def docx_part_text(xml_stream) -> str:
+    """
+    text of a WordprocessingML part, parsed incrementally so the whole XML tree is never built
+    same rendering as docx2txt: runs text, tabs, line breaks and a blank line before each paragraph
+    """
+
+    chunks = []
+    for event, element in ET.iterparse(xml_stream, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == WORD_NAMESPACE + "p":
+                chunks.append("\n\n")
+            elif tag == WORD_NAMESPACE + "tab":
+                chunks.append("\t")
+            elif tag in (WORD_NAMESPACE + "br", WORD_NAMESPACE + "cr"):
+                chunks.append("\n")
+        else:
+            if tag == WORD_NAMESPACE + "t" and element.text:
+                chunks.append(element.text)
+            # every descendant is already processed, free it
+            element.clear()
+
+    return "".join(chunks)
+
+
+def extract_docx_text(file_content: DocumentContent) -> Tuple[Optional[str], LogRecords]:
+    """
+    extract the text of a DOCX, runs in an extraction worker process
+    the zip container is read from memory, nothing is written to disk
+    """
+
+    log_records = []
+    try:
+        with zipfile.ZipFile(io.BytesIO(file_content)) as docx_zip:
+            part_names = docx_zip.namelist()
+            # headers, body then footers, in the docx2txt order
+            parts = [name for name in part_names if DOCX_HEADER_PART.match(name)]
+            parts.append("word/document.xml")
+            parts.extend(name for name in part_names if DOCX_FOOTER_PART.match(name))
+
+            texts = []
+            for part in parts:
+                with docx_zip.open(part) as xml_stream:
+                    texts.append(docx_part_text(xml_stream))
+
+        text = "".join(texts).strip()
+
+        if not text:
+            log_records.append((logging.WARNING, "No text extracted from DOCX"))
+
+        return text, log_records
+
+    except Exception as e:
+        log_records.append((logging.ERROR, f"Error extracting text from DOCX: {str(e)}"))
+        return None, log_records
 
 
 class DocumentParser:
 
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, extraction_pool: Optional[ExtractionPool] = None):
         self.logger = logger or logging.getLogger(__name__)
+        self.extraction_pool = extraction_pool or ExtractionPool(logger=self.logger)
+        # most recent pages slower than Settings.pdf_slow_page_seconds, to find pathological documents
+        self.slow_pages = deque(maxlen=50)
 
 
-    async def extract_text_from_file(self, file_content: bytes, filename: str) -> Optional[str]:
+    async def extract_text_from_file(self, file_content: DocumentContent, filename: str,
+                                     file_format: Optional[str] = None) -> Optional[str]:
+        """
+        extract the text in the extraction pool, None if the document can't be read
+        the format sniffed from the content, when known, wins over the filename extension
+        raise ExtractionPoolBusyError when too many documents are already waiting
+        """
 
         self.logger.info(f"Extracting text from file {filename}")
         if not self._validate_inputs(file_content, filename):
             return None
-        
 
-        file_ext = Path(filename).suffix.lower().lstrip('.')
+
+        file_ext = file_format or Path(filename).suffix.lower().lstrip('.')
 
         extractors = {
-            'pdf': self._extract_from_pdf,
-            'docx': self._extract_from_docx,
-            'doc': self._extract_from_docx
+            'pdf': extract_pdf_text,
+            'docx': extract_docx_text,
+            'doc': extract_docx_text
         }
 
         extractor = extractors.get(file_ext)
@@ -34,76 +188,193 @@ class DocumentParser:
         if not extractor:
             self.logger.error(f"Format {file_ext} not supported")
             return None
-        
+
         try:
-            return extractor(file_content)
+            with self.extraction_pool.document() as document:
+                if extractor is extract_pdf_text and self.extraction_pool.max_workers > 1:
+                    return await self._extract_pdf_sharded(file_content, filename, document)
+
+                text, log_records = await self.extraction_pool.run(extractor, file_content, document=document)
+                self._log_records(log_records)
+                return text
+        except ExtractionPoolBusyError:
+            raise
+        except asyncio.TimeoutError:
+            self.logger.error(f"Timeout extracting text from file {filename}")
+            return None
         except Exception as e:
             self.logger.error(f"Error extracting text from file {filename}: {str(e)}")
             return None
-    
-    def _validate_inputs(self, file_content: bytes, filename:str) -> bool:
+
+    async def stream_text_chunks(self, file_content: DocumentContent, filename: str,
+                                 file_format: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        yield the text of the document chunk by chunk, in document order: non empty pages of a PDF,
+        the whole text of a DOCX (its in-memory extraction is a single fast pass)
+        the page ranges of the workers are extracted ahead, closing the generator cancels the remaining ones
+        raise ExtractionPoolBusyError when too many documents are already waiting
+        """
+
+        self.logger.info(f"Streaming text from file {filename}")
+        if not self._validate_inputs(file_content, filename):
+            return
+
+        file_ext = file_format or Path(filename).suffix.lower().lstrip('.')
+
+        if file_ext not in ('pdf', 'docx', 'doc'):
+            self.logger.error(f"Format {file_ext} not supported")
+            return
+
+        with self.extraction_pool.document() as document:
+            try:
+                if file_ext != 'pdf':
+                    text, log_records = await self.extraction_pool.run(extract_docx_text, file_content, document=document)
+                else:
+                    page_count, log_records = await self.extraction_pool.run(count_pdf_pages, file_content,
+                                                                             document=document)
+            except Exception as e:
+                self.logger.error(f"Error extracting text from file {filename}: {e!r}")
+                return
+
+            self._log_records(log_records)
+
+            if file_ext != 'pdf':
+                if text:
+                    yield text
+                return
+
+            if not page_count:
+                return
+
+            # a few page ranges per worker: each range is a copy of the document sent to a worker and parsed there
+            page_ranges = deque(self._page_shards(page_count, Settings.pdf_stream_ranges_per_worker))
+            pending = deque()
+
+            def submit_next_range():
+                first_page, last_page = page_ranges.popleft()
+                task = asyncio.ensure_future(self.extraction_pool.run(extract_pdf_page_range, file_content,
+                                                                      first_page, last_page, document=document))
+                pending.append((first_page, last_page, task))
+
+            try:
+                # one range ahead per worker
+                while page_ranges and len(pending) < max(self.extraction_pool.max_workers, 1):
+                    submit_next_range()
+
+                while pending:
+                    first_page, last_page, task = pending.popleft()
+                    try:
+                        pages, log_records = await task
+                    except Exception as e:
+                        self.logger.error(f"Error extracting pages {first_page}-{last_page - 1} of {filename}: {e!r}")
+                        pages, log_records = [], []
+
+                    if page_ranges:
+                        submit_next_range()
+
+                    self._log_records(log_records)
+                    self._record_slow_pages(filename, pages)
+
+                    for _, page_text, _ in pages:
+                        if page_text and page_text.strip():
+                            yield page_text.strip()
+            finally:
+                for _, _, task in pending:
+                    task.cancel()
+
+    async def _extract_pdf_sharded(self, file_content: DocumentContent, filename: str,
+                                   document: ExtractionDocument) -> Optional[str]:
+        """
+        split the pages of a long PDF in ranges extracted by several workers
+        """
+
+        page_count, log_records = await self.extraction_pool.run(count_pdf_pages, file_content, document=document)
+        self._log_records(log_records)
+
+        if page_count is None:
+            return None
+
+        if page_count == 0:
+            self.logger.warning("PDF file is empty")
+            return None
+
+        shards = self._page_shards(page_count)
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *[self.extraction_pool.run(extract_pdf_page_range, file_content, first_page, last_page, document=document)
+              for first_page, last_page in shards],
+            return_exceptions=True
+        )
+
+        pages = []
+        for (first_page, last_page), outcome in zip(shards, outcomes):
+            if isinstance(outcome, ExtractionPoolBusyError):
+                raise outcome
+            if isinstance(outcome, BaseException):
+                # like a page error, the other ranges are kept
+                self.logger.error(f"Error extracting pages {first_page}-{last_page - 1} of {filename}: {outcome!r}")
+                continue
+
+            shard_pages, shard_log_records = outcome
+            self._log_records(shard_log_records)
+            pages.extend(shard_pages)
+
+        self._report_page_timings(filename, pages, len(shards), time.perf_counter() - start)
+
+        text = join_pdf_pages(pages)
+        if text is None:
+            self.logger.warning("No text extracted from PDF")
+
+        return text
+
+    def _page_shards(self, page_count: int, shards_per_worker: int = 1) -> List[Tuple[int, int]]:
+
+        max_shards = max(self.extraction_pool.max_workers, 1) * shards_per_worker
+        shard_count = max(1, min(max_shards, page_count // Settings.pdf_min_pages_per_shard))
+        shard_size = -(-page_count // shard_count)
+
+        return [(first_page, min(first_page + shard_size, page_count)) for first_page in range(0, page_count, shard_size)]
+
+    def _report_page_timings(self, filename: str, pages: List[Tuple[int, Optional[str], float]],
+                             shard_count: int, duration: float):
+
+        slowest_pages = sorted(pages, key=lambda page: page[2], reverse=True)[:3]
+        self.logger.info(f"PDF {filename}: {len(pages)} pages in {shard_count} shards, {duration:.2f}s, slowest pages: "
+                         + ", ".join(f"p{page_num + 1}={seconds:.2f}s" for page_num, _, seconds in slowest_pages))
+
+        self._record_slow_pages(filename, pages)
+
+    def _record_slow_pages(self, filename: str, pages: List[Tuple[int, Optional[str], float]]):
+
+        for page_num, _, seconds in pages:
+            if seconds >= Settings.pdf_slow_page_seconds:
+                self.logger.warning(f"Slow PDF page: {filename} page {page_num + 1} took {seconds:.2f}s")
+                self.slow_pages.append({"filename": filename, "page": page_num + 1, "seconds": round(seconds, 3)})
+
+    def _validate_inputs(self, file_content: DocumentContent, filename:str) -> bool:
         if not file_content:
             self.logger.error("File content is empty")
             return False
-        
+
         if not filename or not Path(filename).suffix:
             self.logger.error(f"Filename {filename} is not valid")
             return False
-        
+
         return True
-    
-    def _extract_from_pdf(self, file_content: bytes) -> Optional[str]:
 
-        try:
-            pdf_file = io.BytesIO(file_content)
-            reader = pypdf.PdfReader(pdf_file)
-
-            if len(reader.pages) == 0:
-                self.logger.warning("PDF file is empty")
-                return None
-            
-            extracted_text = []
-
-            for page_num, page in enumerate(reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text and page_text.strip():
-                        extracted_text.append(page_text.strip())
-                except Exception as e:
-                    self.logger.error(f"Error page {page_num}: {str(e)}")
-            
-            if not extracted_text:
-                self.logger.warning("No text extracted from PDF")
-                return None
-            
-            return "\n".join(extracted_text)
-        
-        except Exception as e:
-            self.logger.error(f"Error extracting text from PDF: {str(e)}")
-            return None
-    
-    def _extract_from_docx(self, file_content: bytes) -> Optional[str]:
+    def _log_records(self, log_records: LogRecords):
+        for level, message in log_records:
+            self.logger.log(level, message)
 
-        tmp_path = None
-        try:
-            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp_file:
-                tmp_file.write(file_content)
-                tmp_path = tmp_file.name
+    def _extract_from_pdf(self, file_content: bytes) -> Optional[str]:
 
-            text = docx2txt.process(tmp_path)
+        text, log_records = extract_pdf_text(file_content)
+        self._log_records(log_records)
+        return text
 
-            if not text or not text.strip():
-                self.logger.warning("No text extracted from DOCX")
+    def _extract_from_docx(self, file_content: bytes) -> Optional[str]:
 
-            return text.strip() 
-        
-        except Exception as e:
-            print(f"Error extracting text from DOCX: {str(e)}")
-            return None
-        
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except Exception as e:
-                    self.logger.warning
\ No newline at end of file
+        text, log_records = extract_docx_text(file_content)
+        self._log_records(log_records)
+        return text
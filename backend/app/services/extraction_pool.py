@@ -0,0 +1,215 @@
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Set
+from app.config import Settings
+
+
+class ExtractionPoolBusyError(Exception):
+    """ raised when the extraction queue is full """
+
+
+class ExtractionWorker:
+    """
+    one worker process, a single-process pool running one call at a time:
+    a stuck call is killed with its process without touching the calls of the other workers
+    """
+
+    def __init__(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=1,
+            # a fresh interpreter per worker, nothing inherited from the web server process
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self.documents = 0
+        self.retired = False
+
+    def retire(self, terminate: bool = False):
+
+        self.retired = True
+        if terminate:
+            # ProcessPoolExecutor has no public API to kill a busy worker
+            for process in list((self.executor._processes or {}).values()):
+                process.terminate()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ExtractionDocument:
+    """
+    one document extracted in several calls (page count, page ranges): admitted once,
+    one timeout for all its calls, counted once towards the recycling of each worker it uses
+    """
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+        self.workers: Set[ExtractionWorker] = set()
+        self.timed_out = False
+
+
+class ExtractionPool:
+    """
+    Process pool running the CPU bound document extraction off the event loop.
+    Admission is bounded (workers + queue depth) and each document has a timeout, whatever the number
+    of calls it is extracted in. A call runs alone in its worker, the worker of a call over the timeout
+    is killed and replaced, the documents running in the other workers go on.
+    Workers are recycled after a number of documents to contain pypdf memory growth.
+    With 0 workers, extraction runs in a thread instead (development, tests).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None,
+                 timeout_seconds: Optional[float] = None, documents_per_worker: Optional[int] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.max_workers = max_workers if max_workers is not None else Settings.extraction_workers
+        self.max_queue = max_queue if max_queue is not None else Settings.extraction_max_queue
+        self.timeout_seconds = timeout_seconds if timeout_seconds is not None else Settings.extraction_timeout_seconds
+        self.documents_per_worker = documents_per_worker if documents_per_worker is not None else Settings.extraction_documents_per_worker
+        self.logger = logger or logging.getLogger(__name__)
+
+        # idle workers, None for a worker not started yet
+        self._idle_workers: Deque[Optional[ExtractionWorker]] = deque([None] * self.max_workers)
+        self._busy_workers: Set[ExtractionWorker] = set()
+        self._worker_released: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self.recycled = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    @contextlib.contextmanager
+    def document(self) -> Iterator[ExtractionDocument]:
+        """
+        admit a document extracted in one or several calls of run,
+        raise ExtractionPoolBusyError when the queue is full
+        """
+
+        if self._in_flight >= max(self.max_workers, 1) + self.max_queue:
+            self.rejected += 1
+            raise ExtractionPoolBusyError(f"Extraction queue full ({self._in_flight} documents in flight)")
+
+        self._in_flight += 1
+        try:
+            yield ExtractionDocument(asyncio.get_running_loop().time() + self.timeout_seconds)
+        finally:
+            self._in_flight -= 1
+
+    async def run(self, func: Callable, *args, document: Optional[ExtractionDocument] = None) -> Any:
+        """
+        run func(*args) in a worker process for a document admitted with document(), a document of its own
+        when not given, raise ExtractionPoolBusyError when the queue is full and asyncio.TimeoutError
+        when the document takes too long
+        """
+
+        if document is None:
+            with self.document() as document:
+                return await self.run(func, *args, document=document)
+
+        loop = asyncio.get_running_loop()
+        worker = None
+        call = None
+        try:
+            timeout = document.deadline - loop.time()
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+
+            if self.max_workers == 0:
+                return await asyncio.wait_for(asyncio.to_thread(func, *args), timeout=timeout)
+
+            worker = await asyncio.wait_for(self._acquire_worker(document), timeout=timeout)
+            # a memoryview can't be pickled, the copy to the worker process is made here
+            args = tuple(bytes(arg) if isinstance(arg, memoryview) else arg for arg in args)
+            call = worker.executor.submit(func, *args)
+            # the worker is idle again once its call is over, even when nobody waits for the result anymore
+            call.add_done_callback(lambda _: self._call_soon(loop, self._release_worker, worker))
+
+            return await asyncio.wait_for(asyncio.wrap_future(call), timeout=document.deadline - loop.time())
+        except asyncio.TimeoutError:
+            if not document.timed_out:
+                document.timed_out = True
+                self.timeouts += 1
+            if call is not None and not call.done():
+                # the stuck worker would keep its CPU and memory, it is replaced
+                self._replace_worker(worker, terminate=True)
+            raise
+        except BrokenProcessPool:
+            if worker is not None:
+                self._replace_worker(worker, terminate=True)
+            raise
+
+    def shutdown(self):
+        for worker in [*self._idle_workers, *self._busy_workers]:
+            if worker is not None:
+                worker.retire()
+        self._idle_workers = deque([None] * self.max_workers)
+        self._busy_workers = set()
+        self._worker_released = None
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "max_in_flight": max(self.max_workers, 1) + self.max_queue,
+            "recycled": self.recycled,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected
+        }
+
+    async def _acquire_worker(self, document: ExtractionDocument) -> ExtractionWorker:
+
+        if self._worker_released is None:
+            self._worker_released = asyncio.Semaphore(len(self._idle_workers))
+        await self._worker_released.acquire()
+
+        worker = self._idle_workers.popleft()
+
+        # recycle a worker once it handled its share of documents, before the next document
+        if worker is not None and worker not in document.workers and worker.documents >= self.documents_per_worker:
+            self.recycled += 1
+            self.logger.info("Recycling extraction worker")
+            worker.retire()
+            worker = None
+
+        if worker is None:
+            worker = ExtractionWorker()
+
+        # a document is counted once per worker, whatever the number of its calls
+        if worker not in document.workers:
+            document.workers.add(worker)
+            worker.documents += 1
+
+        self._busy_workers.add(worker)
+        return worker
+
+    def _release_worker(self, worker: ExtractionWorker):
+
+        # a replaced worker gave its place back already
+        if worker.retired or worker not in self._busy_workers:
+            return
+        self._busy_workers.discard(worker)
+        self._idle_workers.append(worker)
+        self._worker_released.release()
+
+    def _replace_worker(self, worker: ExtractionWorker, terminate: bool = False):
+
+        if worker.retired:
+            return
+        self.recycled += 1
+        self.logger.info(f"Replacing extraction worker (terminate={terminate})")
+        worker.retire(terminate=terminate)
+
+        # a fresh worker is started by the next call
+        if worker in self._busy_workers:
+            self._busy_workers.discard(worker)
+            self._idle_workers.append(None)
+            self._worker_released.release()
+
+    @staticmethod
+    def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable, *args):
+        # done callbacks of the calls run in the thread of the process pool
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # the event loop is closed, the pool is going away
+            pass
@@ -0,0 +1,125 @@
+import re
+import logging
+from typing import Dict, List, Optional
+from app.utils.data.legal_framework import LEGAL_FRAMEWORK
+
+# accented letters of the index names, also matched without their accent ("Cout", "Activites")
+ACCENT_VARIANTS = {"é": "[eé]", "è": "[eè]", "ê": "[eê]", "à": "[aà]", "â": "[aâ]",
+                   "î": "[iî]", "ô": "[oô]", "û": "[uû]", "ç": "[cç]"}
+
+# a sentence quoting an obsolete index while ruling it out or replacing it:
+# "l'ICC n'est plus applicable", "en remplacement de l'indice ICC", "à l'exclusion de l'ICT"
+NEGATION = re.compile(
+    r"(?<!\w)(?:n['’]|(?:ne|non|aucune?|ni|jamais|sauf|excepté|hormis|exclusion|anciennement|"
+    r"remplac\w*|substitu\w*)(?!\w)|au lieu d)",
+    re.IGNORECASE
+)
+SENTENCE_BOUNDARY = re.compile(r"[.;!?\n]")
+SENTENCE_WINDOW = 400
+# words qualifying an index between "indice" and the rest of its name: "indice national du coût de la construction"
+NAME_QUALIFIER_WORDS = 3
+# the text deals with indexation, an index it names in another way has to be read by the LLM
+INDEXATION_CUE = re.compile(r"(?<!\w)(?:indices?|indexation|index[eé]\w*|[eé]chelle\s+mobile)(?!\w)", re.IGNORECASE)
+
+
+def _acronym_pattern(code: str) -> str:
+    # "ICC", "I.C.C."
+    return r"(?<![\w.])" + r"\.?".join(code) + r"(?!\w)"
+
+
+def _name_pattern(name: str) -> str:
+    # "Indice du Coût de la Construction", "indice du cout de la construction",
+    # "indice trimestriel du coût de la construction", "indice INSEE du coût de la construction"
+    words = ["".join(ACCENT_VARIANTS.get(char, re.escape(char)) for char in word) for word in name.lower().split()]
+    qualifiers = rf"(?:\s+[\w'’]+){{0,{NAME_QUALIFIER_WORDS}}}?"
+    return r"(?i:" + words[0] + qualifiers + r"\s+" + r"\s+".join(words[1:]) + r")"
+
+
+class IndexationDetector:
+    """
+    Regex detection of the indexation indices of LEGAL_FRAMEWORK["indexation_rules"] (acronyms and full names),
+    in one pass over the text. The result has the structure of the LLM answer of
+    LegalComplianceService._detect_indices. It is ambiguous, and the LLM has to decide, when an obsolete
+    index is quoted in a sentence that may rule it out ("n'est plus applicable", "en remplacement de"),
+    or when no index is found in a text dealing with indexation.
+    """
+
+    def __init__(self, indexation_rules: Optional[Dict] = None, logger: Optional[logging.Logger] = None):
+        indexation_rules = indexation_rules or LEGAL_FRAMEWORK["indexation_rules"]
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.valid_indices = list(indexation_rules["valid_indices"])
+        self.deprecated_indices = list(indexation_rules["deprecated_indices"])
+
+        indices = {**indexation_rules["valid_indices"], **indexation_rules["deprecated_indices"]}
+        # the lookahead on the first letters skips most positions without trying every alternative
+        first_letters = sorted({code[0] for code in indices} | {
+            letter for rules in indices.values() for letter in (rules["name"][0].lower(), rules["name"][0].upper())
+        })
+        self.pattern = re.compile(f"(?=[{re.escape(''.join(first_letters))}])(?:" + "|".join(
+            f"(?P<{code}>{_acronym_pattern(code)}|{_name_pattern(rules['name'])})"
+            for code, rules in indices.items()
+        ) + ")")
+
+        self.decided = 0
+        self.escalated = 0
+
+    def detect(self, text: str) -> Dict:
+        """
+        indices found in order of appearance, "ambiguous" is True when the LLM has to confirm
+        """
+
+        indices_found: List[str] = []
+        obsolete_indices: List[str] = []
+        context = ""
+        ambiguous = False
+
+        for match in self.pattern.finditer(text):
+            code = match.lastgroup
+            if code not in indices_found:
+                indices_found.append(code)
+
+            if code in self.deprecated_indices:
+                sentence = self._sentence(text, match.start(), match.end())
+                if NEGATION.search(sentence):
+                    ambiguous = True
+                if code not in obsolete_indices:
+                    obsolete_indices.append(code)
+                if not context:
+                    context = sentence
+
+        if not indices_found and INDEXATION_CUE.search(text):
+            ambiguous = True
+
+        if ambiguous:
+            self.escalated += 1
+        else:
+            self.decided += 1
+
+        return {
+            "indices_found": indices_found,
+            "has_obsolete_indices": bool(obsolete_indices),
+            "obsolete_indices": obsolete_indices,
+            "context": context,
+            "ambiguous": ambiguous
+        }
+
+    def stats(self) -> Dict:
+        total = self.decided + self.escalated
+        return {
+            "decided": self.decided,
+            "escalated": self.escalated,
+            "decided_ratio": round(self.decided / total, 3) if total else 0.0
+        }
+
+    @staticmethod
+    def _sentence(text: str, start: int, end: int) -> str:
+
+        # sentences are searched at most SENTENCE_WINDOW characters around the index
+        sentence_start = max(0, start - SENTENCE_WINDOW)
+        for boundary in SENTENCE_BOUNDARY.finditer(text, sentence_start, start):
+            sentence_start = boundary.end()
+        next_boundary = SENTENCE_BOUNDARY.search(text, end, end + SENTENCE_WINDOW)
+        sentence_end = next_boundary.start() if next_boundary else min(len(text), end + SENTENCE_WINDOW)
+
+        return text[sentence_start:sentence_end].strip()
@@ -0,0 +1,245 @@
+import re
+import logging
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.utils.cities import postalcodeByCity
+from app.utils.french_parser import SENTENCE_END, THOUSANDS_SEPARATOR, find_amounts, parse_french_number
+
+BASIC_FIELDS = ("city", "address", "surface", "annual_rent")
+
+# "85,50 m²", "1 200 m2", "120 mètres carrés"
+SURFACE = re.compile(
+    r"(?<![\d,.])(\d{1,3}(?:" + THOUSANDS_SEPARATOR + r"\d{3})+|\d+)(?:,(\d{1,2}))?\s*(?:m²|m2|mètres?\s+carrés|metres?\s+carres)(?!\w)",
+    re.IGNORECASE
+)
+SURFACE_CUE = re.compile(r"(?:superficie|surface)", re.IGNORECASE)
+TOTAL_CUE = re.compile(r"total", re.IGNORECASE)
+RENT_CUE = re.compile(r"(?<!\w)loyers?(?!\w)", re.IGNORECASE)
+# rent period -> number of periods in a year
+RENT_PERIODS = (
+    (re.compile(r"annuel|par\s+an(?!\w)|/\s*an(?!\w)|l['’]an(?!\w)|annuellement", re.IGNORECASE), 1),
+    (re.compile(r"mensuel|par\s+mois|/\s*mois|mensuellement", re.IGNORECASE), 12),
+    (re.compile(r"trimestriel|par\s+trimestre|/\s*trimestre|trimestriellement", re.IGNORECASE), 4),
+)
+
+STREET = re.compile(
+    r"(?<![\w,.])\d{1,4}(?:\s*(?:bis|ter|quater))?\s*,?\s+(?:rue|avenue|boulevard|bd|place|allée|allee|impasse|quai|"
+    r"chemin|route|cours|square|passage|villa|cité|cite|esplanade|promenade|sentier|voie)(?!\w)[^\n,;]{1,80}?"
+    r"(?=\s*[,;\n]|\s+\d{5}(?!\d)|\s*$)",
+    re.IGNORECASE
+)
+POSTAL_COMMUNE = re.compile(r"(?<!\d)(\d{5})\s+([A-Za-zÀ-ÿ][A-Za-zÀ-ÿ'’\- ]{0,60})")
+# postal code and commune following the street, possibly after a floor or building ("2ème étage, 75001 Paris")
+ADDRESS_TAIL_CHARS = 60
+# a premises address is introduced by "sis", "situés", "locaux"... a party address by "demeurant", "siège"...
+ADDRESS_CUE = re.compile(
+    r"(?P<premises>(?<!\w)(?:sise?s?|situ\w*|locaux|local|immeuble|désign\w*|adresse|lieux loués|biens? loués?)(?!\w))|"
+    r"(?P<party>(?<!\w)(?:demeurant|domicili\w*|siège|RCS|immatricul\w*|née?|notaire|élisant)(?!\w))",
+    re.IGNORECASE
+)
+ADDRESS_CUE_CHARS = 150
+# longest commune name tried after a postal code, in words
+COMMUNE_MAX_WORDS = 6
+
+# snippets sent to the LLM for the fields not found
+FIELD_CUES = {
+    "surface": re.compile(r"superficie|surface|m²|m2(?!\w)|mètres?\s+carrés", re.IGNORECASE),
+    "annual_rent": RENT_CUE,
+    "address": re.compile(r"(?<!\w)(?:sise?s?|situ\w*|adresse|locaux)(?!\w)|(?<!\d)\d{5}(?!\d)", re.IGNORECASE),
+    "city": re.compile(r"(?<!\w)(?:sise?s?|situ\w*|commune|ville)(?!\w)|(?<!\d)\d{5}(?!\d)", re.IGNORECASE),
+}
+SNIPPET_RADIUS = 200
+
+
+def normalize_commune(name: str) -> str:
+    """
+    key of a commune name: "Saint-Rémy-l'Honoré", "ST REMY L'HONORE" -> "saint-remy-l'honore"
+    """
+    name = unicodedata.normalize("NFKD", name.replace("’", "'")).encode("ascii", "ignore").decode()
+    name = re.sub(r"[\s\-]+", "-", name.strip().lower())
+    return re.sub(r"^(st|ste)-", lambda match: "saint-" if match.group(1) == "st" else "sainte-", name)
+
+
+# INSEE table indexed by normalized name, Paris arrondissements by postal code
+COMMUNES = {normalize_commune(commune): commune for commune in postalcodeByCity}
+PARIS_ARRONDISSEMENTS = {postal_code: commune for commune, postal_code in postalcodeByCity.items()
+                         if commune.startswith("paris-")}
+
+
+class LeaseDataExtraction:
+    """ fields found in the lease, the text each one was read from """
+
+    def __init__(self):
+        self.data: Dict = {}
+        self.sources: Dict[str, str] = {}
+
+    def set(self, field: str, value, source: str):
+        self.data[field] = value
+        self.sources[field] = source
+
+    @property
+    def missing_fields(self) -> List[str]:
+        return [field for field in BASIC_FIELDS if field not in self.data]
+
+
+class LeaseDataExtractor:
+    """
+    Deterministic extraction of the basic data of a french lease (surface, annual rent, premises address and city)
+    with compiled patterns. A field is only set when the text is unambiguous, the others are left to the LLM,
+    which receives the snippets of the lease around their cues. Communes are validated against the INSEE table.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+
+    def extract(self, text: str) -> LeaseDataExtraction:
+
+        extraction = LeaseDataExtraction()
+
+        surface = self._surface(text)
+        if surface:
+            extraction.set("surface", *surface)
+
+        annual_rent = self._annual_rent(text)
+        if annual_rent:
+            extraction.set("annual_rent", *annual_rent)
+
+        address, city = self._premises_location(text)
+        if address:
+            extraction.set("address", address, address)
+        if city:
+            extraction.set("city", *city)
+
+        return extraction
+
+    def snippets(self, text: str, fields: Iterable[str], max_chars: int) -> str:
+        """
+        passages of the lease around the cues of the fields, in document order, within max_chars
+        """
+
+        windows = sorted(
+            (max(0, match.start() - SNIPPET_RADIUS), min(len(text), match.end() + SNIPPET_RADIUS))
+            for field in fields for match in FIELD_CUES[field].finditer(text)
+        )
+
+        merged: List[List[int]] = []
+        for start, end in windows:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        snippets = []
+        length = 0
+        for start, end in merged:
+            snippet = text[start:end].strip()
+            if length + len(snippet) > max_chars:
+                break
+            snippets.append(snippet)
+            length += len(snippet)
+
+        return "\n[...]\n".join(snippets)
+
+    def _surface(self, text: str) -> Optional[Tuple[float, str]]:
+
+        # the total surface, else the first surface introduced as such, else the surface when only one is given
+        surfaces = []
+        for match in SURFACE.finditer(text):
+            value = parse_french_number(match.group(1), match.group(2))
+            if value <= 0:
+                continue
+            before = text[max(0, match.start() - 60):match.start()]
+            surfaces.append((value, match.group(0), bool(SURFACE_CUE.search(before)), bool(TOTAL_CUE.search(before))))
+
+        for selected in ([surface for surface in surfaces if surface[3]], [surface for surface in surfaces if surface[2]]):
+            if selected:
+                return selected[0][0], selected[0][1]
+
+        if len({surface[0] for surface in surfaces}) == 1:
+            return surfaces[0][0], surfaces[0][1]
+        return None
+
+    def _annual_rent(self, text: str) -> Optional[Tuple[float, str]]:
+
+        # the first rent stated as annual, else the first one with a period (monthly, quarterly) converted
+        periodic_rent = None
+        for cue in RENT_CUE.finditer(text):
+            sentence_end = SENTENCE_END.search(text, cue.end())
+            sentence_end = sentence_end.start() if sentence_end else len(text)
+
+            amounts = find_amounts(text, cue.end(), sentence_end)
+            if not amounts:
+                continue
+            amount = amounts[0]
+
+            sentence = text[cue.start():sentence_end]
+            # the period qualifying the amount: "loyer mensuel de 4 500 €", "loyer de 4 500 € par mois, soit ..."
+            periods_per_year = (self._rent_period(text, cue.start(), amount.start)
+                                or self._rent_period(text, amount.end, sentence_end))
+            if periods_per_year is None:
+                continue
+
+            rent = amount.value * periods_per_year
+            if periods_per_year == 1:
+                return rent, sentence
+            if periodic_rent is None:
+                periodic_rent = rent, sentence
+
+        return periodic_rent
+
+    @staticmethod
+    def _rent_period(text: str, start: int, end: int) -> Optional[int]:
+        # periods per year of the first period stated in text[start:end]
+        periods = [(match.start(), periods) for pattern, periods in RENT_PERIODS
+                   for match in [pattern.search(text, start, end)] if match]
+        return min(periods)[1] if periods else None
+
+    def _premises_location(self, text: str) -> Tuple[Optional[str], Optional[Tuple[str, str]]]:
+
+        # first street address introduced as the premises, with its postal code and commune when given
+        for street in STREET.finditer(text):
+            if self._address_cue(text, street.start()) != "premises":
+                continue
+
+            address = street.group(0).strip()
+            tail = POSTAL_COMMUNE.search(text, street.end(), street.end() + ADDRESS_TAIL_CHARS)
+            city = self._commune(tail) if tail and "\n\n" not in text[street.end():tail.start()] else None
+            if city:
+                address = f"{address}, {tail.group(1)} {city[1]}"
+            return address, city
+
+        # no premises street address: a postal code and commune introduced as the premises
+        for postal_commune in POSTAL_COMMUNE.finditer(text):
+            if self._address_cue(text, postal_commune.start()) == "premises":
+                city = self._commune(postal_commune)
+                if city:
+                    return None, city
+
+        return None, None
+
+    @staticmethod
+    def _address_cue(text: str, position: int) -> Optional[str]:
+        # the nearest cue before the address tells whose address it is
+        cues = list(ADDRESS_CUE.finditer(text, max(0, position - ADDRESS_CUE_CHARS), position))
+        return cues[-1].lastgroup if cues else None
+
+    @staticmethod
+    def _commune(postal_commune: re.Match) -> Optional[Tuple[str, str]]:
+        """
+        (city, commune as written) for a postal code and commune of the INSEE table, the city is the name
+        of the table ("ST REMY L'HONORE" -> "Saint-remy-l'honore"), Paris with its arrondissement: "Paris-1er-arrondissement"
+        """
+
+        postal_code = postal_commune.group(1)
+        words = postal_commune.group(2).split()
+
+        for word_count in range(min(len(words), COMMUNE_MAX_WORDS), 0, -1):
+            written = " ".join(words[:word_count]).strip("-'’ ")
+            commune = normalize_commune(written)
+
+            if commune == "paris" and postal_code in PARIS_ARRONDISSEMENTS:
+                return PARIS_ARRONDISSEMENTS[postal_code].capitalize(), written
+            if commune in COMMUNES and not commune.startswith("paris-"):
+                return COMMUNES[commune].capitalize(), written
+
+        return None
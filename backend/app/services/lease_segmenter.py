@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.models.schemas import LeaseSection
+from app.services.section_ranker import BM25SectionRanker, estimate_tokens
+from app.config import Settings
+
+# "ARTICLE 3 - DURÉE", "Article premier", "Art. 12 :", "TITRE II", "Chapitre 1", "4. LOYER", "4.2) INDEXATION"
+# the number is followed by a separator, the end of the line or a capitalized title: a sentence
+# such as "Article 5 du présent bail s'applique" or a "1) le preneur" list item is not a heading
+HEADING_END = r"(?=[ \t]*(?:[-–—:.)]|$)|[ \t]+[A-ZÀ-Ý])"
+SECTION_HEADING = re.compile(
+    r"^[ \t]*(?:"
+    r"(?:ARTICLE|Article|Art\.)[ \t]*(?P<article>\d+(?:[.\-]\d+)*|[IVXLC]+|PREMIER|premier|1ER|1er)\b" + HEADING_END +
+    r"|(?:TITRE|Titre|CHAPITRE|Chapitre|SECTION|Section)[ \t]+(?P<part>\d+|[IVXLC]+)\b" + HEADING_END +
+    r"|(?P<numbered>\d{1,2}(?:\.\d{1,2})*)[.)][ \t]+(?=[A-ZÀ-Ý]{2,})"
+    r")[^\n]*$",
+    re.MULTILINE
+)
+
+# keywords locating the sections read by each check, lower case, also the BM25 query of the check
+TOPIC_KEYWORDS = {
+    "indexation": ("indexation", "indice", "ilc", "ilat", "icc", "ict", "échelle mobile", "révision", "insee"),
+    "deadlines": ("durée", "échéance", "renouvellement", "congé", "préavis", "résiliation", "triennale",
+                  "prise d'effet", "date d'effet", "à compter du", "expiration", "révision"),
+    "clauses": ("résiliation", "destination", "durée", "révision", "garantie", "dépôt", "cession",
+                "sous-location", "clause résolutoire", "travaux", "charges", "solidarité"),
+    "basic_data": ("désignation", "situé", "adresse", "surface", "m²", "m2", "loyer", "bailleur", "preneur",
+                   "commune", "lieux loués")
+}
+# a keyword starts a word and may be inflected: "indice" matches "indices", "situé" matches "situés"
+KEYWORD_PATTERN = re.compile(
+    r"(?<!\w)(?:" + "|".join(re.escape(keyword) for keyword in sorted(
+        {keyword for keywords in TOPIC_KEYWORDS.values() for keyword in keywords}, key=len, reverse=True
+    )) + ")"
+)
+
+
+class LeaseSegmentation:
+    """
+    Sections of one lease, the index keyword -> sections mentioning it
+    and the BM25 ranker selecting the context of each prompt
+    """
+
+    def __init__(self, text: str, sections: List[LeaseSection], keyword_index: Dict[str, List[int]]):
+        self.text = text
+        self.sections = sections
+        self.keyword_index = keyword_index
+        self._ranker: Optional[BM25SectionRanker] = None
+
+    @property
+    def ranker(self) -> BM25SectionRanker:
+        if self._ranker is None:
+            self._ranker = BM25SectionRanker(self.sections)
+        return self._ranker
+
+    def sections_for(self, topic: str) -> List[LeaseSection]:
+        """
+        sections mentioning a keyword of the topic, in document order
+        """
+        indices = set()
+        for keyword in TOPIC_KEYWORDS[topic]:
+            indices.update(self.keyword_index.get(keyword, ()))
+        return [self.sections[index] for index in sorted(indices)]
+
+    def context_for(self, topic: str, max_tokens: int, top_k: Optional[int] = None) -> str:
+        """
+        best BM25 sections for the topic within max_tokens, joined in document order
+        the beginning of the lease when no section mentions the topic
+        """
+        candidates = [section.index for section in self.sections_for(topic)]
+        ranked = self.ranker.rank(" ".join(TOPIC_KEYWORDS[topic]), candidates=candidates, top_k=top_k)
+
+        if not ranked:
+            return self.text[:max_tokens * 4]
+
+        selected = []
+        remaining_tokens = max_tokens
+        for section in ranked:
+            section_tokens = estimate_tokens(section.text)
+            if section_tokens <= remaining_tokens:
+                selected.append((section.index, section.text))
+                remaining_tokens -= section_tokens
+            elif not selected:
+                # the best section alone is over the budget, its beginning is kept
+                selected.append((section.index, section.text[:remaining_tokens * 4]))
+                remaining_tokens = 0
+
+        return "\n\n".join(text for _, text in sorted(selected))
+
+    def contexts_for(self, topic: str, max_tokens: int, top_k: Optional[int] = None,
+                     max_chunks: Optional[int] = None, min_chars: int = 0) -> List[str]:
+        """
+        a single context with the best sections when every relevant section fits in max_tokens,
+        else (map-reduce, max_chunks given, lease of at least min_chars) chunks of max_tokens
+        covering the relevant sections
+        """
+        if max_chunks and len(self.text) >= min_chars:
+            chunks = self.chunks_for(topic, max_tokens, max_chunks)
+            if len(chunks) > 1:
+                return chunks
+        return [self.context_for(topic, max_tokens, top_k=top_k)]
+
+    def chunks_for(self, topic: str, max_tokens: int, max_chunks: Optional[int] = None) -> List[str]:
+        """
+        relevant sections packed in document order in chunks of max_tokens, a longer section is split
+        beyond max_chunks, the chunks holding the best BM25 sections are kept
+        """
+        chunks: List[List[str]] = [[]]
+        chunk_sections: List[List[int]] = [[]]
+        chunk_tokens = 0
+
+        for section in self.sections_for(topic):
+            pieces = [section.text[start:start + max_tokens * 4] for start in range(0, len(section.text), max_tokens * 4)]
+            for piece in pieces:
+                piece_tokens = estimate_tokens(piece)
+                if chunks[-1] and chunk_tokens + piece_tokens > max_tokens:
+                    chunks.append([])
+                    chunk_sections.append([])
+                    chunk_tokens = 0
+                chunks[-1].append(piece)
+                chunk_sections[-1].append(section.index)
+                chunk_tokens += piece_tokens
+
+        if not chunks[-1]:
+            return []
+
+        if max_chunks and len(chunks) > max_chunks:
+            ranked = self.ranker.rank(" ".join(TOPIC_KEYWORDS[topic]), candidates=sorted(set(sum(chunk_sections, []))))
+            section_rank = {section.index: rank for rank, section in enumerate(ranked)}
+            best_rank = [min(section_rank.get(index, len(section_rank)) for index in indices) for indices in chunk_sections]
+            kept = sorted(sorted(range(len(chunks)), key=lambda position: (best_rank[position], position))[:max_chunks])
+            chunks = [chunks[position] for position in kept]
+
+        return ["\n\n".join(pieces) for pieces in chunks]
+
+
+class LeaseSegmenter:
+    """
+    Split a lease in articles / sections in one pass and index them by keyword.
+    Segmentations are cached per document text, every check of an analysis reuses the same one.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        self.max_entries = max_entries if max_entries is not None else Settings.lease_segmentation_cache_max_entries
+        self.logger = logger or logging.getLogger(__name__)
+        self._cache: "OrderedDict[str, LeaseSegmentation]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def segment(self, text: str) -> LeaseSegmentation:
+
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        segmentation = self._cache.get(key)
+
+        if segmentation is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return segmentation
+
+        self.misses += 1
+        segmentation = self._segment(text)
+        self.logger.info(f"Lease segmented in {len(segmentation.sections)} sections, "
+                         f"{len(segmentation.keyword_index)} keywords indexed")
+
+        self._cache[key] = segmentation
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+        return segmentation
+
+    def stats(self) -> Dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._cache)
+        }
+
+    def _segment(self, text: str) -> LeaseSegmentation:
+
+        headings = list(SECTION_HEADING.finditer(text))
+        boundaries = [heading.start() for heading in headings]
+
+        sections = []
+        if not boundaries or boundaries[0] > 0:
+            # parties and premises are usually described before the first article
+            preamble = text[:boundaries[0] if boundaries else len(text)].strip()
+            if preamble:
+                sections.append(LeaseSection(index=0, title="Préambule", text=preamble, start=0))
+
+        for position, heading in enumerate(headings):
+            end = boundaries[position + 1] if position + 1 < len(boundaries) else len(text)
+            number = heading.group("article") or heading.group("part") or heading.group("numbered")
+            sections.append(LeaseSection(
+                index=len(sections),
+                number=number,
+                title=heading.group(0).strip(),
+                text=text[heading.start():end].strip(),
+                start=heading.start()
+            ))
+
+        keyword_index: Dict[str, List[int]] = {}
+        for section in sections:
+            for keyword in dict.fromkeys(match.group(0) for match in KEYWORD_PATTERN.finditer(section.text.lower())):
+                keyword_index.setdefault(keyword, []).append(section.index)
+
+        return LeaseSegmentation(text, sections, keyword_index)
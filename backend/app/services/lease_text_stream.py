@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+
+
+async def text_chunks(text: str) -> AsyncIterator[str]:
+    """ an already extracted text as a one chunk stream """
+    yield text
+
+
+class LeaseTextStream:
+    """
+    Text of a lease arriving chunk by chunk (pages, sections) from the DocumentParser.
+    Each consumer declares how many characters it needs (None: the whole document),
+    waits only for those, and extraction stops as soon as every consumer has enough.
+    """
+
+    # chunks are joined like the pages of DocumentParser.extract_text_from_file
+    SEPARATOR = "\n"
+
+    def __init__(self, chunks: AsyncIterator[str], logger: Optional[logging.Logger] = None):
+        self.chunks = chunks
+        self.logger = logger or logging.getLogger(__name__)
+
+        self.requirements: Dict[str, Optional[int]] = {}
+        self._parts: List[str] = []
+        self._length = 0
+        self._condition = asyncio.Condition()
+        self._pump_task: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self.finished = False
+        self.stopped_early = False
+
+    def require(self, consumer: str, chars: Optional[int]):
+        """
+        declare the characters a consumer needs, must be called before start()
+        """
+        self.requirements[consumer] = chars
+
+    def start(self):
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+
+    async def text(self, consumer: str) -> str:
+        """
+        the first characters needed by the consumer, as soon as they have arrived
+        raise the extraction error if the document could not be read
+        """
+        self.start()
+        chars = self.requirements.get(consumer)
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.finished or (chars is not None and self._length >= chars))
+
+        if self._error is not None and not self._parts:
+            raise self._error
+
+        text = self.SEPARATOR.join(self._parts)
+        return text if chars is None else text[:chars]
+
+    async def close(self):
+        if self._pump_task is not None and not self._pump_task.done():
+            self._pump_task.cancel()
+            try:
+                await self._pump_task
+            except asyncio.CancelledError:
+                pass
+
+    def _satisfied(self) -> bool:
+        # no declared consumer: the whole document is read
+        return bool(self.requirements) and all(
+            chars is not None and self._length >= chars for chars in self.requirements.values()
+        )
+
+    async def _pump(self):
+        try:
+            async for chunk in self.chunks:
+                async with self._condition:
+                    self._length += len(chunk) + (len(self.SEPARATOR) if self._parts else 0)
+                    self._parts.append(chunk)
+                    self._condition.notify_all()
+
+                if self._satisfied():
+                    self.stopped_early = True
+                    break
+        except Exception as e:
+            self.logger.error(f"Error streaming lease text: {e!r}")
+            self._error = e
+        finally:
+            # closing the generator cancels the extraction of the remaining pages
+            await self.chunks.aclose()
+            async with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+            if self.stopped_early:
+                self.logger.info(f"Lease text extraction stopped after {self._length} characters, "
+                                 f"consumers satisfied: {self.requirements}")
@@ -1,100 +1,245 @@
-import openai
+import asyncio
 import json
 import logging
 import re
-from typing import Dict, Optional
+import time
+from typing import AsyncIterator, Awaitable, Dict, Iterable, Optional, Union
 from app.models.schemas import LeaseAnalysisResponse, Opportunity, FinancialMetrics
 from app.services.market_intelligence_service import MarketIntelligenceService
 from app.services.legal_compliance import LegalComplianceService
+from app.services.llm_gateway import LLMGateway
+from app.services.lease_text_stream import LeaseTextStream, text_chunks
+from app.services.lease_segmenter import LeaseSegmenter
+from app.services.lease_data_extractor import BASIC_FIELDS, LeaseDataExtractor
+from app.utils.http_client import HttpClientRegistry
+from app.utils.map_reduce import map_concurrently
+from app.utils.french_parser import parse_amount
 from app.config import Settings
 
 class LeaseBoostService:
+
+    # basic data field -> (JSON structure, extraction rule) of the extraction prompt
+    BASIC_FIELD_PROMPTS = {
+        "city": ("\"ville du bien ou null si non trouvée, y compris l'arrondissement, pour les villes où il y'a des arrondissements, exemple: Paris-1er-arrondissement ou Paris-2e-arrondissement\"",
+                 "Cherche la ville du bien loué, y compris l'arrondissement, pour les villes où il y'a des arrondissements, exemple: Paris-1er-arrondissement ou Paris-2e-arrondissement"),
+        "address": ("\"adresse complète du bien ou null si non trouvée\"",
+                    "Cherche l'adresse complète du bien loué (rue, numéro, ville)"),
+        "surface": ("nombre_en_float ou null si non trouvée",
+                    "Cherche la superficie en m² (convertis en nombre décimal)"),
+        "annual_rent": ("montant_annuel_en_float ou null si non trouvé",
+                        "Cherche le loyer annuel en euros (convertis en nombre décimal)")
+    }
+
     def __init__(self, openai_api_key: str, legifrance_client_id: str = None, legifrance_client_secret: str = None,
-                  logger: Optional[logging.Logger] = None):
+                  logger: Optional[logging.Logger] = None, llm_gateway: Optional[LLMGateway] = None,
+                  http_client_registry: Optional[HttpClientRegistry] = None):
         
-        self.market_intelligence_service = MarketIntelligenceService(logger=logger)
+        self.market_intelligence_service = MarketIntelligenceService(logger=logger,
+                                                                     http_client_registry=http_client_registry)
+
+        # one gateway shared by every prompt of the analysis pipeline
+        self.llm_gateway = llm_gateway or LLMGateway(openai_api_key=openai_api_key, logger=logger)
+        # the lease is segmented once, every prompt reads its relevant sections
+        self.lease_segmenter = LeaseSegmenter(logger=logger)
+        # surface, rent and premises address read by patterns before asking the LLM
+        self.lease_data_extractor = LeaseDataExtractor(logger=logger)
 
         self.legal_compliance_service = LegalComplianceService(openai_api_key=
             openai_api_key, legifrance_client_id=legifrance_client_id,
-            legifrance_client_secret=legifrance_client_secret, logger=logger)
+            legifrance_client_secret=legifrance_client_secret, logger=logger,
+            llm_gateway=self.llm_gateway, http_client_registry=http_client_registry,
+            lease_segmenter=self.lease_segmenter)
         
-        self.openai_client =  openai.OpenAI(api_key=openai_api_key)
+        self.openai_client = self.llm_gateway.openai_client
         self.logger = logger or logging.getLogger(__name__)
+
+        # aggregated duration of each pipeline stage, exposed for monitoring
+        self.stage_timing_stats: Dict[str, Dict] = {}
     
-    async def analyze_lease(self, lease_content: str, filename: str) -> LeaseAnalysisResponse:
+    def get_market_data_version(self) -> Optional[int]:
+        """
+        version of the market data used by the analyses, None when the data must be refreshed first
+        """
+        market_data_service = self.market_intelligence_service.market_data_service
+        freshness = market_data_service.get_data_freshness_info()
 
-        try:
-            # 1. Extract base data
+        if market_data_service.last_refresh is None or freshness['needs_refresh']:
+            return None
+
+        return market_data_service.data_version
+
+    def open_text_stream(self, chunks: AsyncIterator[str]) -> LeaseTextStream:
+        """
+        stream of the lease text with the characters needed by each analysis stage already declared
+        """
+        text_stream = LeaseTextStream(chunks, logger=self.logger)
+        for stage, chars in Settings.analysis_text_chars.items():
+            text_stream.require(stage, chars)
+        return text_stream
+
+    async def analyze_lease(self, lease_content: Union[str, LeaseTextStream], filename: str) -> LeaseAnalysisResponse:
+
+        # each stage starts as soon as its share of the text has been extracted
+        text_stream = lease_content if isinstance(lease_content, LeaseTextStream) else \
+            self.open_text_stream(text_chunks(lease_content))
+        stage_timings = {}
 
-            basic_data = self._extract_basic_lease_data(lease_content)
+        async def timed(stage: str, awaitable: Awaitable):
+            start = time.perf_counter()
+            try:
+                return await awaitable
+            finally:
+                stage_timings[stage] = time.perf_counter() - start
+
+        async def market_branch():
+            # 1. Extract base data
+            basic_data = await timed("basic_extraction", self._extract_basic_lease_data(
+                await text_stream.text("basic_extraction")
+            ))
 
             self.logger.info(f"Basic data: {basic_data}")
             # 2. Extract market intelligence
-            market_position = await self.market_intelligence_service.get_market_position(
+            market_position = await timed("market_intelligence", self.market_intelligence_service.get_market_position(
                 city=basic_data['city'],
                 address=basic_data['address'],
                 surface=basic_data['surface'],
                 current_rent=basic_data.get('annual_rent')
-            )
+            ))
+            return basic_data, market_position
 
-            # 3. Extract legal compliance
-            legal_compliance = await self.legal_compliance_service.analyze_compliance(lease_content)
+        try:
+            # 3. Extract legal compliance, it does not depend on the market branch and runs alongside
+            compliance_task = asyncio.ensure_future(
+                timed("legal_compliance", self._analyze_compliance(text_stream))
+            )
+            try:
+                basic_data, market_position = await timed("market_branch", market_branch())
+                legal_compliance = await compliance_task
+            finally:
+                if not compliance_task.done():
+                    compliance_task.cancel()
 
             self.logger.info(f"Legal compliance: {legal_compliance}")
-            # 4 enrich
-            ai_analysis = self._perform_enriched_ai_analysis(
-                lease_content,
+            # 4 enrich, joins both branches
+            ai_analysis = await timed("enrichment", self._perform_enriched_ai_analysis(
+                await text_stream.text("enrichment"),
                 basic_data,
                 market_position,
                 legal_compliance
-            )
+            ))
             
             self.logger.info(f"AI analysis: {ai_analysis}")
+            self._record_stage_timings(stage_timings)
             return self._build_complete_analysis(
                 market_position, legal_compliance, ai_analysis, basic_data
             )
         except Exception as e:
             return self._create_fallback_analysis(f"Error analyzing lease: {str(e)}")
     
-    def _extract_basic_lease_data(self, lease_content: str) -> Dict:
-        
+    async def _analyze_compliance(self, text_stream: LeaseTextStream) -> Dict:
+        return await self.legal_compliance_service.analyze_compliance(await text_stream.text("legal_compliance"))
+
+    def _record_stage_timings(self, stage_timings: Dict[str, float]):
+
+        self.logger.info("Analysis stage timings: " + ", ".join(
+            f"{stage}={duration:.2f}s" for stage, duration in stage_timings.items()
+        ))
+
+        for stage, duration in stage_timings.items():
+            stats = self.stage_timing_stats.setdefault(stage, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += duration
+            stats["max_seconds"] = max(stats["max_seconds"], duration)
+
+    def get_stage_timing_stats(self) -> Dict[str, Dict]:
+        return {
+            stage: {
+                "count": stats["count"],
+                "avg_seconds": round(stats["total_seconds"] / stats["count"], 3),
+                "max_seconds": round(stats["max_seconds"], 3)
+            }
+            for stage, stats in self.stage_timing_stats.items()
+        }
+
+    async def _extract_basic_lease_data(self, lease_content: str) -> Dict:
+
+        if not Settings.basic_data_heuristics_enabled:
+            return await self._extract_basic_lease_data_with_ai(lease_content)
+
+        # fields read by patterns are kept, the LLM only looks for the missing ones in the passages around their cues
+        extraction = self.lease_data_extractor.extract(lease_content)
+        missing_fields = extraction.missing_fields
+        if not missing_fields:
+            self.logger.info("Basic lease data extracted without the LLM")
+            return extraction.data
+
+        self.logger.info(f"Basic lease data: {sorted(extraction.data)} extracted, LLM asked for {missing_fields}")
+        snippets = self.lease_data_extractor.snippets(lease_content, missing_fields,
+                                                      Settings.lease_context_tokens["basic_data"] * 4)
+        if snippets:
+            ai_data = await self._extract_basic_fields(snippets, missing_fields)
+        else:
+            ai_data = await self._extract_basic_lease_data_with_ai(lease_content, missing_fields)
+
+        return {**{field: value for field, value in ai_data.items() if field in missing_fields}, **extraction.data}
+
+    async def _extract_basic_lease_data_with_ai(self, lease_content: str,
+                                                fields: Iterable[str] = BASIC_FIELDS) -> Dict:
+
+        # premises, parties and rent sections wherever they are in the lease,
+        # on a long lease chunks of those sections are read concurrently (map-reduce)
+        lease_contexts = self.lease_segmenter.segment(lease_content).contexts_for(
+            "basic_data", Settings.lease_context_tokens["basic_data"], top_k=Settings.lease_context_top_k,
+            max_chunks=Settings.map_reduce_max_chunks if Settings.map_reduce_enabled else None,
+            min_chars=Settings.map_reduce_min_chars
+        )
+        if len(lease_contexts) > 1:
+            self.logger.info(f"Map-reduce basic data: {len(lease_contexts)} chunks")
+
+        chunk_data = await map_concurrently(lease_contexts, lambda lease_context: self._extract_basic_fields(lease_context, fields),
+                                            Settings.map_reduce_concurrency, self.logger)
+
+        # each field is taken from the first chunk, in document order, where it was found
+        basic_data = {}
+        for extracted_data in chunk_data:
+            for field, value in (extracted_data or {}).items():
+                basic_data.setdefault(field, value)
+
+        return basic_data
+
+    async def _extract_basic_fields(self, lease_context: str, fields: Iterable[str] = BASIC_FIELDS) -> Dict:
+
+        # only the requested fields are asked
+        fields = [field for field in BASIC_FIELDS if field in fields]
+        json_structure = ",\n            ".join(f'"{field}": {self.BASIC_FIELD_PROMPTS[field][0]}' for field in fields)
+        extraction_rules = "\n        ".join(f"- {field}: {self.BASIC_FIELD_PROMPTS[field][1]}" for field in fields)
+
         extract_prompt = f"""
          
         Analyse ce contenu de bail commercial français et extrais UNIQUEMENT les informations suivantes :
 
         CONTENU BAIL:
-        {lease_content}
+        {lease_context}
 
         Tu dois extraire et retourner UNIQUEMENT un JSON avec cette structure exacte :
         {{
-            "city": "ville du bien ou null si non trouvée, y compris l'arrondissement, pour les villes où il y'a des arrondissements, exemple: Paris-1er-arrondissement ou Paris-2e-arrondissement",
-            "address": "adresse complète du bien ou null si non trouvée",
-            "surface": nombre_en_float ou null si non trouvée,
-            "annual_rent": montant_annuel_en_float ou null si non trouvé
+            {json_structure}
         }}
 
         RÈGLES D'EXTRACTION :
-        - city: Cherche la ville du bien loué, y compris l'arrondissement, pour les villes où il y'a des arrondissements, exemple: Paris-1er-arrondissement ou Paris-2e-arrondissement
-        - address: Cherche l'adresse complète du bien loué (rue, numéro, ville)
-        - surface: Cherche la superficie en m² (convertis en nombre décimal)
-        - annual_rent: Cherche le loyer annuel en euros (convertis en nombre décimal)
+        {extraction_rules}
         
         Si une information n'est pas présente ou ambiguë, mets null.
         Ne retourne QUE le JSON, aucun autre texte.
         """
 
         try:
-            response = self.openai_client.chat.completions.create(
-                    model=Settings.openai_model,
-                    messages=[
-                        {"role": "system", "content": "Tu es un expert en extraction de données de baux commerciaux français. Tu retournes uniquement du JSON valide, sans aucun texte supplémentaire."},
-                        {"role": "user", "content": extract_prompt}
-                    ],
+            response_content = await self.llm_gateway.chat(
+                    system_prompt="Tu es un expert en extraction de données de baux commerciaux français. Tu retournes uniquement du JSON valide, sans aucun texte supplémentaire.",
+                    user_prompt=extract_prompt,
                     temperature=0.1,
                     max_tokens=500
                 )
-
-            response_content = response.choices[0].message.content
             
             if response_content.startswith("```json"):
                 response_content  = response_content.replace("```json", "").replace("```", "")
@@ -126,7 +271,10 @@ class LeaseBoostService:
                 try:
                     validated_data['annual_rent'] = float(extracted_data['annual_rent'])
                 except (ValueError, TypeError):
-                    pass
+                    # amount given as written in the lease: "54 000 € HT"
+                    annual_rent = parse_amount(str(extracted_data['annual_rent']))
+                    if annual_rent is not None:
+                        validated_data['annual_rent'] = annual_rent
 
             
             return validated_data
@@ -137,7 +285,7 @@ class LeaseBoostService:
             self.logger.error(f"Error extracting basic lease data: {e}") 
             return {}
         
-    def _perform_enriched_ai_analysis(self, lease_content: str, basic_data: Dict, market_position,
+    async def _perform_enriched_ai_analysis(self, lease_content: str, basic_data: Dict, market_position,
                                       legal_analysis: Dict) -> Dict:
  
         enriched_prompt = f"""
@@ -186,17 +334,12 @@ class LeaseBoostService:
 
         try:
 
-            response = self.openai_client.chat.completions.create(
-                    model=Settings.openai_model,
-                    messages=[
-                        {"role": "system", "content": self._get_enriched_system_prompt()},
-                        {"role": "user", "content": enriched_prompt}
-                    ],
+            response_content = await self.llm_gateway.chat(
+                    system_prompt=self._get_enriched_system_prompt(),
+                    user_prompt=enriched_prompt,
                     temperature=0.1,
                     max_tokens=2000
                 )
-
-            response_content = response.choices[0].message.content
             
             if response_content.startswith("```json"):
                 response_content  = response_content.replace("```json", "").replace("```", "")
@@ -204,10 +347,13 @@ class LeaseBoostService:
             return json.loads(response_content)
         except Exception as e:
             self.logger.error(f"Error analyzing lease: {e}")
+            # the rest of the analysis is returned, marked as partial
             return {
                 "opportunities" : [],
-                "financial_metrics": {},
-                "executive_summary": f"Error analyzing lease: {e}"
+                "financial_metrics": {"annual_rent": "N/A", "operational_charges": "N/A",
+                                      "potential_savings": "N/A", "optimized_rent": "N/A"},
+                "executive_summary": f"Error analyzing lease: {e}",
+                "failed": True
             }
     
     def _get_enriched_system_prompt(self) -> str:
@@ -231,6 +377,15 @@ class LeaseBoostService:
     def _build_complete_analysis(self, market_position, legal_analysis: Dict, ai_analysis: Dict,
                                  basic_data: Dict) -> LeaseAnalysisResponse:
         
+        # stages that failed or answered with fallback data
+        degraded_stages = [f"legal_compliance.{check}" for check in legal_analysis.get('failed_checks', [])]
+        if market_position.is_fallback:
+            degraded_stages.append("market_intelligence")
+        if ai_analysis.get('failed'):
+            degraded_stages.append("enrichment")
+        if degraded_stages:
+            self.logger.warning(f"Partial analysis, degraded stages: {', '.join(degraded_stages)}")
+
         # enriched opportunities
 
         opportunities = []
@@ -274,5 +429,6 @@ class LeaseBoostService:
 
             # summary
             executive_summary=executive_summary,
-            analysis_confidence=ai_analysis.get('analysis_confidence', 'N/A')
+            analysis_confidence=ai_analysis.get('analysis_confidence', 'N/A'),
+            degraded_stages=degraded_stages
         )
\ No newline at end of file
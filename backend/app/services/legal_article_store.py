@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from app.config import Settings
+
+ArticleFetcher = Callable[[str], Awaitable[Optional[str]]]
+
+
+class LegalArticleStore:
+    """
+    Persistent cache of the Code de commerce article texts.
+    Articles are served from memory, persisted on disk as versioned JSON
+    and revalidated in background once their TTL is over.
+    """
+
+    STORE_VERSION = 1
+
+    def __init__(self, store_path: Optional[str] = None, ttl_seconds: Optional[float] = None,
+                 logger: Optional[logging.Logger] = None):
+        self.store_path = Path(store_path or Settings.legal_article_store_path)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else Settings.legal_article_ttl_seconds
+        self.logger = logger or logging.getLogger(__name__)
+
+        # article -> {"text": str, "fetched_at": epoch seconds}
+        self.articles: Dict[str, Dict] = {}
+        self._pending_fetches: Dict[str, asyncio.Task] = {}
+        self._save_lock = asyncio.Lock()
+        self._load()
+
+    async def get(self, article: str, fetch_article: ArticleFetcher) -> Optional[str]:
+        """
+        return the article text, fetching it only if it was never stored
+        a stale article is returned immediately and revalidated in background
+        """
+
+        entry = self.articles.get(article)
+
+        if entry is None:
+            return await asyncio.shield(self._start_fetch(article, fetch_article))
+
+        if self._is_stale(entry):
+            self._start_fetch(article, fetch_article)
+
+        return entry["text"]
+
+    async def warm(self, articles: List[str], fetch_article: ArticleFetcher):
+        """
+        fetch concurrently every missing or stale article
+        """
+
+        to_fetch = [article for article in dict.fromkeys(articles)
+                    if article not in self.articles or self._is_stale(self.articles[article])]
+
+        if not to_fetch:
+            self.logger.info(f"Legal article store warm: {len(self.articles)} articles up to date")
+            return
+
+        await asyncio.gather(*[self._start_fetch(article, fetch_article) for article in to_fetch])
+        self.logger.info(f"Legal article store warm: {len(self.articles)}/{len(set(articles))} articles available")
+
+    def _is_stale(self, entry: Dict) -> bool:
+        return time.time() - entry.get("fetched_at", 0) > self.ttl_seconds
+
+    def _start_fetch(self, article: str, fetch_article: ArticleFetcher) -> asyncio.Task:
+        # concurrent requests for the same article share the same fetch
+        task = self._pending_fetches.get(article)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch_and_store(article, fetch_article))
+            self._pending_fetches[article] = task
+        return task
+
+    async def _fetch_and_store(self, article: str, fetch_article: ArticleFetcher) -> Optional[str]:
+
+        try:
+            text = await fetch_article(article)
+        except Exception as e:
+            self.logger.error(f"Error fetching article {article}: {e}")
+            text = None
+
+        if not text:
+            # keep the previous version when the API is down
+            entry = self.articles.get(article)
+            return entry["text"] if entry else None
+
+        self.articles[article] = {
+            "text": text,
+            "fetched_at": time.time()
+        }
+        # concurrent fetches must not write the store file at the same time
+        async with self._save_lock:
+            await asyncio.to_thread(self._save)
+        return text
+
+    def _load(self):
+
+        if not self.store_path.exists():
+            return
+
+        try:
+            with open(self.store_path, encoding="utf-8") as store_file:
+                data = json.load(store_file)
+
+            if data.get("version") != self.STORE_VERSION:
+                self.logger.warning(f"Legal article store version {data.get('version')} ignored")
+                return
+
+            self.articles = data.get("articles", {})
+            self.logger.info(f"Legal article store loaded: {len(self.articles)} articles")
+        except Exception as e:
+            self.logger.error(f"Error loading legal article store: {e}")
+
+    def _save(self):
+
+        try:
+            self.store_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.store_path.with_suffix(".tmp")
+
+            with open(tmp_path, "w", encoding="utf-8") as store_file:
+                json.dump({"version": self.STORE_VERSION, "articles": dict(self.articles)}, store_file,
+                          ensure_ascii=False)
+
+            # atomic replace, a crash never leaves a half written store
+            os.replace(tmp_path, self.store_path)
+        except Exception as e:
+            self.logger.error(f"Error saving legal article store: {e}")
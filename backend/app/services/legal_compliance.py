@@ -1,21 +1,46 @@
 import json
+import asyncio
 import httpx
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
 from dataclasses import asdict
-import openai
 import logging
 from app.models.schemas import LegalAlert, CriticalDeadline
+from app.services.llm_gateway import LLMGateway
+from app.services.legifrance_token_manager import LegifranceTokenManager
+from app.services.legal_article_store import LegalArticleStore
+from app.services.lease_segmenter import LeaseSegmenter
+from app.services.section_ranker import estimate_tokens
+from app.services.indexation_detector import IndexationDetector
+from app.services.deadline_engine import DeadlineEngine, find_lease_anchors
+from app.utils.map_reduce import map_concurrently, dedupe
+from app.utils.french_parser import parse_date
+from app.utils.http_client import HttpClientRegistry, http_client_registry as default_http_client_registry
 from app.utils.data.legal_framework import LEGAL_FRAMEWORK
 from app.config import Settings
 
 class LegalComplianceService:
     """ legal compliance service"""
 
+    # Code de commerce article applicable to each clause type
+    LEGAL_ARTICLE_MAPPING = {
+        "résiliation":"L145-4",
+        "destination": "L145-47",
+        "durée": "L145-4",
+        "révision":"L145-38",
+        "garantie":"L145-40",
+        "cession":"L145-16"
+    }
+    DEFAULT_LEGAL_ARTICLE = "L145-1"
+
     def __init__(self, openai_api_key: str, legifrance_client_id: str = None, legifrance_client_secret: str = None,
-                  logger: Optional[logging.Logger] = None):
+                  logger: Optional[logging.Logger] = None, llm_gateway: Optional[LLMGateway] = None,
+                  http_client_registry: Optional[HttpClientRegistry] = None,
+                  legal_article_store: Optional[LegalArticleStore] = None,
+                  lease_segmenter: Optional[LeaseSegmenter] = None):
         self.legal_framework = LEGAL_FRAMEWORK
-        self.openai_client = openai.OpenAI(api_key=openai_api_key)
+        self.llm_gateway = llm_gateway or LLMGateway(openai_api_key=openai_api_key, logger=logger)
+        self.openai_client = self.llm_gateway.openai_client
 
         # legifrance configuration
         self.legifrance_client_id = legifrance_client_id
@@ -23,32 +48,129 @@ class LegalComplianceService:
         self.legifrance_base_url = "https://api.piste.gouv.fr"
         self.legifrance_token = None
         self.logger = logger or logging.getLogger(__name__)
+        self.http_client_registry = http_client_registry or default_http_client_registry
+        self.legifrance_token_manager = LegifranceTokenManager(
+            client_id=legifrance_client_id,
+            client_secret=legifrance_client_secret,
+            logger=self.logger,
+            http_client_registry=self.http_client_registry
+        )
+        self.legal_article_store = legal_article_store or LegalArticleStore(logger=self.logger)
+        self.lease_segmenter = lease_segmenter or LeaseSegmenter(logger=self.logger)
+        self.indexation_detector = IndexationDetector(self.legal_framework["indexation_rules"], logger=self.logger)
+        self.deadline_engine = DeadlineEngine(self.legal_framework["revision_rules"], logger=self.logger)
     
     async def analyze_compliance(self, lease_content: str) -> Dict:
 
-        # 1. check indexation
-        indexation_alerts = await self._check_indexation_compliance(lease_content)
-
-        # 2. extract critical deadlines
-        critical_deadlines = await self._extract_critical_deadlines(lease_content)
-
-        # 3. check legal issues
-        clause_alerts = await self._check_problematic_clauses(lease_content)
-
-        # 4. compute compliance score
+        # 1. check indexation, 2. extract critical deadlines, 3. check legal issues
+        # the checks are independent, they run concurrently
+        results = await self._run_checks_concurrently({
+            "indexation": lambda deadline: self._check_indexation_compliance(lease_content),
+            "deadlines": lambda deadline: self._extract_critical_deadlines(lease_content),
+            "clauses": lambda deadline: self._check_problematic_clauses(lease_content, deadline=deadline)
+        })
+
+        failed_checks = [name for name, outcome in results.items() if outcome is None]
+        indexation_alerts = results["indexation"] or []
+        critical_deadlines = results["deadlines"] or []
+        clause_alerts, skipped_clauses = results["clauses"] or ([], [])
+        # the alerts of the verified clauses are kept, the check is incomplete all the same
+        if skipped_clauses:
+            failed_checks.append("clauses")
+
+        # 4. compute compliance score, not without the alerts of a failed check
         all_alerts = indexation_alerts + clause_alerts
-        compliance_score = self._compute_compliance_score(all_alerts)
+        if "indexation" in failed_checks or "clauses" in failed_checks:
+            compliance_score = "N/A - Vérification incomplète"
+        else:
+            compliance_score = self._compute_compliance_score(all_alerts)
 
         return {
             "legal_alerts": all_alerts,
             "critical_deadlines": critical_deadlines,
-            "compliance_score": compliance_score
+            "compliance_score": compliance_score,
+            "failed_checks": failed_checks
         }
     
+    async def _run_checks_concurrently(self, checks: Dict[str, Callable[[Optional[float]], Awaitable]]) -> Dict[str, Optional[Any]]:
+        """
+        run the checks concurrently, each one with its own timeout
+        a check is called with its deadline (loop time, None without timeout) to stop its own work in time
+        a check that fails or times out returns None, the others are kept
+        """
+
+        names = list(checks.keys())
+        loop = asyncio.get_running_loop()
+
+        async def run_with_timeout(name: str, check: Callable[[Optional[float]], Awaitable]):
+            timeout = Settings.compliance_check_timeouts.get(name)
+            deadline = loop.time() + timeout if timeout is not None else None
+            return await asyncio.wait_for(check(deadline), timeout=timeout)
+
+        outcomes = await asyncio.gather(
+            *[run_with_timeout(name, checks[name]) for name in names],
+            return_exceptions=True
+        )
+
+        results = {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                self.logger.error(f"Compliance check {name} timed out - partial results returned")
+                results[name] = None
+            elif isinstance(outcome, BaseException):
+                self.logger.error(f"Compliance check {name} failed: {outcome} - partial results returned")
+                results[name] = None
+            else:
+                results[name] = outcome
+
+        return results
+
+    def _lease_contexts(self, content: str, topic: str) -> List[str]:
+        """
+        best sections of the lease for a check, within its token budget
+        on a long lease, chunks of that budget covering every relevant section (map-reduce)
+        """
+        return self.lease_segmenter.segment(content).contexts_for(
+            topic, Settings.lease_context_tokens[topic], top_k=Settings.lease_context_top_k,
+            max_chunks=Settings.map_reduce_max_chunks if Settings.map_reduce_enabled else None,
+            min_chars=Settings.map_reduce_min_chars
+        )
+
+    async def _map_lease_contexts(self, content: str, topic: str, extract: Callable[[str], Awaitable]) -> List:
+        contexts = self._lease_contexts(content, topic)
+        if len(contexts) > 1:
+            self.logger.info(f"Map-reduce {topic}: {len(contexts)} chunks")
+        return await map_concurrently(contexts, extract, Settings.map_reduce_concurrency, self.logger)
+
     async def _check_indexation_compliance(self, content: str) -> List[LegalAlert]:
 
         alerts = []
 
+        # on a long lease each chunk is analysed, the indices found are merged
+        detections = await self._map_lease_contexts(content, "indexation", self._detect_indices)
+        result = self._merge_index_detections([detection for detection in detections if isinstance(detection, dict)])
+
+        if result.get("has_obsolete_indices"):
+            alerts.append(LegalAlert(
+                severity="HIGH",
+                type="Indexation obsolète",
+                description=f"Indices obsolètes détectés: { ', '.join(result.get('obsolete_indices', []))}",
+                legal_reference="Décret n°2022-1267 du 30 septembre 2022",
+                action_required="Notifier changement d'indice vers ILAT",
+                financial_impact="Perte d'indexation légale + risque contentieux"
+            ))
+
+        return alerts
+
+    async def _detect_indices(self, lease_context: str) -> Optional[Dict]:
+
+        # the regex fast path decides alone unless an obsolete index may be ruled out by its sentence
+        if Settings.indexation_fast_path_enabled:
+            detection = self.indexation_detector.detect(lease_context)
+            if not detection.pop("ambiguous"):
+                return detection
+            self.logger.info(f"Ambiguous indexation clause, checked by the LLM: {detection['context']}")
+
         extraction_prompt = f"""
         Analyse le contenu de ce bail commercial et identifie tous les indices d'indexation mentionnés.
         
@@ -61,7 +183,7 @@ class LegalComplianceService:
         - ICT (Indice du Coût des Travaux)
         
         Bail à analyser:
-        {content[:3000]}  # Limitons pour éviter les tokens excessifs
+        {lease_context}
         
         Réponds uniquement en JSON avec cette structure:
         {{
@@ -72,48 +194,178 @@ class LegalComplianceService:
         }}
         """
 
+        response_content = None
         try:
-            response = self.openai_client.chat.completions.create(
-                model=Settings.openai_model,
-                messages=[
-                    {"role": "system", "content": "Tu es un expert juridique en baux commerciaux. Réponds uniquement en JSON valide."},
-                    {"role": "user", "content": extraction_prompt}
-                ],
+            response_content = await self.llm_gateway.chat(
+                system_prompt="Tu es un expert juridique en baux commerciaux. Réponds uniquement en JSON valide.",
+                user_prompt=extraction_prompt,
                 temperature=0.1,
                 max_tokens=500
             )
 
-            response_content = response.choices[0].message.content
             if response_content.startswith("```json"):
                 response_content  = response_content.replace("```json", "").replace("```", "")
             
-            result = json.loads(response_content)
-
-            if result.get("has_obsolete_indices"):
-                alerts.append(LegalAlert(
-                    severity="HIGH",
-                    type="Indexation obsolète",
-                    description=f"Indices obsolètes détectés: { ', '.join(result.get('obsolete_indices', []))}",
-                    legal_reference="Décret n°2022-1267 du 30 septembre 2022",
-                    action_required="Notifier changement d'indice vers ILAT",
-                    financial_impact="Perte d'indexation légale + risque contentieux"
-                ))
+            return json.loads(response_content)
         except json.JSONDecodeError as e:
             self.logger.error(f"Erreur extraction indexation: {e}")
-            if 'response' in locals():
-                self.logger.error(f"Response received: {response.choices[0].message.content}")
+            if response_content is not None:
+                self.logger.error(f"Response received: {response_content}")
 
         except Exception as e:
             self.logger.error(f"Erreur extraction indexation: {e}")
-            # in case of open ai error, we return an empty list
+            # in case of open ai error, no index is reported
 
+        return None
 
-        return alerts
+    @staticmethod
+    def _merge_index_detections(detections: List[Dict]) -> Dict:
+        """
+        union of the indices found in every chunk, in order of appearance
+        """
+        def indices(field: str) -> List[str]:
+            return dedupe((index for detection in detections for index in detection.get(field) or []),
+                          key=lambda index: str(index).strip().upper())
+
+        return {
+            "indices_found": indices("indices_found"),
+            "has_obsolete_indices": any(detection.get("has_obsolete_indices") for detection in detections),
+            "obsolete_indices": indices("obsolete_indices"),
+            "context": next((detection["context"] for detection in detections if detection.get("context")), "")
+        }
 
     async def _extract_critical_deadlines(self, content: str) -> List[CriticalDeadline]:
 
+        if not Settings.deadline_engine_enabled:
+            return await self._extract_critical_deadlines_with_ai(content)
+
+        # the LLM only reads the start date and the duration, the deadlines are computed from the legal rules
+        anchors = await self._extract_lease_anchors(content)
+        if anchors is None:
+            self.logger.warning("Lease start date not found, no critical deadline computed")
+            return []
+
+        return self.deadline_engine.deadlines(*anchors)
+
+    async def _extract_lease_anchors(self, content: str) -> Optional[Tuple[date, int]]:
+        """
+        (start date, duration in months) of the lease, read in the text first, the LLM is asked
+        for the ones not found or ambiguous (first value in document order), a lease without duration
+        is given the legal minimum duration
+        """
+
+        start_date, duration_months = find_lease_anchors(content)
+
+        if start_date is None or duration_months is None:
+            chunk_anchors = await self._map_lease_contexts(content, "deadlines", self._extract_anchor_candidates)
+
+            for anchors in chunk_anchors:
+                if not isinstance(anchors, dict):
+                    continue
+                if start_date is None and anchors.get("start_date"):
+                    start_date = parse_date(str(anchors["start_date"]))
+                    if start_date is None:
+                        self.logger.error(f"Invalid lease start date: {anchors['start_date']}")
+                if duration_months is None and anchors.get("duration_years"):
+                    try:
+                        duration_months = round(float(anchors["duration_years"]) * 12) or None
+                    except (TypeError, ValueError):
+                        self.logger.error(f"Invalid lease duration: {anchors['duration_years']}")
+        else:
+            self.logger.info("Lease start date and duration read without the LLM")
+
+        if start_date is None:
+            return None
+        if duration_months is None:
+            self.logger.info("Lease duration not found, legal minimum duration used")
+            duration_months = DeadlineEngine.DEFAULT_DURATION_MONTHS
+
+        return start_date, duration_months
+
+    async def _extract_anchor_candidates(self, lease_context: str) -> Optional[Dict]:
+
+        extraction_prompt = f"""
+        Analyse ce bail commercial et extrais sa date de prise d'effet et sa durée.
+        
+        Bail à analyser:
+        {lease_context}
+        
+        Réponds en JSON avec cette structure:
+        {{
+            "start_date": "DD/MM/YYYY ou null si non trouvée",
+            "duration_years": nombre_d_années_en_float ou null si non trouvée
+        }}
+        """
+
+        response_content = None
+        try:
+            response_content = await self.llm_gateway.chat(
+                system_prompt="Tu es un expert en gestion de baux commerciaux. Réponds uniquement en JSON valide.",
+                user_prompt=extraction_prompt,
+                temperature=0.1,
+                max_tokens=100
+            )
+
+            response_content = response_content.strip()
+            if response_content.startswith("```json"):
+                response_content = response_content.replace("```json", "").replace("```", "").strip()
+
+            return json.loads(response_content)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parsing JSON lease dates: {e}")
+            if response_content is not None:
+                self.logger.error(f"Response received: {response_content}")
+
+        except Exception as e:
+            self.logger.error(f"Error extracting lease dates: {e}")
+
+        return None
+
+    async def _extract_critical_deadlines_with_ai(self, content: str) -> List[CriticalDeadline]:
+
         deadlines = []
 
+        # on a long lease each chunk is analysed, a deadline found in several chunks is kept once
+        chunk_deadlines = await self._map_lease_contexts(content, "deadlines", self._extract_deadline_candidates)
+        deadline_candidates = dedupe(
+            (deadline for deadlines_found in chunk_deadlines if isinstance(deadlines_found, list)
+             for deadline in deadlines_found if isinstance(deadline, dict)),
+            key=lambda deadline: (str(deadline.get("type", "")).strip().lower(), deadline.get("date"))
+        )
+
+        for deadline_data in deadline_candidates:
+            try:
+                deadline_day = parse_date(str(deadline_data["date"]))
+                if deadline_day is None:
+                    continue
+                deadline_date = datetime.combine(deadline_day, datetime.min.time())
+
+                if deadline_date > datetime.now():
+                    days_remaining = (deadline_date - datetime.now()).days
+
+                    urgency_mapping = {
+                        "HIGH":"HIGH",
+                        "MEDIUM":"MEDIUM",
+                        "LOW":"LOW"
+                    }
+
+                    urgency = urgency_mapping.get(deadline_data.get("urgency_level"), "MEDIUM")
+
+                    deadlines.append(CriticalDeadline(
+                        type=deadline_data["type"],
+                        date=deadline_data["date"],
+                        days_remaining=days_remaining,
+                        urgency=urgency,
+                        action_required=f"Action requise pour : {deadline_data['description']}",
+                        potential_loss=f"Impact estimé: {days_remaining * 50}€/ jour si non traité"
+                    ))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        return sorted(deadlines, key= lambda x: x.days_remaining)
+
+    async def _extract_deadline_candidates(self, lease_context: str) -> List[Dict]:
+
         extraction_prompt = f"""
         Analyse ce bail commercial pour identifier toutes les échéances critiques.
         
@@ -126,7 +378,7 @@ class LegalComplianceService:
         Date actuelle: {datetime.now().strftime("%d/%m/%Y")}
         
         Bail à analyser:
-        {content[:4000]}
+        {lease_context}
         
         Réponds en JSON avec cette structure:
         {{
@@ -141,70 +393,65 @@ class LegalComplianceService:
         }}
         """
 
+        response_content = None
         try:
-            response = self.openai_client.chat.completions.create(
-                model=Settings.openai_model,
-                messages=[
-                    {"role": "system", "content": " Tu es un expert en gestion de baux commerciaux. Extrais uniquement les dates futures. Réponds uniquement en JSON valide. "},
-                    {"role": "user", "content": extraction_prompt}
-                ],
+            response_content = await self.llm_gateway.chat(
+                system_prompt=" Tu es un expert en gestion de baux commerciaux. Extrais uniquement les dates futures. Réponds uniquement en JSON valide. ",
+                user_prompt=extraction_prompt,
                 temperature=0.1,
                 max_tokens=800
             )
 
-            response_content = response.choices[0].message.content.strip()
+            response_content = response_content.strip()
             if response_content.startswith("```json"):
                 response_content = response_content.replace("```json", "").replace("```", "").strip()
 
             result = json.loads(response_content)
 
-            for deadline_data in result.get("deadlines", []):
-                try:
-                    deadline_date = datetime.strptime(deadline_data["date"], "%d/%m/%Y")
-
-                    if deadline_date > datetime.now():
-                        days_remaining = (deadline_date - datetime.now()).days
-
-                        urgency_mapping = {
-                            "HIGH":"HIGH",
-                            "MEDIUM":"MEDIUM",
-                            "LOW":"LOW"
-                        }
-
-                        urgency = urgency_mapping.get(deadline_data.get("urgency_level"), "MEDIUM")
-
-                        deadlines.append(CriticalDeadline(
-                            type=deadline_data["type"],
-                            date=deadline_data["date"],
-                            days_remaining=days_remaining,
-                            urgency=urgency,
-                            action_required=f"Action requise pour : {deadline_data['description']}",
-                            potential_loss=f"Impact estimé: {days_remaining * 50}€/ jour si non traité"
-                        ))
-                except ValueError:
-                    continue
+            return result.get("deadlines", [])
         except json.JSONDecodeError as e:
             self.logger.error(f"Error parsing JSON deadlines: {e}")
-            if 'response' in locals():
-                self.logger.error(f"Response received: {response.choices[0].message.content}")
+            if response_content is not None:
+                self.logger.error(f"Response received: {response_content}")
 
         except Exception as e:
             self.logger.error(f"Error extracting deadlines: {e}")
 
-        return sorted(deadlines, key= lambda x: x.days_remaining)
+        return []
     
-    async def _check_problematic_clauses(self, content: str) -> List[LegalAlert]:
+    async def _check_problematic_clauses(self, content: str,
+                                         deadline: Optional[float] = None) -> Tuple[List[LegalAlert], List[Dict]]:
+        """
+        alerts of the problematic clauses and the clauses whose verification was skipped,
+        the verifications end before the deadline of the check (loop time) to keep their verdicts
+        """
 
         alerts = []
+        loop = asyncio.get_running_loop()
 
         # 1. extract clauses
         clauses = await self._extract_clauses_with_ai(content)
 
-        # 2. check legal with legifrance
-        for clause in clauses:
-            legal_verification = await self._verify_clause_legality(clause)
+        # 2. check legal with legifrance, clauses are verified in batches or in parallel
+        # the verification budget starts once the clauses are extracted, within what remains of the check
+        budget_deadline = loop.time() + Settings.clause_verification_budget_seconds
+        if deadline is not None:
+            budget_deadline = min(budget_deadline, deadline - Settings.clause_verification_deadline_margin_seconds)
 
-            if legal_verification.get("is_problematic"):
+        if Settings.clause_verification_mode == "batch":
+            verification_report = await self._verify_clauses_in_batches(clauses, budget_deadline=budget_deadline)
+        else:
+            verification_report = await self._verify_clauses_in_parallel(clauses, budget_deadline=budget_deadline)
+
+        if verification_report["skipped"]:
+            skipped_description = ", ".join(
+                f"#{skipped['index']} {skipped['type']} ({skipped['reason']})" for skipped in verification_report["skipped"]
+            )
+            self.logger.warning(f"{len(verification_report['skipped'])}/{len(clauses)} clause verifications skipped: {skipped_description}")
+
+        for legal_verification in verification_report["verifications"]:
+
+            if legal_verification and legal_verification.get("is_problematic"):
 
                 alerts.append(LegalAlert(
                     severity=legal_verification.get("severity", "MEDIUM"),
@@ -216,10 +463,69 @@ class LegalComplianceService:
                 ))
                 
 
-        return alerts
+        return alerts, verification_report["skipped"]
     
+    async def _verify_clauses_in_parallel(self, clauses: List[Dict], budget_deadline: Optional[float] = None) -> Dict:
+        """
+        verify the clauses with a bounded concurrency, a per-clause deadline and a global time budget
+        ending at budget_deadline (loop time, clause_verification_budget_seconds from now by default)
+        verifications are returned in clause order, None for a skipped clause
+        """
+
+        semaphore = asyncio.Semaphore(Settings.clause_verification_concurrency)
+        loop = asyncio.get_running_loop()
+        if budget_deadline is None:
+            budget_deadline = loop.time() + Settings.clause_verification_budget_seconds
+
+        async def verify(clause: Dict):
+            async with semaphore:
+                remaining_budget = budget_deadline - loop.time()
+                if remaining_budget <= 0:
+                    return None, "budget exhausted"
+
+                timeout = min(Settings.clause_verification_timeout_seconds, remaining_budget)
+                try:
+                    return await asyncio.wait_for(self._verify_clause_legality(clause), timeout=timeout), None
+                except asyncio.TimeoutError:
+                    return None, "timeout"
+                except Exception as e:
+                    self.logger.error(f"Error during clause verification: {e}")
+                    return None, "error"
+
+        outcomes = await asyncio.gather(*[verify(clause) for clause in clauses])
+
+        verifications = []
+        skipped = []
+        for index, (clause, (verification, skip_reason)) in enumerate(zip(clauses, outcomes)):
+            verifications.append(verification)
+            if skip_reason:
+                skipped.append({
+                    "index": index,
+                    "type": clause.get("type", "inconnu") if isinstance(clause, dict) else "inconnu",
+                    "reason": skip_reason
+                })
+
+        return {
+            "verifications": verifications,
+            "skipped": skipped
+        }
+
     async def _extract_clauses_with_ai(self, content: str) -> List[Dict]:
 
+        # on a long lease each chunk is analysed, a clause found in several chunks is verified once
+        chunk_clauses = await self._map_lease_contexts(content, "clauses", self._extract_clauses_from_context)
+        return dedupe((clause for clauses in chunk_clauses if isinstance(clauses, list) for clause in clauses),
+                      key=self._clause_key)
+
+    @staticmethod
+    def _clause_key(clause) -> str:
+        if not isinstance(clause, dict):
+            return str(clause)
+        # same type and same wording, whitespace and case aside
+        return str(clause.get("type", "")).strip().lower() + "|" + " ".join(str(clause.get("content", "")).lower().split())
+
+    async def _extract_clauses_from_context(self, lease_context: str) -> List[Dict]:
+
         extraction_prompt = f"""
         Extrais les clauses importantes de ce bail commercial:
         
@@ -232,7 +538,7 @@ class LegalComplianceService:
         - Clauses de transfert/cession
         
         Bail:
-        {content[:4000]}
+        {lease_context}
         
         Réponds en JSON:
         {{
@@ -246,18 +552,16 @@ class LegalComplianceService:
         }}
         """
 
+        response_content = None
         try:
-            response = self.openai_client.chat.completions.create(
-                model=Settings.openai_model,
-                messages=[
-                    {"role": "system", "content": "Tu es un juriste spécialisé en baux commerciaux. Extrais uniquement les clauses importantes."},
-                    {"role": "user", "content": extraction_prompt}
-                ],
+            response_content = await self.llm_gateway.chat(
+                system_prompt="Tu es un juriste spécialisé en baux commerciaux. Extrais uniquement les clauses importantes.",
+                user_prompt=extraction_prompt,
                 temperature=0.1,
                 max_tokens=1000
             )
 
-            response_content = response.choices[0].message.content.strip()
+            response_content = response_content.strip()
             
             if response_content.startswith("```json"):
                 response_content = response_content.replace("```json", "").replace("```", "").strip()
@@ -269,8 +573,8 @@ class LegalComplianceService:
         
         except json.JSONDecodeError as e:
             self.logger.error(f"Erreur parsing JSON clauses: {e}")
-            if 'response' in locals():
-                self.logger.error(f"response received: {response.choices[0].message.content}")
+            if response_content is not None:
+                self.logger.error(f"response received: {response_content}")
 
             return []
         except Exception as e:
@@ -309,18 +613,16 @@ class LegalComplianceService:
             "financial_impact": "Impact financier estimé"
         }}
         """
+        response_content = None
         try:
-            response = self.openai_client.chat.completions.create(
-                model=Settings.openai_model,
-                messages=[
-                    {"role": "system", "content": "Tu es un expert juridique en droit commercial. Sois précis et factuel."},
-                    {"role": "user", "content": verification_prompt}
-                ],
+            response_content = await self.llm_gateway.chat(
+                system_prompt="Tu es un expert juridique en droit commercial. Sois précis et factuel.",
+                user_prompt=verification_prompt,
                 temperature=0.1,
                 max_tokens=600
             )
 
-            response_content = response.choices[0].message.content.strip()
+            response_content = response_content.strip()
 
             if response_content.startswith("```json"):
                 response_content = response_content.replace("```json", "").replace("```", "").strip()
@@ -329,145 +631,302 @@ class LegalComplianceService:
         
         except json.JSONDecodeError as e:
             self.logger.error(f"Error during json parsing: {e}")
-            if 'response' in locals():
-                self.logger.error(f"response received: {response.choices[0].message.content}")
+            if response_content is not None:
+                self.logger.error(f"response received: {response_content}")
             return {"is_problematic": False}
         except Exception as e:
             self.logger.error(f"Error during clause verification: {e}")
             return {"is_problematic": False}
         
-    async def _authenticate_legifrance(self) -> str:
+    async def _verify_clauses_in_batches(self, clauses: List[Dict], budget_deadline: Optional[float] = None) -> Dict:
+        """
+        verify several clauses per LLM request with a shared legal context
+        clauses with a missing or invalid verdict fall back to the per-clause verification,
+        batches and fallback share the time budget ending at budget_deadline
+        (loop time, clause_verification_budget_seconds from now by default)
+        """
 
-        if not self.legifrance_client_id or not self.legifrance_client_secret:
-            self.logger.error("Missing legifrance credentials - using local framework")
-            return None
+        batches = self._build_clause_batches(clauses)
+
+        semaphore = asyncio.Semaphore(Settings.clause_verification_concurrency)
+        loop = asyncio.get_running_loop()
+        if budget_deadline is None:
+            budget_deadline = loop.time() + Settings.clause_verification_budget_seconds
+
+        async def verify_batch(batch: List[int]) -> Dict[int, Dict]:
+            async with semaphore:
+                remaining_budget = budget_deadline - loop.time()
+                if remaining_budget <= 0:
+                    return {}
+                # the answer of a batch grows with its clauses (max_tokens per clause), so does its timeout
+                timeout = min(Settings.clause_verification_timeout_seconds * len(batch), remaining_budget)
+                try:
+                    return await asyncio.wait_for(self._verify_clause_batch(clauses, batch), timeout=timeout)
+                except asyncio.TimeoutError:
+                    self.logger.warning(f"Batch verification timed out for clauses {batch}")
+                    return {}
+                except Exception as e:
+                    self.logger.error(f"Error during batch verification: {e}")
+                    return {}
+
+        batch_verdicts = await asyncio.gather(*[verify_batch(batch) for batch in batches])
+
+        verifications = [None] * len(clauses)
+        for verdicts in batch_verdicts:
+            for index, verdict in verdicts.items():
+                verifications[index] = verdict
+
+        # fall back to per-clause calls for clauses without a valid verdict
+        fallback_indexes = [index for index, verdict in enumerate(verifications) if verdict is None]
+        skipped = []
+
+        if fallback_indexes:
+            self.logger.info(f"{len(fallback_indexes)} clauses without valid batch verdict - per-clause fallback")
+            # the fallback gets what remains of the budget, the batch verdicts are kept within the check timeout
+            fallback_report = await self._verify_clauses_in_parallel([clauses[index] for index in fallback_indexes],
+                                                                     budget_deadline=budget_deadline)
+
+            for position, index in enumerate(fallback_indexes):
+                verifications[index] = fallback_report["verifications"][position]
+
+            for skipped_clause in fallback_report["skipped"]:
+                skipped.append({**skipped_clause, "index": fallback_indexes[skipped_clause["index"]]})
+
+        return {
+            "verifications": verifications,
+            "skipped": skipped
+        }
+
+    def _build_clause_batches(self, clauses: List[Dict]) -> List[List[int]]:
+        """
+        group clause indexes in batches that fit the token budget
+        """
+
+        batches = []
+        current_batch = []
+        current_tokens = 0
+
+        for index, clause in enumerate(clauses):
+            clause_tokens = estimate_tokens(str(clause.get("content", "")) if isinstance(clause, dict) else str(clause))
+
+            if current_batch and (current_tokens + clause_tokens > Settings.clause_batch_token_budget
+                                  or len(current_batch) >= Settings.clause_batch_max_size):
+                batches.append(current_batch)
+                current_batch = []
+                current_tokens = 0
+
+            current_batch.append(index)
+            current_tokens += clause_tokens
+
+        if current_batch:
+            batches.append(current_batch)
+
+        return batches
+
+    async def _verify_clause_batch(self, clauses: List[Dict], batch: List[int]) -> Dict[int, Dict]:
+        """
+        verify a batch of clauses in one request, return the valid verdicts by clause index
+        """
+
+        clause_types = list(dict.fromkeys(clauses[index]["type"] for index in batch))
+        legal_contexts = await asyncio.gather(*[self._get_legal_context_from_legifrance(clause_type) for clause_type in clause_types])
+        shared_legal_context = "\n".join(dict.fromkeys(legal_contexts))
+
+        clauses_description = "\n".join(
+            f"[{index}] Type: {clauses[index]['type']}\n    Contenu: {clauses[index]['content']}" for index in batch
+        )
+
+        verification_prompt = f"""
+        Analyse ces clauses de bail commercial pour détecter les problèmes légaux:
+        
+        Clauses à analyser (numéro entre crochets):
+        {clauses_description}
+        
+        Contexte légal de référence:
+        {shared_legal_context}
+        
+        Évalue pour chaque clause si elle:
+        - Respecte le code de commerce
+        - Contient des termes abusifs
+        - Est conforme aux dernières évolutions légales
+        
+        Réponds en JSON avec un verdict par clause:
+        {{
+            "verdicts": [
+                {{
+                    "clause_index": numéro de la clause,
+                    "is_problematic": true/false,
+                    "severity": "HIGH/MEDIUM/LOW",
+                    "violation_type": "Type de violation",
+                    "description": "Description du problème",
+                    "legal_reference": "Article de loi applicable",
+                    "action_required": "Action corrective",
+                    "financial_impact": "Impact financier estimé"
+                }}
+            ]
+        }}
+        """
+
+        response_content = await self.llm_gateway.chat(
+            system_prompt="Tu es un expert juridique en droit commercial. Sois précis et factuel.",
+            user_prompt=verification_prompt,
+            temperature=0.1,
+            max_tokens=300 * len(batch)
+        )
+
+        response_content = response_content.strip()
+
+        if response_content.startswith("```json"):
+            response_content = response_content.replace("```json", "").replace("```", "").strip()
 
         try:
-            async with httpx.AsyncClient() as client:
-                auth_url = "https://oauth.piste.gouv.fr/api/oauth/token"
-                auth_data = {
-                    "grant_type": "client_credentials",
-                    "client_id": self.legifrance_client_id,
-                    "client_secret": self.legifrance_client_secret,
-                    "scope":"openid"
-                }
-
-                headers = {
-                    "Content-Type": "application/x-www-form-urlencoded"
-                }
-                
-                response = await client.post(auth_url, data=auth_data, headers=headers)
+            result = json.loads(response_content)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error during batch json parsing: {e}")
+            self.logger.error(f"response received: {response_content}")
+            return {}
 
-                response.raise_for_status()
+        valid_verdicts = {}
+        verdicts = result.get("verdicts", []) if isinstance(result, dict) else []
 
-                token_data = response.json()
+        for verdict in verdicts:
+            if not isinstance(verdict, dict):
+                continue
 
-                self.legifrance_token = token_data.get("access_token")
-                self.logger.info(f" Authentication successful with LegiFrance")
-                return self.legifrance_token
-        except Exception as e:
-            self.logger.error(f"Error during LegiFrance authentication: {e}")
-            return None
+            index = verdict.get("clause_index")
+            if isinstance(index, bool) or not isinstance(index, int) or index not in batch:
+                continue
+
+            if not isinstance(verdict.get("is_problematic"), bool):
+                continue
+
+            valid_verdicts[index] = verdict
+
+        return valid_verdicts
+
+    async def _authenticate_legifrance(self) -> str:
+
+        # cached token, refreshed by the token manager only when needed
+        self.legifrance_token = await self.legifrance_token_manager.get_token()
+        return self.legifrance_token
     
+    async def warm_legal_article_store(self):
+        """
+        load every mapped article in the local store, called once at startup
+        """
+        articles = list(self.LEGAL_ARTICLE_MAPPING.values()) + [self.DEFAULT_LEGAL_ARTICLE]
+        await self.legal_article_store.warm(articles, self._fetch_article_from_legifrance)
+
     async def _get_legal_context_from_legifrance(self, clause_type: str) -> str:
 
-        legal_mapping = {
-            "résiliation":"L145-4",
-            "destination": "L145-47",
-            "durée": "L145-4",
-            "révision":"L145-38",
-            "garantie":"L145-40",
-            "cession":"L145-16"
-        }
+        article = self.LEGAL_ARTICLE_MAPPING.get(clause_type.lower(), self.DEFAULT_LEGAL_ARTICLE)
+
+        # served from the local store, LegiFrance is only called for missing or stale articles
+        article_text = await self.legal_article_store.get(article, self._fetch_article_from_legifrance)
+
+        if article_text:
+            return f"Article {article} du Code de commerce: {article_text[:500]}..."
+
+        # fall back local
+        return f"Article {article} du Code de Commerce - Voir framework local pour les détails"
 
-        article = legal_mapping.get(clause_type.lower(), "L145-1")
+    async def _fetch_article_from_legifrance(self, article: str) -> Optional[str]:
 
-        #if not self.legifrance_token:
-        self.legifrance_token = await self._authenticate_legifrance()
+        token = await self._authenticate_legifrance()
 
-        if not self.legifrance_token:
+        if not token:
             self.logger.error("Error during LegiFrance authentication - using local framework")
-            return f"Article {article} Code de commerce - voir le framework local pour détails"
+            return None
         
         try:
-            async with httpx.AsyncClient() as client:
-                search_url = f"{self.legifrance_base_url}/dila/legifrance/lf-engine-app/search"
-
-                headers = {
-                    "Authorization": f"Bearer {self.legifrance_token}",
-                    "Content-Type": "application/json"
-                }
-                json_request = {
-                    "recherche": {
-                        "champs": [
+            client = self.http_client_registry.client
+            response = await self._search_legifrance_article(client, token, article)
+
+            # expired or revoked token: invalidate once and retry with a fresh one
+            if response.status_code == 401:
+                self.legifrance_token_manager.invalidate(token)
+                token = await self._authenticate_legifrance()
+                if not token:
+                    self.logger.error("Error during LegiFrance re-authentication - using local framework")
+                    return None
+                response = await self._search_legifrance_article(client, token, article)
+
+            response.raise_for_status()
+
+            search_results = response.json()
+
+            if search_results.get("results") and len(search_results["results"]) > 0:
+                first_result = search_results["results"][0]
+
+                # text can be in different fields, depending of the type of result
+                article_text = first_result.get("text", "")
+                # if no direct text we try to get it from sections
+                if not article_text and first_result.get("sections"):
+                    for section in first_result["sections"]:
+                        if section.get("extracts"):
+                            for extract in section["extracts"]:
+                                if extract.get("values"):
+                                    article_text = "".join(extract["values"])
+                                    break
+                        if article_text:
+                            break
+                if not article_text:
+                    self.logger.warning(f"Article {article}: unexpected LegiFrance response structure")
+                return article_text or None
+            else:
+                self.logger.warning(f"Article {article}: text not found via LegiFrance API")
+                return None
+
+        except Exception as e:
+            self.logger.error(f" Error during LegiFrance search: {e}")
+            return None
+
+    async def _search_legifrance_article(self, client: httpx.AsyncClient, token: str, article: str) -> httpx.Response:
+
+        search_url = f"{self.legifrance_base_url}/dila/legifrance/lf-engine-app/search"
+
+        headers = {
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        }
+        json_request = {
+            "recherche": {
+                "champs": [
+                    {
+                        "criteres": [
                             {
-                                "criteres": [
-                                    {
-                                        "valeur": f"article {article}",
-                                        "operateur": "ET",
-                                        "typeRecherche": "TOUS_LES_MOTS_DANS_UN_CHAMP"
-                                    },
-                                    {
-                                        "valeur": "code de commerce",
-                                        "operateur": "ET", 
-                                        "typeRecherche": "TOUS_LES_MOTS_DANS_UN_CHAMP"
-                                    }
-                                ],
+                                "valeur": f"article {article}",
                                 "operateur": "ET",
-                                "typeChamp": "TITLE"
-                            }
-                        ],
-                        "filtres": [
+                                "typeRecherche": "TOUS_LES_MOTS_DANS_UN_CHAMP"
+                            },
                             {
-                                "valeurs": ["CODE"],
-                                "facette": "NATURE"
+                                "valeur": "code de commerce",
+                                "operateur": "ET", 
+                                "typeRecherche": "TOUS_LES_MOTS_DANS_UN_CHAMP"
                             }
                         ],
-                        "sort": "PERTINENCE",
-                        "fromAdvancedRecherche": False,
-                        "secondSort": "ID",
-                        "pageSize": 1,
                         "operateur": "ET",
-                        "typePagination": "DEFAUT",
-                        "pageNumber": 1
-                    },
-                    "fond": "LODA_DATE" 
-                }
-
-
-                response = await client.post(search_url, json=json_request, headers=headers)
-
-                response.raise_for_status()
-
-                search_results = response.json()
-
-                if search_results.get("results") and len(search_results["results"]) > 0:
-                    first_result = search_results["results"][0]
-
-                    # text can be in different fields, depending of the type of result
-                    article_text = first_result.get("text", "")
-                    # if no direct text we try to get it from sections
-                    if not article_text and first_result.get("sections"):
-                        for section in first_result["sections"]:
-                            if section.get("extracts"):
-                                for extract in section["extracts"]:
-                                    if extract.get("values"):
-                                        article_text = "".join(extract["values"])
-                                        break
-                            if article_text:
-                                break
-                    if article_text:
-                        return f"Article {article} du Code de commerce: {article_text[:500]}..."
-                    else:
-                        return f"Article {article} du Code de commerce - Structure de réponse inattendue"
-                else:
-                    return f"Article {article} du Code de commerce - Texte non trouvé via API"
-
-        except Exception as e:
-            self.logger.error(f" Error during LegiFrance search: {e}")
-            # fall back local
-            return f"Article {article} du Code de Commerce - Voir framework local pour les détails"
+                        "typeChamp": "TITLE"
+                    }
+                ],
+                "filtres": [
+                    {
+                        "valeurs": ["CODE"],
+                        "facette": "NATURE"
+                    }
+                ],
+                "sort": "PERTINENCE",
+                "fromAdvancedRecherche": False,
+                "secondSort": "ID",
+                "pageSize": 1,
+                "operateur": "ET",
+                "typePagination": "DEFAUT",
+                "pageNumber": 1
+            },
+            "fond": "LODA_DATE" 
+        }
 
+        return await client.post(search_url, json=json_request, headers=headers)
 
     def _compute_compliance_score(self, alerts: List[LegalAlert]) -> str:
 
@@ -489,15 +948,18 @@ class LegalComplianceConfig:
     def __init__(self,
                  openai_api_key: str,
                  legifrance_client_id : Optional[str] = None,
-                 legifrance_client_secret: Optional[str] = None):
+                 legifrance_client_secret: Optional[str] = None,
+                 llm_gateway: Optional[LLMGateway] = None):
         self.openai_api_key = openai_api_key
         self.legifrance_client_id = legifrance_client_id
         self.legifrance_client_secret = legifrance_client_secret
+        self.llm_gateway = llm_gateway
 
 def create_legal_compliance_service(config: LegalComplianceConfig) -> LegalComplianceService:
 
         return LegalComplianceService(
             openai_api_key=config.openai_api_key,
             legifrance_client_id=config.legifrance_client_id,
-            legifrance_client_secret=config.legifrance_client_secret
+            legifrance_client_secret=config.legifrance_client_secret,
+            llm_gateway=config.llm_gateway
         )
\ No newline at end of file
@@ -0,0 +1,102 @@
+import asyncio
+import time
+import logging
+from typing import Optional
+from app.config import Settings
+from app.utils.http_client import HttpClientRegistry, http_client_registry as default_http_client_registry
+
+
+class LegifranceTokenManager:
+    """
+    Cache of the LegiFrance OAuth token (client credentials)
+    The token is kept until `expires_in`, refreshed in background before expiry,
+    and concurrent callers share a single refresh.
+    """
+
+    auth_url = "https://oauth.piste.gouv.fr/api/oauth/token"
+
+    def __init__(self, client_id: Optional[str], client_secret: Optional[str],
+                 logger: Optional[logging.Logger] = None,
+                 http_client_registry: Optional[HttpClientRegistry] = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.http_client_registry = http_client_registry or default_http_client_registry
+        self.refresh_margin_seconds = Settings.legifrance_token_refresh_margin_seconds
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._token: Optional[str] = None
+        self._expires_at: float = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def has_credentials(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    async def get_token(self) -> Optional[str]:
+        """
+        return a valid token, authenticating only when needed
+        """
+
+        if not self.has_credentials:
+            self.logger.error("Missing legifrance credentials - using local framework")
+            return None
+
+        now = time.monotonic()
+
+        if self._token and now < self._expires_at:
+            # token still valid, refresh it ahead of expiry without making the caller wait
+            if now >= self._expires_at - self.refresh_margin_seconds:
+                self._start_refresh()
+            return self._token
+
+        return await asyncio.shield(self._start_refresh())
+
+    def invalidate(self, token: Optional[str]):
+        """
+        drop the cached token after a 401, only if nobody refreshed it in the meantime
+        """
+        if token is not None and token == self._token:
+            self.logger.info("LegiFrance token rejected - invalidating cached token")
+            self._token = None
+            self._expires_at = 0.0
+
+    def _start_refresh(self) -> asyncio.Task:
+        # coalesce concurrent callers on the same refresh
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_token())
+        return self._refresh_task
+
+    async def _refresh_token(self) -> Optional[str]:
+
+        try:
+            auth_data = {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": "openid"
+            }
+
+            headers = {
+                "Content-Type": "application/x-www-form-urlencoded"
+            }
+
+            response = await self.http_client_registry.client.post(self.auth_url, data=auth_data, headers=headers)
+
+            response.raise_for_status()
+
+            token_data = response.json()
+
+            token = token_data.get("access_token")
+            if not token:
+                self.logger.error("LegiFrance authentication returned no access token")
+                return None
+
+            expires_in = float(token_data.get("expires_in") or Settings.legifrance_token_default_ttl_seconds)
+
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in
+            self.logger.info(f" Authentication successful with LegiFrance (token valid {int(expires_in)}s)")
+            return token
+        except Exception as e:
+            self.logger.error(f"Error during LegiFrance authentication: {e}")
+            return None
@@ -0,0 +1,69 @@
+import httpx
+import openai
+import logging
+from typing import Optional
+from app.config import Settings
+from app.utils.http_client import http2_available
+from app.services.llm_response_cache import LLMResponseCache, llm_cache_bypass
+
+
+class LLMGateway:
+    """
+    Shared async gateway for every prompt sent to the LLM.
+    One pooled connection set is reused by all the services, so an analysis never blocks the event loop.
+    """
+
+    def __init__(self, openai_api_key: str, logger: Optional[logging.Logger] = None,
+                 response_cache: Optional[LLMResponseCache] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.model = Settings.openai_model
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Settings.llm_max_connections,
+                max_keepalive_connections=Settings.llm_max_keepalive_connections
+            ),
+            timeout=Settings.llm_timeout_seconds,
+            # concurrent prompts are multiplexed on the pooled connections when h2 is installed
+            http2=transport is None and http2_available(),
+            transport=transport
+        )
+        self.openai_client = openai.AsyncOpenAI(api_key=openai_api_key, http_client=self.http_client)
+        self.logger = logger or logging.getLogger(__name__)
+        self.response_cache = response_cache or (LLMResponseCache(logger=self.logger) if Settings.llm_cache_enabled else None)
+
+    async def chat(self, system_prompt: str, user_prompt: str, temperature: float = 0.1,
+                   max_tokens: int = 500, use_cache: bool = True) -> str:
+        """
+        send one system + user prompt and return the raw content of the answer
+        identical prompts are answered from the response cache unless bypassed
+        """
+        use_cache = use_cache and self.response_cache is not None and not llm_cache_bypass.get()
+
+        if use_cache:
+            cache_key = LLMResponseCache.make_key(self.model, system_prompt, user_prompt,
+                                                  temperature=temperature, max_tokens=max_tokens)
+            cached_content = await self.response_cache.get(cache_key)
+            if cached_content is not None:
+                return cached_content
+
+        response = await self.openai_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+        content = response.choices[0].message.content
+
+        if use_cache and content:
+            await self.response_cache.set(cache_key, content)
+
+        return content
+
+    async def aclose(self):
+        await self.openai_client.close()
+        await self.http_client.aclose()
+        self.logger.info("LLM gateway closed")
@@ -0,0 +1,138 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, Optional
+from app.config import Settings
+
+# set to True for the duration of a request to skip the LLM cache (e.g. forced re-analysis)
+llm_cache_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM answers.
+    Keys are a hash of (model, system prompt, user prompt, params), answers are kept
+    in an in-memory LRU and optionally in a size-bounded disk tier.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, disk_dir: Optional[str] = None,
+                 max_disk_bytes: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        self.max_entries = max_entries if max_entries is not None else Settings.llm_cache_max_entries
+        disk_dir = disk_dir if disk_dir is not None else Settings.llm_cache_dir
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes if max_disk_bytes is not None else Settings.llm_cache_max_disk_mb * 1024 * 1024
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._disk_bytes = 0
+        # disk writes run in worker threads, the size count and the eviction are shared between them
+        self._disk_lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(path.stat().st_size for path in self.disk_dir.glob("*.json"))
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, **params) -> str:
+        payload = json.dumps({
+            "model": model,
+            "system": system_prompt,
+            "user": user_prompt,
+            "params": params
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return self._memory[key]
+
+        if self.disk_dir:
+            content = await asyncio.to_thread(self._read_disk, key)
+            if content is not None:
+                self.disk_hits += 1
+                self._remember(key, content)
+                return content
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, content: str):
+
+        self._remember(key, content)
+
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, content)
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes
+        }
+
+    def _remember(self, key: str, content: str):
+        self._memory[key] = content
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        path = self.disk_dir / f"{key}.json"
+        try:
+            with open(path, encoding="utf-8") as cache_file:
+                content = json.load(cache_file)["content"]
+            # touch the file, eviction removes the least recently used entries first
+            os.utime(path)
+            return content
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Invalid LLM cache entry {key}: {e}")
+            return None
+
+    def _write_disk(self, key: str, content: str):
+        path = self.disk_dir / f"{key}.json"
+        try:
+            # unique temporary name, identical prompts may be written concurrently
+            tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as cache_file:
+                json.dump({"content": content}, cache_file, ensure_ascii=False)
+
+            with self._disk_lock:
+                previous_size = path.stat().st_size if path.exists() else 0
+                os.replace(tmp_path, path)
+                self._disk_bytes += path.stat().st_size - previous_size
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+        except Exception as e:
+            self.logger.warning(f"Error writing LLM cache entry {key}: {e}")
+
+    def _evict_disk(self):
+        # called with the disk lock held
+        entries = sorted(self.disk_dir.glob("*.json"), key=lambda path: path.stat().st_mtime)
+        for path in entries:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._disk_bytes -= size
+            except FileNotFoundError:
+                continue
@@ -9,16 +9,20 @@ from app.utils.cities import postalcodeByCity
 
 import statistics
 import logging
-import requests
+import httpx
 from app.config import Settings
+from app.utils.http_client import HttpClientRegistry, http_client_registry as default_http_client_registry
 from io import StringIO
 
 class GoogleSheetsService:
     @staticmethod
-    def read_public_sheet(sheet_id: str, gid: int = 0) -> Optional[pd.DataFrame]:
+    async def read_public_sheet(sheet_id: str, gid: int = 0,
+                                http_client: Optional[httpx.AsyncClient] = None) -> Optional[pd.DataFrame]:
         url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv&gid={gid}"
         try:
-            response = requests.get(url, timeout=10)
+            client = http_client or default_http_client_registry.client
+            # google redirects the export url to its content server
+            response = await client.get(url, timeout=10, follow_redirects=True)
             response.raise_for_status()
 
             df = pd.read_csv(StringIO(response.text))
@@ -35,10 +39,14 @@ class MarketDataService:
     Service to retrieve data, from now only from a google sheet
     """
 
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None,
+                 http_client_registry: Optional[HttpClientRegistry] = None):
         self.sheet_id = Settings.sheet_id
+        self.http_client_registry = http_client_registry or default_http_client_registry
         self.sheet_data = None
         self.last_refresh = None
+        # incremented on every successful refresh, cached analyses depend on it
+        self.data_version = 0
         self.geocoder = Nominatim(user_agent="leastboost_intelligence")
 
         self.logger = logger or logging.getLogger(__name__)
@@ -127,7 +135,8 @@ class MarketDataService:
                 self.logger.info(f" {refresh_reason}")
 
 
-                new_df = sheets_service.read_public_sheet(self.sheet_id)
+                new_df = await sheets_service.read_public_sheet(self.sheet_id,
+                                                                http_client=self.http_client_registry.client)
 
                 if self.sheet_data is not None:
                     old_count = len(self.sheet_data)
@@ -144,6 +153,7 @@ class MarketDataService:
                 self._log_data_metrics()
 
                 self.last_refresh = datetime.now()
+                self.data_version += 1
                 self.logger.info(f" Data refreshed : {len(self.sheet_data)} validated announces ")
         
             except Exception as e:
@@ -3,6 +3,7 @@ from typing import Dict, List, Optional
 from app.services.market_data_service import MarketDataService
 from app.models.schemas import MarketPosition, MarketComparable
 from app.utils.geocoding import geocode_address
+from app.utils.http_client import HttpClientRegistry
 
 import logging
 import statistics
@@ -10,8 +11,9 @@ import statistics
 class MarketIntelligenceService:
 
 
-    def __init__(self, logger: Optional[logging.Logger] = None):
-        self.market_data_service = MarketDataService(logger)
+    def __init__(self, logger: Optional[logging.Logger] = None,
+                 http_client_registry: Optional[HttpClientRegistry] = None):
+        self.market_data_service = MarketDataService(logger, http_client_registry=http_client_registry)
         self.logger = logger or logging.getLogger(__name__)
 
     async def get_market_position(self, city:str, address:str, surface:float,
@@ -40,6 +42,9 @@ class MarketIntelligenceService:
                 current_rent, 
                 market_comparables
             )
+            # comparables simulated when no market data was found
+            if any('fallback' in str(comp.get('source', '')) for comp in comparables_data):
+                market_position.is_fallback = True
             
             return market_position
         except Exception as e:
@@ -220,7 +225,8 @@ class MarketIntelligenceService:
             immediate_opportunity= f"Analyse impossible: {error_msg}",
             confidence_level="0%",
             comparable_count=0,
-            comparables=[]
+            comparables=[],
+            is_fallback=True
         )
         
 
@@ -0,0 +1,74 @@
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Optional
+from app.models.schemas import LeaseSection
+
+WORD = re.compile(r"\w+")
+# crude french stemming by truncation: "indexation", "indexé" -> "index", "résilié", "résiliation" -> "résil"
+STEM_LENGTH = 5
+STOPWORDS = frozenset((
+    "le", "la", "les", "l", "de", "du", "des", "d", "et", "ou", "à", "au", "aux", "en", "un", "une",
+    "par", "pour", "sur", "dans", "avec", "sans", "ce", "cette", "ces", "que", "qui", "se", "sa", "son",
+    "ses", "il", "elle", "ils", "est", "sera", "seront", "être", "a", "y", "ne", "pas", "plus", "tout"
+))
+
+
+def estimate_tokens(text: str) -> int:
+    # rough estimate for french text: about 4 characters per token
+    return len(text) // 4 + 1
+
+
+def stem_terms(text: str) -> List[str]:
+    return [word[:STEM_LENGTH] for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+class BM25SectionRanker:
+    """
+    Okapi BM25 over the sections of one lease, built once per segmentation.
+    Each prompt queries it with its own keywords and keeps the best sections.
+    """
+
+    def __init__(self, sections: List[LeaseSection], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+
+        self.term_frequencies = [Counter(stem_terms(section.text)) for section in sections]
+        self.lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequencies = Counter(term for frequencies in self.term_frequencies for term in frequencies)
+        section_count = len(sections)
+        self.idf = {
+            term: math.log(1 + (section_count - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def score(self, query_terms: Iterable[str], section_index: int) -> float:
+
+        frequencies = self.term_frequencies[section_index]
+        length_ratio = self.lengths[section_index] / self.average_length if self.average_length else 1.0
+
+        score = 0.0
+        for term in query_terms:
+            frequency = frequencies.get(term)
+            if frequency:
+                score += self.idf[term] * frequency * (self.k1 + 1) / (
+                    frequency + self.k1 * (1 - self.b + self.b * length_ratio)
+                )
+        return score
+
+    def rank(self, query: str, candidates: Optional[Iterable[int]] = None,
+             top_k: Optional[int] = None) -> List[LeaseSection]:
+        """
+        sections matching the query, best first, ties in document order
+        """
+
+        query_terms = set(stem_terms(query))
+        candidates = range(len(self.sections)) if candidates is None else candidates
+
+        scored = [(self.score(query_terms, index), index) for index in candidates]
+        ranked = sorted((item for item in scored if item[0] > 0), key=lambda item: (-item[0], item[1]))
+
+        return [self.sections[index] for _, index in ranked[:top_k]]
@@ -0,0 +1,105 @@
+import re
+import logging
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional
+
+# word cut at the end of a line: "indexa-\ntion" -> "indexation"
+HYPHENATED_LINE_BREAK = re.compile(r"(?<!\w)(\w*[a-zà-öø-ÿ])-\n[ \t]*([a-zà-öø-ÿ]\w*)")
+# compound words keep their hyphen: "sous-\nlocation", "ci-\naprès", "dix-\nhuit mois", "celui-\nci", "au-\ndessus"
+COMPOUND_FIRST_WORDS = frozenset((
+    "sous", "ci", "non", "demi", "semi", "quasi", "vice", "arrière", "avant", "après",
+    "deux", "trois", "quatre", "cinq", "six", "sept", "huit", "neuf", "dix", "vingt", "trente", "quarante",
+    "cinquante", "soixante", "cent"
+))
+COMPOUND_LAST_WORDS = frozenset(("ci", "là", "même", "mêmes", "dessus", "dessous", "delà"))
+HORIZONTAL_WHITESPACE = re.compile(r"[ \t\u00a0\u2000-\u200b\u202f]+")
+BLANK_LINES = re.compile(r"\n{3,}")
+# "12", "- 12 -", "Page 12", "page 12 / 40", "12 sur 40"
+PAGE_NUMBER_LINE = re.compile(r"^(?:page\s*)?-?\s*\d{1,4}\s*-?(?:\s*(?:/|sur)\s*\d{1,4})?$", re.IGNORECASE)
+PAGE_NUMBER_IN_LINE = re.compile(r"\bpage\s*\d{1,4}(?:\s*(?:/|sur)\s*\d{1,4})?", re.IGNORECASE)
+
+# lines at the top and at the bottom of a page checked for running headers and footers
+EDGE_LINES = 2
+
+
+class LeaseTextNormalizer:
+    """
+    Remove what wastes prompt tokens in the extracted text of one document:
+    hyphenation breaks, page numbers, running headers and footers, runs of whitespace.
+    Pages are normalized one by one as they are streamed, a header or footer line is dropped
+    from the second page where it appears, a page number line wherever it is at the top or the bottom. Each page is processed in linear time.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        # header/footer key -> pages where the line was seen at the top or the bottom
+        self.edge_lines: Counter = Counter()
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def normalize_page(self, page_text: str) -> str:
+
+        self.chars_in += len(page_text)
+
+        text = HYPHENATED_LINE_BREAK.sub(self._join_hyphenated, page_text)
+        lines = [HORIZONTAL_WHITESPACE.sub(" ", line).strip() for line in text.split("\n")]
+        lines = self._drop_running_lines(lines)
+
+        normalized = BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+        self.chars_out += len(normalized)
+        return normalized
+
+    @staticmethod
+    def _join_hyphenated(match: re.Match) -> str:
+        first, last = match.group(1), match.group(2)
+        if first.lower() in COMPOUND_FIRST_WORDS or last.lower() in COMPOUND_LAST_WORDS:
+            return f"{first}-{last}"
+        return first + last
+
+    def normalize_pages(self, pages: List[str]) -> str:
+        return "\n".join(page for page in map(self.normalize_page, pages) if page)
+
+    async def normalize_chunks(self, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        normalize a stream of pages, empty pages are skipped
+        """
+        try:
+            async for chunk in chunks:
+                normalized = self.normalize_page(chunk)
+                if normalized:
+                    yield normalized
+        finally:
+            await chunks.aclose()
+            self.logger.info(f"Text normalization saved {self.chars_saved} characters "
+                             f"({self.chars_in} -> {self.chars_out})")
+
+    @property
+    def chars_saved(self) -> int:
+        return self.chars_in - self.chars_out
+
+    def stats(self) -> Dict:
+        return {
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "chars_saved": self.chars_saved,
+            "saved_ratio": round(self.chars_saved / self.chars_in, 3) if self.chars_in else 0.0
+        }
+
+    def _drop_running_lines(self, lines: List[str]) -> List[str]:
+
+        content_positions = [position for position, line in enumerate(lines) if line]
+        edge_positions = set(content_positions[:EDGE_LINES] + content_positions[-EDGE_LINES:])
+
+        dropped = set()
+        for position in edge_positions:
+            # a number alone on a line is a page number only at the top or the bottom of the page,
+            # elsewhere it is part of the text: "prendra effet le 1er janvier\n2024"
+            if PAGE_NUMBER_LINE.match(lines[position]):
+                dropped.add(position)
+                continue
+            key = PAGE_NUMBER_IN_LINE.sub("page #", lines[position].lower())
+            if self.edge_lines[key] > 0:
+                dropped.add(position)
+            self.edge_lines[key] += 1
+
+        return [line for position, line in enumerate(lines) if position not in dropped]
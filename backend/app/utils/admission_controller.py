@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from app.config import Settings
+
+
+class AdmissionRejectedError(Exception):
+    """ raised when a request can't be admitted, retry_after is a hint in seconds for the client """
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bound the number of analyses and the upload bytes in flight.
+    Requests over the limits wait in a bounded queue, beyond it (or after queue_timeout_seconds)
+    they are rejected right away so the client can retry instead of the worker running out of memory.
+    A single upload larger than the byte budget is still admitted when nothing else runs.
+    """
+
+    def __init__(self, max_active: Optional[int] = None, max_inflight_bytes: Optional[int] = None,
+                 max_queue: Optional[int] = None, queue_timeout_seconds: Optional[float] = None,
+                 retry_after_seconds: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        self.max_active = max_active if max_active is not None else Settings.admission_max_active_analyses
+        self.max_inflight_bytes = max_inflight_bytes if max_inflight_bytes is not None else Settings.admission_max_inflight_upload_mb * 1024 * 1024
+        self.max_queue = max_queue if max_queue is not None else Settings.admission_max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds if queue_timeout_seconds is not None else Settings.admission_queue_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds if retry_after_seconds is not None else Settings.admission_retry_after_seconds
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._condition = asyncio.Condition()
+        self.active = 0
+        self.inflight_bytes = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        # most recent queue waits in seconds
+        self.wait_times = deque(maxlen=200)
+
+    @asynccontextmanager
+    async def admit(self, upload_bytes: int) -> AsyncIterator[None]:
+        """
+        hold an analysis slot and upload_bytes of the byte budget for the duration of the block
+        raise AdmissionRejectedError when the queue is full or the wait is too long
+        """
+
+        start = time.perf_counter()
+
+        if self.queue_depth == 0 and self._can_admit(upload_bytes):
+            self._reserve(upload_bytes)
+        else:
+            if self.queue_depth >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejectedError(f"Admission queue full ({self.queue_depth} waiting)", self.retry_after_seconds)
+
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+            try:
+                async with self._condition:
+                    await asyncio.wait_for(self._condition.wait_for(lambda: self._can_admit(upload_bytes)),
+                                           timeout=self.queue_timeout_seconds)
+                    self._reserve(upload_bytes)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejectedError(f"Not admitted after {self.queue_timeout_seconds}s", self.retry_after_seconds)
+            finally:
+                self.queue_depth -= 1
+
+        self.wait_times.append(time.perf_counter() - start)
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self.inflight_bytes -= upload_bytes
+                self._condition.notify_all()
+
+    def stats(self) -> Dict:
+        waits = sorted(self.wait_times)
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "inflight_bytes": self.inflight_bytes,
+            "max_inflight_bytes": self.max_inflight_bytes,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_p50_seconds": round(waits[len(waits) // 2], 3) if waits else 0.0,
+            "wait_p95_seconds": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+            "wait_max_seconds": round(waits[-1], 3) if waits else 0.0
+        }
+
+    def _reserve(self, upload_bytes: int):
+        self.active += 1
+        self.inflight_bytes += upload_bytes
+        self.admitted += 1
+
+    def _can_admit(self, upload_bytes: int) -> bool:
+        if self.active >= self.max_active:
+            return False
+        return self.active == 0 or self.inflight_bytes + upload_bytes <= self.max_inflight_bytes
@@ -0,0 +1,163 @@
+import re
+from datetime import date
+from typing import List, NamedTuple, Optional
+
+# dates, durations and euro amounts as written in french leases, found with their position in the text
+
+MONTHS = {
+    "janvier": 1, "février": 2, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6, "juillet": 7,
+    "août": 8, "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11, "décembre": 12, "decembre": 12
+}
+NUMBER_WORDS = {
+    "un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6, "sept": 7, "huit": 8, "neuf": 9,
+    "dix": 10, "onze": 11, "douze": 12, "treize": 13, "quatorze": 14, "quinze": 15, "seize": 16,
+    "vingt": 20, "vingts": 20, "trente": 30, "quarante": 40, "cinquante": 50, "soixante": 60
+}
+# "1 200", "1.200", with a space, no-break space or narrow no-break space
+THOUSANDS_SEPARATOR = r"[ \u00a0\u202f.]"
+# end of the sentence holding a cue: a period or semicolon, or a blank line
+SENTENCE_END = re.compile(r"[.;](?:\s|$)|\n\s*\n")
+
+_NUMBER_WORD = r"(?:" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")"
+# "neuf", "dix-huit", "vingt et un", "quatre-vingt-dix-neuf"
+_NUMBER_FIRST_LETTERS = "".join(sorted({word[0] for word in NUMBER_WORDS}))
+_NUMBER_IN_WORDS = rf"{_NUMBER_WORD}(?:(?:[\s-]+|\s+et\s+){_NUMBER_WORD})*"
+
+DATE = re.compile(
+    # every date starts with a digit or "premier"
+    r"(?=[\dp])(?:"
+    # "01/01/2024", "1.1.24", "01-01-2024"
+    r"(?<![\d/.\-])(?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})[/.\-](?P<year>\d{4}|\d{2})(?![\d/\-]|\.\d)"
+    # "1er janvier 2024", "premier mars 2024", "15 août 2024"
+    r"|(?<!\w)(?P<text_day>\d{1,2}|premier)(?:\s*er)?\s+(?P<text_month>" + "|".join(MONTHS) + r")\s+(?P<text_year>\d{4})(?!\d))",
+    re.IGNORECASE
+)
+DURATION = re.compile(
+    # "9 ans", "neuf années", "neuf (9) années", "24 mois", "dix-huit mois"
+    # the lookahead on digits and first letters of the number words skips most positions
+    rf"(?=[\d{_NUMBER_FIRST_LETTERS}])(?<![\w,.])(?P<number>\d{{1,3}}|{_NUMBER_IN_WORDS})(?:\s*\(\s*(?:\d{{1,3}}|{_NUMBER_IN_WORDS})\s*\))?"
+    r"\s+(?P<unit>années|année|ans|an|mois)(?!\w)",
+    re.IGNORECASE
+)
+AMOUNT = re.compile(
+    # "12 500,00 € HT", "54 000 euros hors taxes", "1.500,50€ TTC"
+    r"(?=\d)(?<![\d,.])(?P<integer>\d{1,3}(?:" + THOUSANDS_SEPARATOR + r"\d{3})+|\d+)(?:,(?P<decimal>\d{1,2}))?"
+    r"\s*(?:€|euros?(?!\w)|EUR(?!\w))"
+    r"(?:\s*\(?\s*(?P<tax>HT(?!\w)|H\.T\.?|hors\s+taxes?|TTC(?!\w)|T\.T\.C\.?|toutes\s+taxes\s+comprises))?",
+    re.IGNORECASE
+)
+
+
+class ParsedDate(NamedTuple):
+    value: date
+    start: int
+    end: int
+
+
+class ParsedDuration(NamedTuple):
+    months: int
+    start: int
+    end: int
+
+
+class ParsedAmount(NamedTuple):
+    value: float
+    # "HT", "TTC" or None when not stated
+    tax: Optional[str]
+    start: int
+    end: int
+
+
+def parse_french_number(integer_part: str, decimal_part: Optional[str] = None) -> float:
+    # "12 500" + "50" -> 12500.5
+    return float(re.sub(THOUSANDS_SEPARATOR, "", integer_part) + ("." + decimal_part if decimal_part else ""))
+
+
+def words_to_number(words: str) -> Optional[int]:
+    """
+    "neuf" -> 9, "dix-huit" -> 18, "vingt et un" -> 21, "quatre-vingt-dix-neuf" -> 99
+    """
+    total = 0
+    for word in re.split(r"[\s-]+", words.lower()):
+        if word == "et":
+            continue
+        value = NUMBER_WORDS.get(word)
+        if value is None:
+            return None
+        # "quatre-vingt": 4 x 20
+        total = total * 20 if value == 20 and 0 < total < 10 else total + value
+    return total
+
+
+def find_dates(text: str, start: int = 0, end: Optional[int] = None) -> List[ParsedDate]:
+    """
+    valid dates of text[start:end], in order, positions in text
+    """
+
+    dates = []
+    for match in DATE.finditer(text, start, len(text) if end is None else end):
+        if match.group("day"):
+            day, month, year = int(match.group("day")), int(match.group("month")), int(match.group("year"))
+            if year < 100:
+                year += 2000 if year < 70 else 1900
+        else:
+            text_day = match.group("text_day").lower()
+            day = 1 if text_day == "premier" else int(text_day)
+            month, year = MONTHS[match.group("text_month").lower()], int(match.group("text_year"))
+
+        try:
+            dates.append(ParsedDate(date(year, month, day), match.start(), match.end()))
+        except ValueError:
+            continue
+
+    return dates
+
+
+def find_durations(text: str, start: int = 0, end: Optional[int] = None) -> List[ParsedDuration]:
+    """
+    durations of text[start:end] in months, in order, positions in text
+    """
+
+    durations = []
+    for match in DURATION.finditer(text, start, len(text) if end is None else end):
+        number = match.group("number")
+        count = int(number) if number.isdigit() else words_to_number(number)
+        if not count:
+            continue
+        months = count if match.group("unit").lower() == "mois" else count * 12
+        durations.append(ParsedDuration(months, match.start(), match.end()))
+
+    return durations
+
+
+def find_amounts(text: str, start: int = 0, end: Optional[int] = None) -> List[ParsedAmount]:
+    """
+    euro amounts of text[start:end], in order, positions in text
+    """
+
+    amounts = []
+    for match in AMOUNT.finditer(text, start, len(text) if end is None else end):
+        tax = match.group("tax")
+        if tax:
+            tax = "TTC" if tax.lower().replace(".", "").startswith(("ttc", "toutes")) else "HT"
+        amounts.append(ParsedAmount(parse_french_number(match.group("integer"), match.group("decimal")), tax,
+                                    match.start(), match.end()))
+
+    return amounts
+
+
+def parse_date(text: str) -> Optional[date]:
+    """ the first date of text: "01/01/2024", "1er janvier 2024" """
+    dates = find_dates(text)
+    return dates[0].value if dates else None
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """ the first euro amount of text, a bare number when there is no currency: "12 500,00 € HT", "12500.5" """
+    amounts = find_amounts(text)
+    if amounts:
+        return amounts[0].value
+    try:
+        return float(str(text).strip())
+    except ValueError:
+        return None
@@ -0,0 +1,55 @@
+import httpx
+import logging
+import importlib.util
+from typing import Optional
+from app.config import Settings
+
+
+def http2_available() -> bool:
+    # httpx only supports HTTP/2 when the optional h2 package is installed
+    return importlib.util.find_spec("h2") is not None
+
+
+class HttpClientRegistry:
+    """
+    App-lifetime pooled HTTP client, created on startup and closed on shutdown.
+    Every outgoing call (LegiFrance, Google Sheets) reuses its keep-alive connections.
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.logger = logger or logging.getLogger(__name__)
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+            self.logger.info(f"HTTP client pool started (http2={http2_available()})")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # created lazily when used outside of the app lifecycle (scripts, tests)
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+            self.logger.info("HTTP client pool closed")
+        self._client = None
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Settings.http_max_connections,
+                max_keepalive_connections=Settings.http_max_keepalive_connections,
+                keepalive_expiry=Settings.http_keepalive_expiry_seconds
+            ),
+            timeout=Settings.http_timeout_seconds,
+            http2=self.transport is None and http2_available(),
+            transport=self.transport
+        )
+
+http_client_registry = HttpClientRegistry()
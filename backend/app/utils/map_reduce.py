@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Hashable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+async def map_concurrently(items: List[T], func: Callable[[T], Awaitable[Any]], concurrency: int,
+                           logger: Optional[logging.Logger] = None) -> List[Any]:
+    """
+    run func on every item with at most `concurrency` calls at a time
+    results are in item order, an item whose call failed gives None
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(index: int, item: T):
+        async with semaphore:
+            try:
+                return await func(item)
+            except Exception as e:
+                logger.error(f"Error on chunk {index + 1}/{len(items)}: {e!r}")
+                return None
+
+    return await asyncio.gather(*[run(index, item) for index, item in enumerate(items)])
+
+
+def dedupe(items: Iterable[T], key: Callable[[T], Hashable]) -> List[T]:
+    """
+    keep the first occurrence of each key, in order
+    """
+    seen = set()
+    unique_items = []
+    for item in items:
+        item_key = key(item)
+        if item_key not in seen:
+            seen.add(item_key)
+            unique_items.append(item)
+    return unique_items
@@ -0,0 +1,126 @@
+import mmap
+import tempfile
+import logging
+from typing import Optional
+from fastapi import UploadFile
+from app.config import Settings
+
+# first bytes of each accepted format, a PDF header may follow a few bytes of garbage
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_SEARCH_BYTES = 1024
+ZIP_MAGIC = b"PK\x03\x04"
+
+
+class UploadTooLargeError(Exception):
+    """ raised as soon as an upload goes over the size limit """
+
+
+class UploadFormatError(Exception):
+    """ raised when the first bytes are neither a PDF nor a DOCX """
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """
+    format of a document from its first bytes: 'pdf', 'docx' or None
+    """
+    if PDF_MAGIC in head[:PDF_MAGIC_SEARCH_BYTES]:
+        return "pdf"
+    if head.startswith(ZIP_MAGIC):
+        return "docx"
+    return None
+
+
+class UploadBuffer:
+    """
+    Bounded copy of an upload: in memory up to spool_memory_bytes, then in an anonymous temporary file.
+    view() exposes the content as a memoryview without copying it (bytearray or mmap).
+    """
+
+    def __init__(self, spool_memory_bytes: int):
+        self.spool_memory_bytes = spool_memory_bytes
+        self.size = 0
+        self.file_format: Optional[str] = None
+        self._memory: Optional[bytearray] = bytearray()
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+
+        if self._file is None and self.size > self.spool_memory_bytes:
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._memory)
+            self._memory = None
+
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._memory.extend(chunk)
+
+    def view(self) -> memoryview:
+        if self._view is None:
+            if self._file is not None:
+                self._file.flush()
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap)
+            else:
+                self._view = memoryview(self._memory)
+        return self._view
+
+    def close(self):
+        # idempotent, views still used by a running extraction keep their memory alive
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                pass
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._memory = None
+
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None, chunk_size: Optional[int] = None,
+                      spool_memory_bytes: Optional[int] = None,
+                      logger: Optional[logging.Logger] = None) -> UploadBuffer:
+    """
+    read an upload chunk by chunk, never holding more than max_bytes
+    raise UploadFormatError when the first chunk is not a supported document
+    and UploadTooLargeError as soon as the limit is exceeded
+    """
+
+    max_bytes = max_bytes if max_bytes is not None else Settings.max_file_size_mb * 1024 * 1024
+    chunk_size = chunk_size or Settings.upload_chunk_size_kb * 1024
+    spool_memory_bytes = spool_memory_bytes if spool_memory_bytes is not None else Settings.upload_spool_memory_mb * 1024 * 1024
+    logger = logger or logging.getLogger(__name__)
+
+    upload = UploadBuffer(spool_memory_bytes)
+    try:
+        while chunk := await file.read(chunk_size):
+            if upload.size == 0:
+                upload.file_format = sniff_format(chunk)
+                if upload.file_format is None:
+                    raise UploadFormatError(f"Unrecognized content for file {file.filename}")
+
+            if upload.size + len(chunk) > max_bytes:
+                raise UploadTooLargeError(f"File {file.filename} exceeds {max_bytes} bytes")
+
+            upload.write(chunk)
+
+        logger.info(f"Upload {file.filename}: {upload.size} bytes, format {upload.file_format}, on disk: {upload.on_disk}")
+        return upload
+    except Exception:
+        upload.close()
+        raise
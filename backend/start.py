@@ -1,5 +1,7 @@
 import uvicorn
-from app.main import app
+
+# the app is imported by uvicorn from its path: the extraction workers, spawned with this module
+# as their main module, must not build it again
 
 if __name__ == "__main__":
     uvicorn.run(
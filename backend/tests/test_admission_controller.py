@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+
+from app.utils.admission_controller import AdmissionController, AdmissionRejectedError
+
+
+async def hold(controller: AdmissionController, upload_bytes: int, release: asyncio.Event, admitted: list, name: str):
+    async with controller.admit(upload_bytes):
+        admitted.append(name)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_requests_queue_until_a_slot_is_free():
+
+    controller = AdmissionController(max_active=2, max_inflight_bytes=1000, max_queue=4, queue_timeout_seconds=5)
+    release = asyncio.Event()
+    admitted = []
+
+    tasks = [asyncio.create_task(hold(controller, 100, release, admitted, f"analyse-{i}")) for i in range(3)]
+    await asyncio.sleep(0.05)
+
+    assert admitted == ["analyse-0", "analyse-1"]
+    assert controller.stats()["queue_depth"] == 1
+    assert controller.stats()["inflight_bytes"] == 200
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    stats = controller.stats()
+    assert admitted == ["analyse-0", "analyse-1", "analyse-2"]
+    assert stats["active"] == 0 and stats["inflight_bytes"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"] == 3
+    assert stats["max_queue_depth"] == 1
+    assert stats["wait_max_seconds"] > 0
+
+
+@pytest.mark.asyncio
+async def test_byte_budget_limits_concurrent_uploads():
+
+    controller = AdmissionController(max_active=10, max_inflight_bytes=1000, max_queue=4, queue_timeout_seconds=5)
+    release = asyncio.Event()
+    admitted = []
+
+    tasks = [asyncio.create_task(hold(controller, 600, release, admitted, f"analyse-{i}")) for i in range(2)]
+    await asyncio.sleep(0.05)
+
+    # the second upload would exceed the byte budget
+    assert admitted == ["analyse-0"]
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert admitted == ["analyse-0", "analyse-1"]
+
+
+@pytest.mark.asyncio
+async def test_upload_over_budget_admitted_alone():
+
+    controller = AdmissionController(max_active=2, max_inflight_bytes=1000, max_queue=0, queue_timeout_seconds=1)
+
+    async with controller.admit(5000):
+        assert controller.stats()["inflight_bytes"] == 5000
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejected_immediately():
+
+    controller = AdmissionController(max_active=1, max_inflight_bytes=1000, max_queue=1, queue_timeout_seconds=5,
+                                     retry_after_seconds=7)
+    release = asyncio.Event()
+    admitted = []
+
+    tasks = [asyncio.create_task(hold(controller, 10, release, admitted, f"analyse-{i}")) for i in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(AdmissionRejectedError) as rejected:
+        async with controller.admit(10):
+            pass
+
+    assert rejected.value.retry_after == 7
+    assert controller.stats()["rejected_queue_full"] == 1
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_queue_wait_timeout_rejected():
+
+    controller = AdmissionController(max_active=1, max_inflight_bytes=1000, max_queue=4, queue_timeout_seconds=0.1)
+    release = asyncio.Event()
+    holder = asyncio.create_task(hold(controller, 10, release, [], "analyse-0"))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejectedError):
+        async with controller.admit(10):
+            pass
+
+    stats = controller.stats()
+    assert stats["rejected_timeout"] == 1
+    assert stats["queue_depth"] == 0
+
+    release.set()
+    await holder
+    assert controller.stats()["active"] == 0
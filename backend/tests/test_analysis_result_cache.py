@@ -0,0 +1,75 @@
+import pytest
+from datetime import datetime
+from app.services.analysis_result_cache import AnalysisResultCache
+from app.services.leaseboost_service import LeaseBoostService
+from app.models.schemas import LeaseAnalysisResponse, MarketPosition, FinancialMetrics
+
+
+@pytest.fixture
+def analysis():
+    return LeaseAnalysisResponse(
+        market_intelligence=MarketPosition(
+            percentile_position="50ème percentile",
+            market_median_price="300€/m²/an",
+            your_estimated_price="290€/m²/an",
+            immediate_opportunity="Aucune",
+            confidence_level="80%",
+            comparable_count=5,
+            comparables=[]
+        ),
+        legal_alerts=[],
+        critical_deadlines=[],
+        opportunities=[],
+        financial_metrics=FinancialMetrics(annual_rent="54000", operational_charges="N/A",
+                                           potential_savings="N/A", optimized_rent="N/A"),
+        executive_summary="Résumé",
+        analysis_confidence="N/A"
+    )
+
+
+def test_same_document_same_versions_hit(analysis):
+
+    cache = AnalysisResultCache()
+    document_hash = cache.hash_document(b"%PDF-1.4 bail commercial")
+
+    cache.set(cache.make_key(document_hash, 3, "gpt-4.1-mini"), analysis)
+
+    assert cache.get(cache.make_key(cache.hash_document(b"%PDF-1.4 bail commercial"), 3, "gpt-4.1-mini")) is analysis
+    assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+
+def test_market_data_or_model_change_invalidates(analysis):
+
+    cache = AnalysisResultCache()
+    document_hash = cache.hash_document(b"bail")
+    cache.set(cache.make_key(document_hash, 3, "gpt-4.1-mini"), analysis)
+
+    assert cache.get(cache.make_key(document_hash, 4, "gpt-4.1-mini")) is None
+    assert cache.get(cache.make_key(document_hash, 3, "gpt-4.1")) is None
+    assert cache.get(cache.make_key(cache.hash_document("bail modifié".encode("utf-8")), 3, "gpt-4.1-mini")) is None
+
+
+def test_lru_and_ttl(analysis):
+
+    cache = AnalysisResultCache(max_entries=1)
+    cache.set("a", analysis)
+    cache.set("b", analysis)
+    assert cache.get("a") is None
+    assert cache.get("b") is analysis
+
+    expired = AnalysisResultCache(ttl_seconds=0)
+    expired.set("a", analysis)
+    assert expired.get("a") is None
+
+
+def test_market_data_version():
+
+    service = LeaseBoostService(openai_api_key="sk-test-key")
+    market_data_service = service.market_intelligence_service.market_data_service
+
+    # never loaded: the next analysis refreshes the data, nothing can be served from cache
+    assert service.get_market_data_version() is None
+
+    market_data_service.last_refresh = datetime.now()
+    market_data_service.data_version = 2
+    assert service.get_market_data_version() == 2
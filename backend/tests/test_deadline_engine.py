@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from app.services.deadline_engine import DeadlineEngine, add_months, find_lease_anchors
+
+
+def test_add_months_clamps_the_day():
+
+    assert add_months(date(2024, 2, 29), 12) == date(2025, 2, 28)
+    assert add_months(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert add_months(date(2024, 3, 15), -6) == date(2023, 9, 15)
+
+
+@pytest.mark.parametrize("lease, anchors", [
+    ("ARTICLE 3 - DURÉE\nLe bail est consenti pour neuf (9) années entières et consécutives, "
+     "à compter du 1er janvier 2024.", (date(2024, 1, 1), 108)),
+    ("Article 2 - Prise d'effet\nLe bail prendra effet le 01/04/2024.\n\nArticle 3 - Durée\n"
+     "Il est conclu pour une durée de dix ans.", (date(2024, 4, 1), 120)),
+    ("Le bail est conclu pour une durée de neuf années qui commenceront à courir le 1er juillet 2024.",
+     (date(2024, 7, 1), 108)),
+    # a date "à compter du" outside the duration article and sentence is not the start of the lease
+    ("Attendu que le bailleur est propriétaire des locaux à compter du 15 mars 1998.\n\n"
+     "ARTICLE 3 - DURÉE\nLe bail est consenti pour une durée de neuf années.", (None, 108)),
+    ("ARTICLE 2 - LOYER\nLe loyer est payable trimestriellement à compter du 1er avril 2024.\n\n"
+     "ARTICLE 3 - DURÉE\nLe bail est consenti pour une durée de neuf années à compter du 1er janvier 2024.",
+     (date(2024, 1, 1), 108)),
+    # start dates that disagree are left to the LLM
+    ("ARTICLE 3 - DURÉE\nLe bail est consenti pour une durée de neuf années à compter du 1er janvier 2024. "
+     "Il prendra effet le 1er mars 2024.", (None, 108)),
+])
+def test_lease_anchors(lease, anchors):
+
+    assert find_lease_anchors(lease) == anchors
+
+
+def test_every_upcoming_deadline_of_a_nine_year_lease():
+
+    deadlines = DeadlineEngine().deadlines(date(2024, 1, 1), 108, today=date(2026, 10, 17))
+
+    assert [(deadline.type, deadline.date, deadline.days_remaining, deadline.urgency) for deadline in deadlines] == [
+        # the notice of the 01/01/2027 revision was due on 03/10/2026, it can still be claimed
+        ("Révision triennale", "03/10/2029", 1082, "LOW"),
+        ("Prescription révision triennale", "01/01/2030", 1172, "LOW"),
+        ("Congé / demande de renouvellement", "01/07/2032", 2084, "LOW"),
+        ("Échéance du bail", "01/01/2033", 2268, "LOW")
+    ]
+    assert "90 jours avant l'échéance du 01/01/2030" in deadlines[0].action_required
+    assert "Art. L145-38" in deadlines[0].action_required
+
+
+def test_revision_deadline_is_its_notice_date():
+
+    # revision due on 01/01/2027, notified 90 days before
+    deadlines = DeadlineEngine().deadlines(date(2024, 1, 1), 108, today=date(2026, 8, 1))
+
+    assert (deadlines[0].type, deadlines[0].date, deadlines[0].days_remaining, deadlines[0].urgency) == (
+        "Révision triennale", "03/10/2026", 63, "HIGH"
+    )
+
+
+def test_past_revision_reported_until_prescription():
+
+    # revisions due on 01/06/2023 (prescribed) and 01/06/2026 (claimable until 01/06/2029)
+    deadlines = DeadlineEngine().deadlines(date(2020, 6, 1), 108, today=date(2026, 10, 17))
+
+    assert [(deadline.type, deadline.date) for deadline in deadlines] == [
+        ("Congé / demande de renouvellement", "01/12/2028"),
+        ("Prescription révision triennale", "01/06/2029"),
+        ("Échéance du bail", "01/06/2029")
+    ]
+    assert "01/06/2026" in deadlines[1].action_required
+
+
+def test_ended_lease_has_no_deadline():
+
+    assert DeadlineEngine().deadlines(date(2010, 1, 1), 108, today=date(2026, 10, 17)) == []
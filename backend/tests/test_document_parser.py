@@ -1,13 +1,22 @@
 import pytest
+import ast
+import asyncio
+import logging
 import os
+import sys
+import time
+import pypdf
 from pathlib import Path
 from docx import Document
+import docx2txt
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 
 
 
-from app.services.document_parser import DocumentParser
+from app.services.document_parser import DocumentParser, extract_docx_text, extract_pdf_page_range, join_pdf_pages
+from app.services.extraction_pool import ExtractionPool, ExtractionPoolBusyError
+from app.config import Settings
 
 
 @pytest.mark.asyncio
@@ -208,5 +217,379 @@ async def test_docx_with_formatting(test_files_dir):
     assert "Texte en gras" in result
     assert "Texte en italique" in result
 
+def _slow_extraction(delay: float):
+    time.sleep(delay)
+    return "texte", []
+
+
+def _app_imported() -> bool:
+    return "app.main" in sys.modules
+
+
+@pytest.mark.asyncio
+async def test_extraction_in_process_pool(sample_files):
+
+    pool = ExtractionPool(max_workers=1, max_queue=2, timeout_seconds=30, documents_per_worker=1)
+    parser = DocumentParser(extraction_pool=pool)
+
+    with open(sample_files['multipages_pdf']['path'], 'rb') as file:
+        file_content = file.read()
+
+    try:
+        first = await parser.extract_text_from_file(file_content, "bail.pdf")
+        second = await parser.extract_text_from_file(file_content, "bail.pdf")
+    finally:
+        pool.shutdown()
+
+    for content in sample_files['multipages_pdf']['pages_contents']:
+        assert content in first
+    assert first == second
+    # one document per worker: the pool was recycled before the second document
+    assert pool.stats()["recycled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_corrupted_file_returns_none(sample_files):
+
+    parser = DocumentParser(extraction_pool=ExtractionPool(max_workers=0))
+
+    with open(sample_files['corrupted_pdf'], 'rb') as file:
+        file_content = file.read()
+
+    assert await parser.extract_text_from_file(file_content, "corrupted.pdf") is None
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_timeout():
+
+    pool = ExtractionPool(max_workers=0, max_queue=1, timeout_seconds=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await pool.run(_slow_extraction, 0.5)
+
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_timeout_recycles_workers():
+
+    pool = ExtractionPool(max_workers=1, max_queue=1, timeout_seconds=0.5)
+
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(_slow_extraction, 30)
+
+        assert pool.stats()["recycled"] == 1
+
+        pool.timeout_seconds = 30
+        assert await pool.run(_slow_extraction, 0) == ("texte", [])
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_worker_does_not_import_the_app():
+
+    pool = ExtractionPool(max_workers=1, max_queue=1, timeout_seconds=30)
+    try:
+        assert await pool.run(_app_imported) is False
+    finally:
+        pool.shutdown()
+
+    # a spawned worker runs the main module of the server (start.py) again as __mp_main__
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(backend_dir, "start.py")) as start_file:
+        start_module = ast.parse(start_file.read())
+    imported = {alias.name for node in start_module.body if isinstance(node, ast.Import) for alias in node.names}
+    imported |= {node.module for node in start_module.body if isinstance(node, ast.ImportFrom)}
+    assert not any(name == "app" or name.startswith("app.") for name in imported)
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_timeout_only_kills_its_worker():
+
+    pool = ExtractionPool(max_workers=2, max_queue=2, timeout_seconds=30)
+
+    try:
+        # both workers started
+        await asyncio.gather(pool.run(_slow_extraction, 0.2), pool.run(_slow_extraction, 0.2))
+
+        pool.timeout_seconds = 1
+        stuck = asyncio.create_task(pool.run(_slow_extraction, 30))
+        await asyncio.sleep(0.3)
+        pool.timeout_seconds = 30
+        # still running in the other worker when the stuck one is killed
+        running = asyncio.create_task(pool.run(_slow_extraction, 1.5))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await stuck
+        assert pool.stats()["recycled"] == 1
+
+        assert await running == ("texte", [])
+        assert await pool.run(_slow_extraction, 0) == ("texte", [])
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_bounded_queue():
+
+    pool = ExtractionPool(max_workers=0, max_queue=1, timeout_seconds=5)
+
+    running = [asyncio.create_task(pool.run(_slow_extraction, 0.2)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(ExtractionPoolBusyError):
+        await pool.run(_slow_extraction, 0.01)
+
+    assert [await task for task in running] == [("texte", [])] * 2
+    assert pool.stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sharded_pdf_extraction_keeps_page_order(test_files_dir, monkeypatch):
+
+    pdf_path = os.path.join(test_files_dir, "sharded_test.pdf")
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    for page_num in range(30):
+        c.drawString(100, 750, f"Contenu de la page {page_num + 1}")
+        c.showPage()
+    c.save()
+
+    with open(pdf_path, 'rb') as file:
+        file_content = file.read()
+
+    monkeypatch.setattr(Settings, "pdf_min_pages_per_shard", 10)
+    monkeypatch.setattr(Settings, "pdf_slow_page_seconds", 0.0)
+    pool = ExtractionPool(max_workers=3, max_queue=3, timeout_seconds=60)
+    parser = DocumentParser(extraction_pool=pool)
+
+    assert parser._page_shards(30) == [(0, 10), (10, 20), (20, 30)]
+
+    try:
+        result = await parser.extract_text_from_file(file_content, "sharded_test.pdf")
+    finally:
+        pool.shutdown()
+
+    assert result == parser._extract_from_pdf(file_content)
+    assert result.split("\n") == [f"Contenu de la page {page_num + 1}" for page_num in range(30)]
+    # every page timing is reported
+    assert len(parser.slow_pages) == 30
+
+
+def test_page_range_isolates_page_errors(sample_files, monkeypatch):
+
+    with open(sample_files['multipages_pdf']['path'], 'rb') as file:
+        file_content = file.read()
+
+    original_extract_text = pypdf.PageObject.extract_text
+    calls = 0
+
+    def failing_second_page(page, *args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise ValueError("page illisible")
+        return original_extract_text(page, *args, **kwargs)
+
+    monkeypatch.setattr(pypdf.PageObject, "extract_text", failing_second_page)
+
+    pages, log_records = extract_pdf_page_range(file_content, 0, 3)
+
+    assert [page_num for page_num, _, _ in pages] == [0, 1, 2]
+    assert pages[1][1] is None
+    assert join_pdf_pages(pages) == "Page 1 contenu\nPage 3 contenu"
+    assert log_records == [(logging.ERROR, "Error page 1: page illisible")]
+
+
+
+def test_docx_in_memory_matches_docx2txt(test_files_dir, monkeypatch):
+
+    docx_path = os.path.join(test_files_dir, "structured.docx")
+
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "Bail commercial - en-tête"
+    doc.sections[0].footer.paragraphs[0].text = "Paraphes du bailleur et du preneur"
+    doc.add_heading("ARTICLE 1 - DÉSIGNATION", level=1)
+    p = doc.add_paragraph("Locaux situés\tau rez-de-chaussée")
+    p.add_run().add_break()
+    p.add_run("d'une surface de 120 m²")
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Loyer annuel"
+    table.cell(0, 1).text = "24 000 € HT"
+    table.cell(1, 0).text = "Indice"
+    table.cell(1, 1).text = "ILC"
+    doc.add_paragraph("")
+    doc.add_paragraph("Fin du bail")
+    doc.save(docx_path)
+
+    with open(docx_path, 'rb') as f:
+        file_content = f.read()
+
+    # the extraction must never go through a temporary file
+    def no_disk(*args, **kwargs):
+        raise AssertionError("temporary file created")
+    monkeypatch.setattr("tempfile.NamedTemporaryFile", no_disk)
+
+    text, log_records = extract_docx_text(file_content)
+
+    monkeypatch.undo()
+    assert text == docx2txt.process(docx_path)
+    assert "24 000 € HT" in text
+    assert log_records == []
+
+
+def test_docx_in_memory_corrupted():
+
+    text, log_records = extract_docx_text(b"PK\x03\x04 pas un docx")
+
+    assert text is None
+    assert log_records[0][0] == logging.ERROR
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 1])
+async def test_extract_from_memoryview_with_sniffed_format(sample_files, workers):
+
+    pool = ExtractionPool(max_workers=workers, max_queue=2, timeout_seconds=30)
+    parser = DocumentParser(extraction_pool=pool)
+
+    with open(sample_files['valid_pdf']['path'], 'rb') as file:
+        file_content = file.read()
+
+    try:
+        # the sniffed format is used whatever the filename says
+        result = await parser.extract_text_from_file(memoryview(file_content), "bail.upload", "pdf")
+    finally:
+        pool.shutdown()
+
+    assert result == parser._extract_from_pdf(file_content)
+
+
+
+@pytest.mark.asyncio
+async def test_streamed_pdf_stops_when_closed(test_files_dir, monkeypatch):
+
+    pdf_path = os.path.join(test_files_dir, "streamed_test.pdf")
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    for page_num in range(80):
+        c.drawString(100, 750, f"Contenu de la page {page_num + 1}")
+        c.showPage()
+    c.save()
+
+    with open(pdf_path, 'rb') as file:
+        file_content = file.read()
+
+    # default configuration: 2 worker processes, ranges of 10 pages at least, 4 ranges per worker at most
+    pool = ExtractionPool()
+    parser = DocumentParser(extraction_pool=pool)
+
+    extracted_ranges = []
+    running = 0
+    peak_running = 0
+    original_run = pool.run
+
+    async def spy_run(func, *args, document=None):
+        nonlocal running, peak_running
+        if func is not extract_pdf_page_range:
+            return await original_run(func, *args, document=document)
+        extracted_ranges.append(args[1:])
+        running += 1
+        peak_running = max(peak_running, running)
+        try:
+            return await original_run(func, *args, document=document)
+        finally:
+            running -= 1
+
+    monkeypatch.setattr(pool, "run", spy_run)
+
+    try:
+        chunks = [chunk async for chunk in parser.stream_text_chunks(file_content, "streamed_test.pdf")]
+        assert "\n".join(chunks) == parser._extract_from_pdf(file_content)
+        assert extracted_ranges == [(first_page, first_page + 10) for first_page in range(0, 80, 10)]
+        # one range ahead per worker
+        assert peak_running == 2
+
+        extracted_ranges.clear()
+        stream = parser.stream_text_chunks(file_content, "streamed_test.pdf")
+        first_pages = [await stream.__anext__() for _ in range(5)]
+        await stream.aclose()
+    finally:
+        pool.shutdown()
+
+    assert first_pages == [f"Contenu de la page {page_num + 1}" for page_num in range(5)]
+    # the first range and the ranges extracted ahead are started, never the rest of the document
+    assert extracted_ranges[0] == (0, 10)
+    assert len(extracted_ranges) <= 3
+    assert pool.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_streamed_pdf_in_more_ranges_than_workers(test_files_dir, monkeypatch):
+
+    pdf_path = os.path.join(test_files_dir, "streamed_workers_test.pdf")
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    for page_num in range(40):
+        c.drawString(100, 750, f"Contenu de la page {page_num + 1}")
+        c.showPage()
+    c.save()
+
+    with open(pdf_path, 'rb') as file:
+        file_content = file.read()
+
+    monkeypatch.setattr(Settings, "pdf_min_pages_per_shard", 10)
+    pool = ExtractionPool(max_workers=2, max_queue=2, timeout_seconds=60, documents_per_worker=2)
+    parser = DocumentParser(extraction_pool=pool)
+
+    calls = []
+    original_run = pool.run
+
+    async def spy_run(func, *args, document=None):
+        calls.append((func.__name__, args[1:]))
+        return await original_run(func, *args, document=document)
+
+    monkeypatch.setattr(pool, "run", spy_run)
+
+    try:
+        chunks = [chunk async for chunk in parser.stream_text_chunks(memoryview(file_content), "streamed.pdf")]
+        assert await parser.extract_text_from_file(file_content, "bail.pdf") == "\n".join(chunks)
+        recycled = pool.stats()["recycled"]
+    finally:
+        pool.shutdown()
+
+    assert chunks == [f"Contenu de la page {page_num + 1}" for page_num in range(40)]
+    # streamed in ranges of 10 pages, the whole text in one range per worker
+    assert calls == [("count_pdf_pages", ()), ("extract_pdf_page_range", (0, 10)),
+                     ("extract_pdf_page_range", (10, 20)), ("extract_pdf_page_range", (20, 30)),
+                     ("extract_pdf_page_range", (30, 40)), ("count_pdf_pages", ()),
+                     ("extract_pdf_page_range", (0, 20)), ("extract_pdf_page_range", (20, 40))]
+    # 8 calls for 2 documents: the workers are not recycled before their third document
+    assert recycled == 0
+
+
+@pytest.mark.asyncio
+async def test_extraction_pool_timeout_is_per_document():
+
+    pool = ExtractionPool(max_workers=0, max_queue=0, timeout_seconds=0.3)
+
+    with pool.document() as document:
+        assert await pool.run(_slow_extraction, 0.2, document=document) == ("texte", [])
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(_slow_extraction, 0.2, document=document)
+        with pytest.raises(asyncio.TimeoutError):
+            await pool.run(_slow_extraction, 0, document=document)
+
+        with pytest.raises(ExtractionPoolBusyError):
+            with pool.document():
+                pass
+
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["in_flight"] == 0
+    # a new document gets its own timeout
+    assert await pool.run(_slow_extraction, 0.2) == ("texte", [])
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
\ No newline at end of file
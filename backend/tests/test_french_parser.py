@@ -0,0 +1,81 @@
+from datetime import date
+
+import pytest
+
+from app.utils.french_parser import (find_amounts, find_dates, find_durations, parse_amount, parse_date,
+                                     words_to_number)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("le 1er janvier 2024", date(2024, 1, 1)),
+    ("premier Mars 2025", date(2025, 3, 1)),
+    ("15 août 2024", date(2024, 8, 15)),
+    ("le 3 fevrier 2026", date(2026, 2, 3)),
+    ("01/01/2024", date(2024, 1, 1)),
+    ("1.7.24", date(2024, 7, 1)),
+    ("31-12-2032", date(2032, 12, 31)),
+    ("29/02/2023", None),
+    ("Art. L145-38", None),
+])
+def test_parse_date(text, expected):
+
+    assert parse_date(text) == expected
+
+
+def test_dates_with_positions():
+
+    text = "Prise d'effet le 1er janvier 2024, fin le 31/12/2032."
+
+    dates = find_dates(text)
+
+    assert [parsed.value for parsed in dates] == [date(2024, 1, 1), date(2032, 12, 31)]
+    assert text[dates[0].start:dates[0].end] == "1er janvier 2024"
+    assert text[dates[1].start:dates[1].end] == "31/12/2032"
+    # search restricted to a part of the text, positions stay absolute
+    assert find_dates(text, 30)[0].start == dates[1].start
+
+
+@pytest.mark.parametrize("words, number", [
+    ("neuf", 9), ("dix-huit", 18), ("vingt et un", 21), ("soixante-dix", 70), ("quatre-vingt-dix-neuf", 99),
+    ("neuf cents", None),
+])
+def test_words_to_number(words, number):
+
+    assert words_to_number(words) == number
+
+
+@pytest.mark.parametrize("text, months, written", [
+    ("pour une durée de neuf années entières", 108, "neuf années"),
+    ("pour une durée de neuf (9) ans", 108, "neuf (9) ans"),
+    ("conclu pour 12 ans", 144, "12 ans"),
+    ("un préavis de six mois", 6, "six mois"),
+    ("un délai de dix-huit mois", 18, "dix-huit mois"),
+    ("une année", 12, "une année"),
+])
+def test_durations(text, months, written):
+
+    durations = find_durations(text)
+
+    assert [duration.months for duration in durations] == [months]
+    assert text[durations[0].start:durations[0].end] == written
+
+
+def test_amounts_with_tax_markers():
+
+    text = "Loyer de 12 500,00 € HT, dépôt de 3.000 euros TTC, charges de 1 500,50€ (hors taxes), frais 250 EUR."
+
+    amounts = find_amounts(text)
+
+    assert [(amount.value, amount.tax) for amount in amounts] == [
+        (12500.0, "HT"), (3000.0, "TTC"), (1500.5, "HT"), (250.0, None)
+    ]
+    assert text[amounts[0].start:amounts[0].end] == "12 500,00 € HT"
+
+
+def test_parse_amount():
+
+    assert parse_amount("54 000 € HT") == 54000.0
+    assert parse_amount("54000.5") == 54000.5
+    assert parse_amount("non précisé") is None
+    # no currency: not an amount
+    assert find_amounts("Article 12 500") == []
@@ -0,0 +1,27 @@
+import pytest
+import httpx
+from app.utils.http_client import HttpClientRegistry
+
+
+@pytest.mark.asyncio
+async def test_http_client_is_shared_and_closed():
+
+    registry = HttpClientRegistry(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    await registry.start()
+
+    client = registry.client
+    assert registry.client is client
+
+    await registry.close()
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_client_created_lazily_outside_lifecycle():
+
+    registry = HttpClientRegistry(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="ok")))
+
+    response = await registry.client.get("https://example.org")
+
+    assert response.text == "ok"
+    await registry.close()
@@ -0,0 +1,74 @@
+import pytest
+
+from app.services.indexation_detector import IndexationDetector
+
+
+@pytest.fixture
+def detector():
+    return IndexationDetector()
+
+
+@pytest.mark.parametrize("text, found, obsolete", [
+    ("Le loyer sera indexé sur l'ICC publié par l'INSEE.", ["ICC"], ["ICC"]),
+    ("Indexation selon l'Indice du Cout de la Construction.", ["ICC"], ["ICC"]),
+    ("Révision selon l'I.C.C. du deuxième trimestre.", ["ICC"], ["ICC"]),
+    ("Indexation sur l'ILAT, à défaut sur l'ICT.", ["ILAT", "ICT"], ["ICT"]),
+    ("Indice des loyers commerciaux (ILC), base 100.", ["ILC"], []),
+    # qualifiers between "indice" and the rest of the name
+    ("Selon l'indice national du coût de la construction publié par l'INSEE.", ["ICC"], ["ICC"]),
+    ("Indexation sur l'indice trimestriel du coût de la construction.", ["ICC"], ["ICC"]),
+    ("Le loyer suivra l'indice INSEE du coût des travaux.", ["ICT"], ["ICT"]),
+    # words containing the acronyms are not indices
+    ("Les locaux ILCX et PICCOLO sont exclus.", [], []),
+])
+def test_indices_detected(detector, text, found, obsolete):
+
+    detection = detector.detect(text)
+
+    assert detection["indices_found"] == found
+    assert detection["obsolete_indices"] == obsolete
+    assert detection["has_obsolete_indices"] == bool(obsolete)
+    assert detection["ambiguous"] is False
+
+
+def test_context_is_the_sentence_of_the_obsolete_index(detector):
+
+    text = "Article 4 - Loyer\nLe loyer est payable par trimestre. Il sera révisé selon l'ICC annuellement. Fin."
+
+    assert detector.detect(text)["context"] == "Il sera révisé selon l'ICC annuellement"
+
+
+@pytest.mark.parametrize("text", [
+    "L'ICC n'est plus applicable depuis 2022.",
+    "En remplacement de l'indice ICC, l'ILAT est retenu.",
+    "Toute indexation sur l'ICT est exclue, sauf accord des parties.",
+])
+def test_negated_obsolete_index_is_ambiguous(detector, text):
+
+    assert detector.detect(text)["ambiguous"] is True
+
+
+@pytest.mark.parametrize("text", [
+    "Le loyer sera indexé chaque année sur l'indice de référence publié au Journal Officiel.",
+    "Les parties conviennent d'une clause d'échelle mobile.",
+])
+def test_indexation_without_known_index_is_ambiguous(detector, text):
+
+    detection = detector.detect(text)
+
+    assert detection["indices_found"] == []
+    assert detection["ambiguous"] is True
+
+
+def test_text_without_indexation_is_decided(detector):
+
+    assert detector.detect("Le preneur entretiendra les lieux loués.")["ambiguous"] is False
+
+
+def test_negation_of_a_valid_index_is_decided(detector):
+
+    # no obsolete index at stake, the clause can't raise an alert
+    detection = detector.detect("L'ILC ne s'applique qu'aux activités commerciales.")
+
+    assert detection["ambiguous"] is False
+    assert detector.stats() == {"decided": 1, "escalated": 0, "decided_ratio": 1.0}
@@ -0,0 +1,75 @@
+import pytest
+
+from app.services.lease_data_extractor import LeaseDataExtractor, normalize_commune
+
+
+@pytest.fixture
+def extractor():
+    return LeaseDataExtractor()
+
+
+@pytest.mark.parametrize("text, surface", [
+    ("Locaux d'une superficie de 85,50 m² au rez-de-chaussée.", 85.5),
+    ("Surface totale : 1 200 m2, dont 300 m2 de réserves.", 1200.0),
+    ("Un local de 45 m² au rez-de-chaussée, 45 m² mesurés par le géomètre.", 45.0),
+    ("Une boutique de 40 m² et une réserve de 15 m².", None),
+])
+def test_surface(extractor, text, surface):
+
+    assert extractor.extract(text).data.get("surface") == surface
+
+
+@pytest.mark.parametrize("text, annual_rent", [
+    ("Le loyer annuel est fixé à 54 000 euros HT.", 54000.0),
+    ("Le loyer mensuel de 4 500 euros, soit 54 000 euros par an.", 54000.0),
+    ("Le loyer est de 3.000,00 € par trimestre.", 12000.0),
+    # the annual amount wins over the monthly one
+    ("Le loyer mensuel est de 4 000 €.\nSoit un loyer annuel de 48 500 €.", 48500.0),
+    ("Le dépôt de garantie est égal à trois mois de loyer, soit 13 500 euros.", None),
+])
+def test_annual_rent(extractor, text, annual_rent):
+
+    assert extractor.extract(text).data.get("annual_rent") == annual_rent
+
+
+def test_premises_address_and_not_the_party_address(extractor):
+
+    text = ("Monsieur MARTIN, demeurant 8 avenue Foch, 75116 Paris, ci-après le bailleur.\n"
+            "Les locaux sont situés au 12 bis avenue Jean Jaurès 93700 DRANCY, au rez-de-chaussée.")
+
+    data = extractor.extract(text).data
+
+    assert data["address"] == "12 bis avenue Jean Jaurès, 93700 DRANCY"
+    assert data["city"] == "Drancy"
+
+
+def test_paris_arrondissement_from_postal_code(extractor):
+
+    data = extractor.extract("Adresse des locaux : 123, rue de la Paix, 2ème étage, 75002 Paris").data
+
+    assert data["address"] == "123, rue de la Paix, 75002 Paris"
+    assert data["city"] == "Paris-2e-arrondissement"
+
+
+def test_commune_validated_against_insee_table(extractor):
+
+    assert extractor.extract("Les lieux loués sont sis à 94300 Vincennes.").data["city"] == "Vincennes"
+    # the name of the table, as the market data is looked up by it
+    data = extractor.extract("Les locaux sis 5 rue Neuve, 91370 Verrières-le-Buisson.").data
+    assert data["city"] == "Verrieres-le-buisson"
+    assert data["address"] == "5 rue Neuve, 91370 Verrières-le-Buisson"
+    assert extractor.extract("Locaux situés à 78690 ST REMY L'HONORE.").data["city"] == "Saint-remy-l'honore"
+    # not a commune of the table: left to the LLM
+    assert "city" not in extractor.extract("Les lieux loués sont sis à 69001 Lyon.").data
+    assert normalize_commune("St Rémy l’Honoré") == "saint-remy-l'honore"
+
+
+def test_snippets_around_cues_of_missing_fields(extractor):
+
+    text = "Préambule. " * 100 + "La superficie sera mesurée contradictoirement." + " Divers." * 100
+
+    snippets = extractor.snippets(text, ["surface"], max_chars=1000)
+
+    assert "La superficie sera mesurée contradictoirement." in snippets
+    assert len(snippets) <= 1000
+    assert extractor.snippets(text, ["annual_rent"], max_chars=1000) == ""
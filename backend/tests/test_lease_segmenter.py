@@ -0,0 +1,100 @@
+from app.services.lease_segmenter import LeaseSegmenter
+
+LEASE = """BAIL COMMERCIAL
+Entre la SCI des Lilas, bailleur, et la SARL Boulangerie Martin, preneur.
+
+ARTICLE 1 - DÉSIGNATION
+Locaux situés 3 rue de la Paix, 75002 Paris, d'une surface de 120 m².
+
+ARTICLE 2 - DURÉE
+Le bail est consenti pour neuf années entières à compter du 1er janvier 2020.
+Article 5 du présent bail s'applique en cas de retard.
+
+Article 3 : Loyer
+Le loyer annuel est fixé à 24 000 euros hors taxes.
+1) le preneur paiera par trimestre
+
+4. INDEXATION
+Le loyer sera indexé chaque année sur les indices ILC publiés par l'INSEE.
+
+ARTICLE 5 - CLAUSE RÉSOLUTOIRE
+A défaut de paiement d'un seul terme, le bail sera résilié de plein droit.
+"""
+
+
+def test_sections_and_keyword_index():
+
+    segmentation = LeaseSegmenter().segment(LEASE)
+
+    assert [(section.number, section.title) for section in segmentation.sections] == [
+        (None, "Préambule"),
+        ("1", "ARTICLE 1 - DÉSIGNATION"),
+        ("2", "ARTICLE 2 - DURÉE"),
+        ("3", "Article 3 : Loyer"),
+        ("4", "4. INDEXATION"),
+        ("5", "ARTICLE 5 - CLAUSE RÉSOLUTOIRE")
+    ]
+    # sentence and list item starting with a number stay in their section
+    assert "Article 5 du présent bail" in segmentation.sections[2].text
+    assert "1) le preneur" in segmentation.sections[3].text
+
+    # inflected forms are indexed under their keyword
+    assert segmentation.keyword_index["indice"] == [4]
+    assert segmentation.keyword_index["situé"] == [1]
+    assert [section.index for section in segmentation.sections_for("indexation")] == [4]
+
+
+def test_context_only_contains_relevant_sections():
+
+    segmentation = LeaseSegmenter().segment(LEASE)
+
+    indexation_context = segmentation.context_for("indexation", 3000)
+    assert indexation_context.startswith("4. INDEXATION")
+    assert "CLAUSE RÉSOLUTOIRE" not in indexation_context
+
+    basic_context = segmentation.context_for("basic_data", 3000)
+    assert "SCI des Lilas" in basic_context and "120 m²" in basic_context and "24 000 euros" in basic_context
+
+    # the token budget (about 4 characters per token) is respected
+    assert len(segmentation.context_for("basic_data", 25)) <= 100
+
+
+def test_unsegmented_text_falls_back_to_its_beginning():
+
+    segmentation = LeaseSegmenter().segment("Texte libre sans article ni mot clé. " * 20)
+
+    assert len(segmentation.sections) == 1
+    assert segmentation.context_for("indexation", 50) == ("Texte libre sans article ni mot clé. " * 20)[:200]
+
+
+def test_segmentation_cached_per_document():
+
+    segmenter = LeaseSegmenter(max_entries=1)
+
+    first = segmenter.segment(LEASE)
+    assert segmenter.segment(LEASE) is first
+
+    segmenter.segment("Autre bail")
+    assert segmenter.segment(LEASE) is not first
+    assert segmenter.stats() == {"hits": 1, "misses": 3, "entries": 1}
+
+
+def test_long_lease_chunks_cover_every_relevant_section():
+
+    lease = "\n".join(f"ARTICLE {number} - LOYER\nLe loyer du lot {number} est payable par trimestre. " + "x" * 300
+                      for number in range(1, 21))
+    segmentation = LeaseSegmenter().segment(lease)
+
+    # 20 sections of about 90 tokens, 2 per chunk of 200 tokens
+    chunks = segmentation.chunks_for("basic_data", max_tokens=200)
+    assert len(chunks) == 10
+    assert all(len(chunk) <= 200 * 4 + 2 for chunk in chunks)
+    assert "\n\n".join(chunks).count("ARTICLE") == 20
+
+    # fits in one prompt: a single context, as without map-reduce
+    assert len(segmentation.contexts_for("basic_data", max_tokens=5000, max_chunks=4)) == 1
+    assert len(segmentation.contexts_for("basic_data", max_tokens=200, max_chunks=4)) == 4
+    assert len(segmentation.contexts_for("basic_data", max_tokens=200)) == 1
+    # a lease shorter than the map-reduce threshold gets its best sections in one prompt
+    assert len(segmentation.contexts_for("basic_data", max_tokens=200, max_chunks=4, min_chars=len(lease) + 1)) == 1
+
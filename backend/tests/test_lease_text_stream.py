@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+
+from app.services.lease_text_stream import LeaseTextStream, text_chunks
+
+
+async def pages(count: int, produced: list, gate: asyncio.Event = None):
+    for page_num in range(count):
+        if gate is not None and page_num == 2:
+            await gate.wait()
+        produced.append(page_num)
+        yield f"page {page_num} " + "x" * 90
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_once_consumers_have_enough():
+
+    produced = []
+    stream = LeaseTextStream(pages(50, produced))
+    stream.require("basic_extraction", 250)
+    stream.require("legal_compliance", 150)
+
+    basic_text, compliance_text = await asyncio.gather(stream.text("basic_extraction"),
+                                                      stream.text("legal_compliance"))
+
+    assert len(basic_text) == 250
+    assert basic_text.startswith("page 0")
+    assert compliance_text == basic_text[:150]
+    await stream.close()
+
+    assert stream.stopped_early
+    assert len(produced) == 3
+
+
+@pytest.mark.asyncio
+async def test_consumer_starts_before_the_end_of_the_document():
+
+    produced = []
+    gate = asyncio.Event()
+    stream = LeaseTextStream(pages(5, produced, gate))
+    stream.require("basic_extraction", 150)
+    stream.require("enrichment", None)
+
+    # the first two pages are enough, while the rest of the document is still blocked
+    basic_text = await asyncio.wait_for(stream.text("basic_extraction"), timeout=1)
+    assert len(basic_text) == 150
+    assert produced == [0, 1]
+
+    gate.set()
+    full_text = await stream.text("enrichment")
+    assert full_text.split("\n")[-1].startswith("page 4")
+    assert not stream.stopped_early
+
+
+@pytest.mark.asyncio
+async def test_stream_error_raised_to_consumers():
+
+    async def failing_pages():
+        raise RuntimeError("extraction impossible")
+        yield
+
+    stream = LeaseTextStream(failing_pages())
+    stream.require("basic_extraction", 100)
+
+    with pytest.raises(RuntimeError):
+        await stream.text("basic_extraction")
+
+
+@pytest.mark.asyncio
+async def test_already_extracted_text():
+
+    stream = LeaseTextStream(text_chunks("Bail commercial"))
+    stream.require("basic_extraction", 4)
+
+    assert await stream.text("basic_extraction") == "Bail"
@@ -1,8 +1,10 @@
 import pytest
+import asyncio
 import json
 import os
 from unittest.mock import MagicMock
 from app.services.leaseboost_service import LeaseBoostService
+from app.config import Settings
 
 
 class TestLeaseBoostService:
@@ -68,6 +70,7 @@ class TestLeaseBoostService:
         mock.immediate_opportunity = "Révision possible +2000€/mois soit +24000€/an"
         mock.confidence_level = "85%"
         mock.comparable_count = 12
+        mock.is_fallback = False
         return mock
     
     @pytest.fixture
@@ -84,9 +87,10 @@ class TestLeaseBoostService:
             ]
         }
     
-    def test_extract_basic_lease_data_complete(self, service, complete_lease_with_data):
+    @pytest.mark.asyncio
+    async def test_extract_basic_lease_data_complete(self, service, complete_lease_with_data):
 
-        result = service._extract_basic_lease_data(complete_lease_with_data)
+        result = await service._extract_basic_lease_data(complete_lease_with_data)
 
         assert isinstance(result, dict)
 
@@ -106,9 +110,10 @@ class TestLeaseBoostService:
             assert isinstance(result['annual_rent'], (int, float))
             assert 50000 <= result['annual_rent'] <= 60000 # expected 54 000€
 
-    def test_extract_basic_lease_data_incomplete(self, service, partial_lease_without_data):
+    @pytest.mark.asyncio
+    async def test_extract_basic_lease_data_incomplete(self, service, partial_lease_without_data):
 
-        result = service._extract_basic_lease_data(partial_lease_without_data)
+        result = await service._extract_basic_lease_data(partial_lease_without_data)
 
         assert isinstance(result, dict)
 
@@ -126,7 +131,8 @@ class TestLeaseBoostService:
                 assert value > 0
     
 
-    def test_perform_enriched_ai_analysis_complete_data(self, service, market_position_mock, legal_analysis_mock):
+    @pytest.mark.asyncio
+    async def test_perform_enriched_ai_analysis_complete_data(self, service, market_position_mock, legal_analysis_mock):
         lease_content = """
          BAIL COMMERCIAL - 123 rue de Rivoli, Paris
         
@@ -146,7 +152,7 @@ class TestLeaseBoostService:
             "annual_rent": 54000
         }
 
-        result = service._perform_enriched_ai_analysis(lease_content, basic_data, market_position_mock, legal_analysis_mock)
+        result = await service._perform_enriched_ai_analysis(lease_content, basic_data, market_position_mock, legal_analysis_mock)
 
         assert isinstance(result, dict)
         assert "opportunities" in result
@@ -169,7 +175,8 @@ class TestLeaseBoostService:
         assert isinstance(result["executive_summary"], str)
         assert len(result["executive_summary"]) > 20
   
-    def test_perform_enriched_ai_analysis_minimal_data(self, service):
+    @pytest.mark.asyncio
+    async def test_perform_enriched_ai_analysis_minimal_data(self, service):
 
         lease_content = "Bail commercial basique sans détails spécifiques"
 
@@ -193,7 +200,7 @@ class TestLeaseBoostService:
             "critical_deadlines": []
         }
         
-        result = service._perform_enriched_ai_analysis(
+        result = await service._perform_enriched_ai_analysis(
             lease_content, basic_data, market_position_mock, legal_analysis_mock
         )
 
@@ -208,13 +215,14 @@ class TestLeaseBoostService:
                                                             'non déterminé', 'non précis', 'non identifié', 'incomplet', 'limité',
             'absent', 'vide', 'sans', 'aucun', 'pas de', 'données manquantes'])
 
-    def test_integration_extract_and_analyze(self, service, complete_lease_with_data, market_position_mock, legal_analysis_mock):
+    @pytest.mark.asyncio
+    async def test_integration_extract_and_analyze(self, service, complete_lease_with_data, market_position_mock, legal_analysis_mock):
 
         # 1. Extract basic lease data
-        basic_data = service._extract_basic_lease_data(complete_lease_with_data)
+        basic_data = await service._extract_basic_lease_data(complete_lease_with_data)
 
         # 2. Perform enriched analysis
-        enriched_analysis = service._perform_enriched_ai_analysis(complete_lease_with_data, basic_data, market_position_mock, legal_analysis_mock)
+        enriched_analysis = await service._perform_enriched_ai_analysis(complete_lease_with_data, basic_data, market_position_mock, legal_analysis_mock)
 
 
 
@@ -227,7 +235,8 @@ class TestLeaseBoostService:
 
             assert isinstance(financial_metrics, dict)
 
-    def test_extract_basic_lease_data_malformed_json_handling(self, service):
+    @pytest.mark.asyncio
+    async def test_extract_basic_lease_data_malformed_json_handling(self, service):
 
         # Test with malformed JSON
         problematic_content = """
@@ -235,7 +244,7 @@ class TestLeaseBoostService:
         Et des montants ambigus: 1.500,50€ ou 1,500.50€
         Adresse avec virgules: 123, rue de la Paix, 2ème étage, 75001 Paris
         """
-        basic_data = service._extract_basic_lease_data(problematic_content)
+        basic_data = await service._extract_basic_lease_data(problematic_content)
 
         assert isinstance(basic_data, dict)
         
@@ -252,5 +261,163 @@ class TestLeaseBoostService:
                     assert isinstance(value, (int, float))
                     assert value > 0
 
+class TestAnalysisPipeline:
+
+    @pytest.fixture
+    def offline_service(self):
+        return LeaseBoostService(openai_api_key="sk-test-key")
+
+    @pytest.mark.asyncio
+    async def test_market_and_compliance_run_concurrently(self, offline_service, monkeypatch):
+
+        events = []
+        in_flight = set()
+        in_flight_at_market_start = set()
+        market_started = asyncio.Event()
+
+        async def extract(content):
+            events.append("basic_start")
+            await asyncio.sleep(0.1)
+            return {"city": "Paris", "address": "123 rue de Rivoli", "surface": 85.5, "annual_rent": 54000}
+
+        async def market(city, address, surface, current_rent=None):
+            in_flight_at_market_start.update(in_flight)
+            market_started.set()
+            await asyncio.sleep(0.1)
+            return "market_position"
+
+        async def compliance(content):
+            events.append("compliance_start")
+            in_flight.add("legal_compliance")
+            try:
+                # still running when the market branch reaches the market intelligence
+                await market_started.wait()
+                await asyncio.sleep(0.2)
+            finally:
+                in_flight.discard("legal_compliance")
+            return {"legal_alerts": [], "critical_deadlines": [], "compliance_score": "95% - Excellent"}
+
+        async def enrich(content, basic_data, market_position, legal_compliance):
+            events.append("enrichment_start")
+            assert market_position == "market_position"
+            assert legal_compliance["compliance_score"] == "95% - Excellent"
+            return {}
+
+        monkeypatch.setattr(offline_service, "_extract_basic_lease_data", extract)
+        monkeypatch.setattr(offline_service.market_intelligence_service, "get_market_position", market)
+        monkeypatch.setattr(offline_service.legal_compliance_service, "analyze_compliance", compliance)
+        monkeypatch.setattr(offline_service, "_perform_enriched_ai_analysis", enrich)
+        monkeypatch.setattr(offline_service, "_build_complete_analysis",
+                            lambda market_position, legal_analysis, ai_analysis, basic_data: "analysis")
+
+        # compliance waits for the market intelligence, run one after the other they would never end
+        result = await asyncio.wait_for(offline_service.analyze_lease("Bail", "bail.pdf"), timeout=5)
+
+        assert result == "analysis"
+        assert in_flight_at_market_start == {"legal_compliance"}
+        assert set(events[:2]) == {"basic_start", "compliance_start"}
+        assert events[-1] == "enrichment_start"
+
+        stats = offline_service.get_stage_timing_stats()
+        assert set(stats) == {"basic_extraction", "market_intelligence", "market_branch", "legal_compliance", "enrichment"}
+        assert all(stage["count"] == 1 for stage in stats.values())
+        assert stats["legal_compliance"]["avg_seconds"] >= 0.2
+
+    @pytest.mark.asyncio
+    async def test_degraded_stages_reported(self, offline_service, monkeypatch):
+
+        async def extract(content):
+            return {"city": None, "address": None, "surface": None, "annual_rent": None}
+
+        async def market(city, address, surface, current_rent=None):
+            return offline_service.market_intelligence_service._create_fallback_market_position("No comparables found")
+
+        async def compliance(content):
+            return {"legal_alerts": [], "critical_deadlines": [], "compliance_score": "N/A - Vérification incomplète",
+                    "failed_checks": ["clauses"]}
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            raise RuntimeError("LLM unavailable")
+
+        monkeypatch.setattr(offline_service, "_extract_basic_lease_data", extract)
+        monkeypatch.setattr(offline_service.market_intelligence_service, "get_market_position", market)
+        monkeypatch.setattr(offline_service.legal_compliance_service, "analyze_compliance", compliance)
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", chat)
+
+        result = await offline_service.analyze_lease("Bail", "bail.pdf")
+
+        assert result.degraded_stages == ["legal_compliance.clauses", "market_intelligence", "enrichment"]
+
+    @pytest.mark.asyncio
+    async def test_basic_data_merged_from_long_lease_chunks(self, offline_service, monkeypatch):
+
+        monkeypatch.setattr(Settings, "lease_context_tokens", {**Settings.lease_context_tokens, "basic_data": 200})
+        monkeypatch.setattr(Settings, "map_reduce_min_chars", 0)
+        # the LLM reads every chunk
+        monkeypatch.setattr(Settings, "basic_data_heuristics_enabled", False)
+
+        lease = "\n".join(f"ARTICLE {number} - LOYER\nLe loyer du lot {number} est payable par trimestre. {'x' * 600}"
+                          for number in range(1, 4))
+
+        answers = {
+            "lot 1": {"city": "Paris", "address": None, "surface": None, "annual_rent": 24000},
+            "lot 2": {"city": "Lyon", "address": "3 rue de la Paix", "surface": None, "annual_rent": 30000},
+            "lot 3": {"city": None, "address": None, "surface": 120, "annual_rent": None}
+        }
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            lot = next(lot for lot in answers if f"du {lot} " in user_prompt)
+            return json.dumps(answers[lot])
+
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", chat)
+
+        basic_data = await offline_service._extract_basic_lease_data(lease)
+
+        # first value found in document order
+        assert basic_data == {"city": "Paris", "address": "3 rue de la Paix", "surface": 120.0, "annual_rent": 24000.0}
+
+
+    @pytest.mark.asyncio
+    async def test_basic_data_read_without_llm(self, offline_service, monkeypatch):
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            raise AssertionError("the LLM should not be called")
+
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", chat)
+
+        lease = ("Article 1 - Désignation\nLocaux commerciaux situés au 123 rue de Rivoli, 75001 Paris, "
+                 "d'une superficie de 85,50 m².\nArticle 2 - Loyer\nLe loyer mensuel est fixé à 4 500 euros hors taxes.\n")
+
+        assert await offline_service._extract_basic_lease_data(lease) == {
+            "surface": 85.5, "annual_rent": 54000.0, "address": "123 rue de Rivoli, 75001 Paris",
+            "city": "Paris-1er-arrondissement"
+        }
+
+    @pytest.mark.asyncio
+    async def test_llm_asked_for_missing_fields_only(self, offline_service, monkeypatch):
+
+        prompts = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            prompts.append(user_prompt)
+            return json.dumps({"surface": 40, "annual_rent": 1})
+
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", chat)
+
+        lease = ("Article 1 - Désignation\nLes locaux sis 3 rue Haute, 93700 Drancy. La surface utile est de quarante "
+                 "mètres.\n" + "Article 2 - Divers\nStipulation sans rapport.\n" * 50 +
+                 "Article 60 - Loyer\nLe loyer annuel est de 10 000 €.\n")
+
+        basic_data = await offline_service._extract_basic_lease_data(lease)
+
+        assert basic_data == {"surface": 40.0, "annual_rent": 10000.0, "address": "3 rue Haute, 93700 Drancy",
+                              "city": "Drancy"}
+        assert len(prompts) == 1
+        assert '"surface"' in prompts[0] and '"annual_rent"' not in prompts[0]
+        # only the passage around the surface is sent
+        assert "La surface utile est de quarante" in prompts[0]
+        assert "Article 60" not in prompts[0]
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-s"])
\ No newline at end of file
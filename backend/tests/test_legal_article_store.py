@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+import json
+import time
+from app.services.legal_article_store import LegalArticleStore
+
+
+class FakeLegifrance:
+
+    def __init__(self, available: bool = True, delay: float = 0.0):
+        self.available = available
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def fetch(self, article: str):
+        self.calls.append(article)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        if not self.available:
+            return None
+        return f"Texte de l'article {article} version {len(self.calls)}"
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "legal_articles.json")
+
+
+@pytest.mark.asyncio
+async def test_warm_fetches_concurrently_and_persists(store_path):
+
+    legifrance = FakeLegifrance(delay=0.1)
+    store = LegalArticleStore(store_path=store_path)
+
+    await store.warm(["L145-4", "L145-47", "L145-4", "L145-38"], legifrance.fetch)
+
+    assert sorted(legifrance.calls) == ["L145-38", "L145-4", "L145-47"]
+    assert legifrance.max_running == 3
+
+    with open(store_path, encoding="utf-8") as store_file:
+        data = json.load(store_file)
+    assert data["version"] == LegalArticleStore.STORE_VERSION
+    assert set(data["articles"]) == {"L145-4", "L145-47", "L145-38"}
+
+    # a new process reads the articles from disk without calling LegiFrance
+    reloaded = LegalArticleStore(store_path=store_path)
+    offline = FakeLegifrance(available=False)
+    assert "L145-47" in await reloaded.get("L145-47", offline.fetch)
+    assert offline.calls == []
+
+
+@pytest.mark.asyncio
+async def test_stale_article_served_and_revalidated_in_background(store_path):
+
+    legifrance = FakeLegifrance()
+    store = LegalArticleStore(store_path=store_path, ttl_seconds=60)
+    await store.warm(["L145-4"], legifrance.fetch)
+
+    store.articles["L145-4"]["fetched_at"] = time.time() - 120
+
+    text = await store.get("L145-4", legifrance.fetch)
+    assert text.endswith("version 1")
+
+    await store._pending_fetches["L145-4"]
+    assert (await store.get("L145-4", legifrance.fetch)).endswith("version 2")
+
+
+@pytest.mark.asyncio
+async def test_api_down_keeps_previous_version(store_path):
+
+    store = LegalArticleStore(store_path=store_path, ttl_seconds=0)
+    await store.warm(["L145-16"], FakeLegifrance().fetch)
+
+    offline = FakeLegifrance(available=False)
+    await store.warm(["L145-16"], offline.fetch)
+
+    assert offline.calls == ["L145-16"]
+    assert "L145-16" in await store.get("L145-16", offline.fetch)
+    assert await store.get("L145-40", offline.fetch) is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_gets_share_one_fetch(store_path):
+
+    legifrance = FakeLegifrance(delay=0.05)
+    store = LegalArticleStore(store_path=store_path)
+
+    texts = await asyncio.gather(*[store.get("L145-1", legifrance.fetch) for _ in range(5)])
+
+    assert len(set(texts)) == 1
+    assert legifrance.calls == ["L145-1"]
@@ -1,9 +1,11 @@
 import pytest
+import asyncio
 import json
 import os
 from datetime import datetime, timedelta
 from app.services.legal_compliance import LegalComplianceService, LegalComplianceConfig, create_legal_compliance_service
 from app.models.schemas import LegalAlert, CriticalDeadline
+from app.config import Settings
 
 
 
@@ -343,4 +345,447 @@ class TestPerformanceReal:
 
         indexation_alerts = [a for a in result["legal_alerts"] if "indexation" in a.type]
 
-        assert isinstance(indexation_alerts, list)
\ No newline at end of file
+        assert isinstance(indexation_alerts, list)
+
+class TestComplianceConcurrency:
+
+    @pytest.fixture
+    def offline_service(self):
+        return LegalComplianceService(openai_api_key="sk-test-key")
+
+    @pytest.mark.asyncio
+    async def test_checks_run_concurrently(self, offline_service, monkeypatch):
+
+        in_flight = 0
+        peak_in_flight = 0
+        all_started = asyncio.Event()
+
+        async def check_running():
+            nonlocal in_flight, peak_in_flight
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            if in_flight == 3:
+                all_started.set()
+            try:
+                # each check waits for the others, run one after the other they would never end
+                await all_started.wait()
+            finally:
+                in_flight -= 1
+
+        async def slow_indexation(content):
+            await check_running()
+            return [LegalAlert(severity="HIGH", type="Indexation obsolète", description="ICC",
+                               legal_reference="Décret n°2022-1267", action_required="Notifier")]
+
+        async def slow_deadlines(content):
+            await check_running()
+            return []
+
+        async def slow_clauses(content, deadline=None):
+            await check_running()
+            return [], []
+
+        monkeypatch.setattr(offline_service, "_check_indexation_compliance", slow_indexation)
+        monkeypatch.setattr(offline_service, "_extract_critical_deadlines", slow_deadlines)
+        monkeypatch.setattr(offline_service, "_check_problematic_clauses", slow_clauses)
+
+        result = await asyncio.wait_for(offline_service.analyze_compliance("Bail test"), timeout=5)
+
+        assert peak_in_flight == 3
+        assert len(result["legal_alerts"]) == 1
+        assert len(result) == 4
+        assert result["failed_checks"] == []
+
+    @pytest.mark.asyncio
+    async def test_partial_results_on_failure_and_timeout(self, offline_service, monkeypatch):
+
+        async def failing_indexation(content):
+            raise RuntimeError("LLM unavailable")
+
+        async def hanging_deadlines(content):
+            await asyncio.sleep(10)
+            return []
+
+        async def clauses(content, deadline=None):
+            return [LegalAlert(severity="MEDIUM", type="Clause problématique", description="Résiliation",
+                               legal_reference="L145-4", action_required="Réviser")], []
+
+        monkeypatch.setattr(offline_service, "_check_indexation_compliance", failing_indexation)
+        monkeypatch.setattr(offline_service, "_extract_critical_deadlines", hanging_deadlines)
+        monkeypatch.setattr(offline_service, "_check_problematic_clauses", clauses)
+        monkeypatch.setitem(Settings.compliance_check_timeouts, "deadlines", 0.1)
+
+        result = await offline_service.analyze_compliance("Bail test")
+
+        assert result["critical_deadlines"] == []
+        assert len(result["legal_alerts"]) == 1
+        assert result["legal_alerts"][0].type == "Clause problématique"
+        assert result["failed_checks"] == ["indexation", "deadlines"]
+        # the alerts of the failed indexation check are missing
+        assert result["compliance_score"] == "N/A - Vérification incomplète"
+
+    @pytest.mark.asyncio
+    async def test_clause_verification_ends_within_the_check_timeout(self, offline_service, monkeypatch):
+
+        async def no_alerts(content):
+            return []
+
+        async def slow_extraction(content):
+            # most of the check timeout goes to the extraction
+            await asyncio.sleep(0.3)
+            return [{"type": "résiliation", "content": "0"}, {"type": "cession", "content": "1"}]
+
+        async def verify(clause):
+            if clause["content"] == "1":
+                await asyncio.sleep(10)
+            return {"is_problematic": True, "severity": "HIGH", "violation_type": "Clause problématique"}
+
+        monkeypatch.setattr(offline_service, "_check_indexation_compliance", no_alerts)
+        monkeypatch.setattr(offline_service, "_extract_critical_deadlines", no_alerts)
+        monkeypatch.setattr(offline_service, "_extract_clauses_with_ai", slow_extraction)
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", verify)
+        monkeypatch.setattr(Settings, "clause_verification_mode", "per_clause")
+        monkeypatch.setattr(Settings, "clause_verification_deadline_margin_seconds", 0.05)
+        monkeypatch.setitem(Settings.compliance_check_timeouts, "clauses", 0.5)
+
+        result = await offline_service.analyze_compliance("Bail test")
+
+        # the verdict obtained before the deadline of the check is kept, the skipped clause makes the check incomplete
+        assert [alert.type for alert in result["legal_alerts"]] == ["Clause problématique"]
+        assert result["failed_checks"] == ["clauses"]
+        assert result["compliance_score"] == "N/A - Vérification incomplète"
+
+    @pytest.mark.asyncio
+    async def test_clause_verification_bounded_and_ordered(self, offline_service, monkeypatch):
+
+        running = 0
+        max_running = 0
+
+        async def verify(clause):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            # later clauses finish first
+            await asyncio.sleep(0.05 * (6 - clause["index"]))
+            running -= 1
+            return {"is_problematic": True, "description": f"clause {clause['index']}"}
+
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", verify)
+        monkeypatch.setattr(Settings, "clause_verification_concurrency", 2)
+
+        clauses = [{"type": "résiliation", "content": "...", "index": i} for i in range(6)]
+        report = await offline_service._verify_clauses_in_parallel(clauses)
+
+        assert max_running == 2
+        assert report["skipped"] == []
+        assert [v["description"] for v in report["verifications"]] == [f"clause {i}" for i in range(6)]
+
+    @pytest.mark.asyncio
+    async def test_clause_verification_reports_skipped(self, offline_service, monkeypatch):
+
+        async def verify(clause):
+            if clause["content"] == "lente":
+                await asyncio.sleep(10)
+            return {"is_problematic": True, "description": clause["content"]}
+
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", verify)
+        monkeypatch.setattr(Settings, "clause_verification_timeout_seconds", 0.1)
+
+        clauses = [
+            {"type": "durée", "content": "rapide"},
+            {"type": "cession", "content": "lente"},
+            {"type": "garantie", "content": "rapide"}
+        ]
+        report = await offline_service._verify_clauses_in_parallel(clauses)
+
+        assert report["verifications"][1] is None
+        assert report["skipped"] == [{"index": 1, "type": "cession", "reason": "timeout"}]
+        assert report["verifications"][0]["description"] == "rapide"
+        assert report["verifications"][2]["description"] == "rapide"
+
+    @pytest.mark.asyncio
+    async def test_batch_verification_with_fallback(self, offline_service, monkeypatch):
+
+        async def legal_context(clause_type):
+            return f"Article L145 - {clause_type}"
+
+        llm_calls = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            llm_calls.append(user_prompt)
+            # clause 1 is missing and clause 2 is invalid
+            return json.dumps({"verdicts": [
+                {"clause_index": 0, "is_problematic": True, "description": "batch 0"},
+                {"clause_index": 2, "is_problematic": "peut-être"},
+                {"clause_index": 3, "is_problematic": False}
+            ]})
+
+        per_clause_calls = []
+
+        async def verify(clause):
+            per_clause_calls.append(clause["content"])
+            return {"is_problematic": True, "description": f"fallback {clause['content']}"}
+
+        monkeypatch.setattr(offline_service, "_get_legal_context_from_legifrance", legal_context)
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", chat)
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", verify)
+
+        clauses = [{"type": "résiliation", "content": str(i)} for i in range(4)]
+        report = await offline_service._verify_clauses_in_batches(clauses)
+
+        assert len(llm_calls) == 1
+        assert sorted(per_clause_calls) == ["1", "2"]
+        assert [v["description"] if v["is_problematic"] else None for v in report["verifications"]] == [
+            "batch 0", "fallback 1", "fallback 2", None
+        ]
+        assert report["skipped"] == []
+
+    @pytest.mark.asyncio
+    async def test_batch_timeout_grows_with_the_batch(self, offline_service, monkeypatch):
+
+        async def legal_context(clause_type):
+            return f"Article L145 - {clause_type}"
+
+        async def slow_batch(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            # longer than the timeout of one clause, within the timeout of three
+            await asyncio.sleep(0.2)
+            return json.dumps({"verdicts": [{"clause_index": i, "is_problematic": False} for i in range(3)]})
+
+        per_clause_calls = []
+
+        async def verify(clause):
+            per_clause_calls.append(clause["content"])
+            return {"is_problematic": False}
+
+        monkeypatch.setattr(offline_service, "_get_legal_context_from_legifrance", legal_context)
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", slow_batch)
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", verify)
+        monkeypatch.setattr(Settings, "clause_verification_timeout_seconds", 0.1)
+
+        clauses = [{"type": "résiliation", "content": str(i)} for i in range(3)]
+        report = await offline_service._verify_clauses_in_batches(clauses)
+
+        assert per_clause_calls == []
+        assert [verdict["clause_index"] for verdict in report["verifications"]] == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_batch_and_fallback_share_the_time_budget(self, offline_service, monkeypatch):
+
+        async def legal_context(clause_type):
+            return f"Article L145 - {clause_type}"
+
+        async def hanging(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(offline_service, "_get_legal_context_from_legifrance", legal_context)
+        monkeypatch.setattr(offline_service.llm_gateway, "chat", hanging)
+        monkeypatch.setattr(offline_service, "_verify_clause_legality", hanging)
+        monkeypatch.setattr(Settings, "clause_verification_timeout_seconds", 0.25)
+        monkeypatch.setattr(Settings, "clause_verification_budget_seconds", 0.3)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        report = await offline_service._verify_clauses_in_batches([{"type": "résiliation", "content": "clause"}])
+
+        # the batch times out after 0.25 s, the fallback only gets the 0.05 s left
+        assert loop.time() - start < 0.45
+        assert report["verifications"] == [None]
+        assert report["skipped"] == [{"index": 0, "type": "résiliation", "reason": "timeout"}]
+
+    def test_clause_batches_fit_token_budget(self, offline_service, monkeypatch):
+
+        monkeypatch.setattr(Settings, "clause_batch_token_budget", 100)
+        monkeypatch.setattr(Settings, "clause_batch_max_size", 3)
+
+        clauses = [
+            {"type": "durée", "content": "x" * 200},
+            {"type": "durée", "content": "x" * 200},
+            {"type": "durée", "content": "x" * 40},
+            {"type": "durée", "content": "x" * 40},
+            {"type": "durée", "content": "x" * 40},
+            {"type": "durée", "content": "x" * 40},
+            {"type": "durée", "content": "x" * 1000}
+        ]
+
+        batches = offline_service._build_clause_batches(clauses)
+
+        assert batches == [[0], [1, 2, 3], [4, 5], [6]]
+
+
+class TestLeaseContextSelection:
+
+    @pytest.mark.asyncio
+    async def test_indexation_clause_found_after_the_first_pages(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+        # the prompt sent to the LLM is checked
+        monkeypatch.setattr(Settings, "indexation_fast_path_enabled", False)
+
+        lease = "BAIL COMMERCIAL\n" + "".join(
+            f"Article {number} - Stipulation\nCette clause ne contient rien de particulier.\n"
+            for number in range(1, 80)
+        ) + "Article 80 - Indexation\nLe loyer sera révisé selon l'ICC publié par l'INSEE.\n"
+        assert len(lease) > 4000
+
+        prompts = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            prompts.append(user_prompt)
+            return json.dumps({"indices_found": ["ICC"], "has_obsolete_indices": True, "obsolete_indices": ["ICC"]})
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        alerts = await service._check_indexation_compliance(lease)
+
+        assert "selon l'ICC publié par l'INSEE" in prompts[0]
+        # only the relevant section is sent
+        assert "Article 1 - Stipulation" not in prompts[0]
+        assert alerts[0].type == "Indexation obsolète"
+
+    @pytest.mark.asyncio
+    async def test_long_lease_map_reduce_merges_chunks(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+        monkeypatch.setattr(Settings, "lease_context_tokens", {**Settings.lease_context_tokens, "indexation": 200,
+                                                                "deadlines": 200})
+        monkeypatch.setattr(Settings, "map_reduce_concurrency", 2)
+        monkeypatch.setattr(Settings, "map_reduce_min_chars", 0)
+        monkeypatch.setattr(Settings, "indexation_fast_path_enabled", False)
+        monkeypatch.setattr(Settings, "deadline_engine_enabled", False)
+
+        lease = "BAIL COMMERCIAL\n" + "".join(
+            f"Article {number} - Indexation\nLe loyer du lot {number} est indexé sur l'indice {index}. {'x' * 600}\n"
+            for number, index in enumerate(["ICC", "ILC", "ICC", "ICT"], start=1)
+        )
+
+        running = 0
+        max_running = 0
+        prompts = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            prompts.append(user_prompt)
+            if "échéances" in user_prompt:
+                return json.dumps({"deadlines": [{"type": "Révision triennale", "date": "01/01/2099",
+                                                  "description": "révision", "urgency_level": "LOW"}]})
+            found = [index for index in ("ICC", "ILC", "ICT") if f"l'indice {index}" in user_prompt]
+            obsolete = [index for index in found if index != "ILC"]
+            return json.dumps({"indices_found": found, "has_obsolete_indices": bool(obsolete),
+                               "obsolete_indices": obsolete})
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        alerts = await service._check_indexation_compliance(lease)
+
+        # one prompt per article, at most 2 at a time, every article read
+        assert len(prompts) == 4
+        assert max_running == 2
+        assert alerts[0].description == "Indices obsolètes détectés: ICC, ICT"
+
+        deadlines = await service._extract_critical_deadlines(lease)
+        # the same deadline found in every chunk is reported once
+        assert [deadline.type for deadline in deadlines] == ["Révision triennale"]
+
+
+class TestIndexationFastPath:
+
+    @pytest.mark.asyncio
+    async def test_clear_clause_decided_without_llm(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            raise AssertionError("the LLM should not be called")
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        lease = ("Article 4 - Indexation\nLe loyer sera révisé chaque année selon l'indice du coût "
+                 "de la construction publié par l'INSEE.\n")
+        alerts = await service._check_indexation_compliance(lease)
+
+        assert len(alerts) == 1
+        assert alerts[0].type == "Indexation obsolète"
+        assert alerts[0].severity == "HIGH"
+        assert alerts[0].description == "Indices obsolètes détectés: ICC"
+        assert alerts[0].legal_reference == "Décret n°2022-1267 du 30 septembre 2022"
+        assert await service._check_indexation_compliance("Le loyer est indexé sur l'ILAT.") == []
+        assert service.indexation_detector.stats()["decided"] == 2
+
+    @pytest.mark.asyncio
+    async def test_negated_clause_escalated_to_llm(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+        prompts = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            prompts.append(user_prompt)
+            return json.dumps({"indices_found": ["ILAT"], "has_obsolete_indices": False, "obsolete_indices": []})
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        lease = "Article 4 - Indexation\nEn remplacement de l'ICC, le loyer est désormais indexé sur l'ILAT.\n"
+        alerts = await service._check_indexation_compliance(lease)
+
+        assert alerts == []
+        assert len(prompts) == 1
+        assert service.indexation_detector.stats() == {"decided": 0, "escalated": 1, "decided_ratio": 0.0}
+
+
+class TestDeadlineEngineIntegration:
+
+    @pytest.mark.asyncio
+    async def test_deadlines_computed_from_extracted_dates(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+        prompts = []
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            prompts.append(user_prompt)
+            return json.dumps({"start_date": "01/01/2030", "duration_years": 9})
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        # the start date is not written as a date: the LLM is asked
+        lease = "Article 3 - Durée\nLe bail prend effet à la livraison des locaux prévue en début d'année 2030.\n"
+        deadlines = await service._extract_critical_deadlines(lease)
+
+        assert len(prompts) == 1
+        assert [(deadline.type, deadline.date) for deadline in deadlines] == [
+            ("Révision triennale", "03/10/2032"),
+            ("Révision triennale", "03/10/2035"),
+            ("Congé / demande de renouvellement", "01/07/2038"),
+            ("Échéance du bail", "01/01/2039")
+        ]
+
+    @pytest.mark.asyncio
+    async def test_no_deadline_without_start_date(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            return json.dumps({"start_date": None, "duration_years": 9})
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        assert await service._extract_critical_deadlines("Article 3 - Durée\nNeuf années.\n") == []
+
+    @pytest.mark.asyncio
+    async def test_dates_read_without_llm(self, monkeypatch):
+
+        service = LegalComplianceService(openai_api_key="sk-test-key")
+
+        async def chat(system_prompt, user_prompt, temperature=0.1, max_tokens=500):
+            raise AssertionError("the LLM should not be called")
+
+        monkeypatch.setattr(service.llm_gateway, "chat", chat)
+
+        lease = ("Article 3 - Durée\nLe présent bail est consenti pour une durée de neuf (9) années entières "
+                 "et consécutives, à compter du 1er janvier 2030.\n")
+        deadlines = await service._extract_critical_deadlines(lease)
+
+        assert [deadline.date for deadline in deadlines] == ["03/10/2032", "03/10/2035", "01/07/2038", "01/01/2039"]
+
@@ -0,0 +1,117 @@
+import pytest
+import asyncio
+import time
+import httpx
+from app.services.legifrance_token_manager import LegifranceTokenManager
+from app.services.legal_compliance import LegalComplianceService
+from app.services.legal_article_store import LegalArticleStore
+from app.utils.http_client import HttpClientRegistry
+
+
+class FakeOAuthServer:
+
+    def __init__(self, expires_in: int = 3600, delay: float = 0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return httpx.Response(200, json={"access_token": f"token-{self.calls}", "expires_in": self.expires_in})
+
+
+@pytest.fixture
+def oauth_server():
+    return FakeOAuthServer()
+
+
+@pytest.fixture
+def manager(oauth_server):
+    registry = HttpClientRegistry(transport=httpx.MockTransport(oauth_server.handler))
+    return LegifranceTokenManager(client_id="client-id", client_secret="client-secret",
+                                  http_client_registry=registry)
+
+
+@pytest.mark.asyncio
+async def test_token_is_cached(manager, oauth_server):
+
+    first = await manager.get_token()
+    second = await manager.get_token()
+
+    assert first == second == "token-1"
+    assert oauth_server.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_refresh(manager, oauth_server):
+
+    oauth_server.delay = 0.1
+
+    tokens = await asyncio.gather(*[manager.get_token() for _ in range(10)])
+
+    assert set(tokens) == {"token-1"}
+    assert oauth_server.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_ahead_of_expiry_in_background(manager, oauth_server):
+
+    await manager.get_token()
+
+    # token enters the refresh margin: the current token is still served
+    manager._expires_at = time.monotonic() + manager.refresh_margin_seconds / 2
+    token = await manager.get_token()
+    assert token == "token-1"
+
+    await manager._refresh_task
+    assert oauth_server.calls == 2
+    assert await manager.get_token() == "token-2"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_only_the_rejected_token(manager, oauth_server):
+
+    await manager.get_token()
+
+    manager.invalidate("some-older-token")
+    assert await manager.get_token() == "token-1"
+
+    manager.invalidate("token-1")
+    manager.invalidate("token-1")
+    assert await manager.get_token() == "token-2"
+    assert oauth_server.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_missing_credentials():
+
+    manager = LegifranceTokenManager(client_id=None, client_secret=None)
+
+    assert await manager.get_token() is None
+
+
+@pytest.mark.asyncio
+async def test_search_retries_once_after_401(oauth_server, monkeypatch, tmp_path):
+
+    registry = HttpClientRegistry(transport=httpx.MockTransport(oauth_server.handler))
+    service = LegalComplianceService(openai_api_key="sk-test-key", legifrance_client_id="client-id",
+                                     legifrance_client_secret="client-secret", http_client_registry=registry,
+                                     legal_article_store=LegalArticleStore(store_path=str(tmp_path / "articles.json")))
+    used_tokens = []
+
+    async def search(client, token, article):
+        used_tokens.append(token)
+        if token == "token-1":
+            return httpx.Response(401, request=httpx.Request("POST", "https://api.piste.gouv.fr"))
+        return httpx.Response(200, json={"results": [{"text": "Texte de l'article"}]},
+                              request=httpx.Request("POST", "https://api.piste.gouv.fr"))
+
+    monkeypatch.setattr(service, "_search_legifrance_article", search)
+
+    context = await service._get_legal_context_from_legifrance("résiliation")
+
+    assert used_tokens == ["token-1", "token-2"]
+    assert "Texte de l'article" in context
+    assert "L145-4" in context
+
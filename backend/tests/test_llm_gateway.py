@@ -0,0 +1,189 @@
+import pytest
+import asyncio
+import httpx
+from unittest.mock import AsyncMock, MagicMock
+from app.services import llm_gateway
+from app.services.llm_gateway import LLMGateway
+from app.services.llm_response_cache import LLMResponseCache, llm_cache_bypass
+from app.config import Settings
+
+
+def _mock_completion(content: str):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    return response
+
+
+@pytest.fixture
+def gateway():
+    return LLMGateway(openai_api_key="sk-test-key", response_cache=LLMResponseCache(disk_dir=""))
+
+
+@pytest.mark.asyncio
+async def test_chat_returns_content(gateway):
+
+    gateway.openai_client.chat.completions.create = AsyncMock(return_value=_mock_completion('{"ok": true}'))
+
+    result = await gateway.chat("system", "user", temperature=0.1, max_tokens=50)
+
+    assert result == '{"ok": true}'
+
+    kwargs = gateway.openai_client.chat.completions.create.call_args.kwargs
+    assert kwargs["model"] == Settings.openai_model
+    assert kwargs["max_tokens"] == 50
+    assert kwargs["messages"][0] == {"role": "system", "content": "system"}
+    assert kwargs["messages"][1] == {"role": "user", "content": "user"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_chats_share_the_pooled_client():
+
+    in_flight = 0
+    peak_in_flight = 0
+    all_sent = asyncio.Event()
+
+    async def completions_api(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak_in_flight
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        if in_flight == 5:
+            all_sent.set()
+        try:
+            # every answer waits for the 5 requests, sent one after the other they would never end
+            await all_sent.wait()
+        finally:
+            in_flight -= 1
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": Settings.openai_model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{}"}}]
+        })
+
+    # the OpenAI client sends its requests through the http client of the gateway
+    gateway = LLMGateway(openai_api_key="sk-test-key", response_cache=LLMResponseCache(disk_dir=""),
+                         transport=httpx.MockTransport(completions_api))
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*[gateway.chat("system", f"prompt {i}") for i in range(5)]), timeout=5
+        )
+    finally:
+        await gateway.aclose()
+
+    assert results == ["{}"] * 5
+    assert peak_in_flight == 5
+
+
+@pytest.mark.parametrize("h2_installed", [True, False])
+def test_pooled_client_uses_http2_when_available(monkeypatch, h2_installed):
+
+    client_options = {}
+
+    class SpyClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            client_options.update(kwargs)
+            # h2 may be missing here, the client is created without it
+            super().__init__(**{**kwargs, "http2": False})
+
+    monkeypatch.setattr(llm_gateway, "http2_available", lambda: h2_installed)
+    monkeypatch.setattr(llm_gateway.httpx, "AsyncClient", SpyClient)
+
+    LLMGateway(openai_api_key="sk-test-key", response_cache=LLMResponseCache(disk_dir=""))
+
+    assert client_options["http2"] is h2_installed
+    assert client_options["limits"].max_connections == Settings.llm_max_connections
+    assert client_options["limits"].max_keepalive_connections == Settings.llm_max_keepalive_connections
+
+
+@pytest.mark.asyncio
+async def test_aclose(gateway):
+
+    await gateway.aclose()
+
+    assert gateway.http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_identical_prompts_use_cache(gateway):
+
+    gateway.openai_client.chat.completions.create = AsyncMock(return_value=_mock_completion('{"city": "Paris"}'))
+
+    first = await gateway.chat("system", "bail", max_tokens=50)
+    second = await gateway.chat("system", "bail", max_tokens=50)
+    other_params = await gateway.chat("system", "bail", max_tokens=60)
+
+    assert first == second == other_params == '{"city": "Paris"}'
+    assert gateway.openai_client.chat.completions.create.call_count == 2
+    assert gateway.response_cache.stats()["memory_hits"] == 1
+    assert gateway.response_cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_bypass(gateway):
+
+    gateway.openai_client.chat.completions.create = AsyncMock(return_value=_mock_completion("{}"))
+
+    await gateway.chat("system", "bail")
+    await gateway.chat("system", "bail", use_cache=False)
+
+    token = llm_cache_bypass.set(True)
+    try:
+        await gateway.chat("system", "bail")
+    finally:
+        llm_cache_bypass.reset(token)
+
+    assert gateway.openai_client.chat.completions.create.call_count == 3
+
+
+class TestLLMResponseCache:
+
+    @pytest.mark.asyncio
+    async def test_memory_lru_eviction(self):
+
+        cache = LLMResponseCache(max_entries=2, disk_dir="")
+
+        await cache.set("a", "1")
+        await cache.set("b", "2")
+        await cache.get("a")
+        await cache.set("c", "3")
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "1"
+        assert await cache.get("c") == "3"
+
+    @pytest.mark.asyncio
+    async def test_disk_tier_and_size_eviction(self, tmp_path):
+
+        cache = LLMResponseCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=200)
+
+        await cache.set("first", "x" * 100)
+        await cache.set("second", "y" * 100)
+
+        # first was evicted from memory and from disk (over 200 bytes)
+        assert await cache.get("first") is None
+
+        restarted = LLMResponseCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=200)
+        assert await restarted.get("second") == "y" * 100
+        assert restarted.stats()["disk_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_disk_writes_keep_the_size_count(self, tmp_path):
+
+        cache = LLMResponseCache(max_entries=1, disk_dir=str(tmp_path), max_disk_bytes=2000)
+
+        # distinct and identical keys written from concurrent threads, with evictions
+        await asyncio.gather(*(cache.set(f"key-{i % 20}", "x" * (50 + i)) for i in range(100)))
+
+        on_disk = sum(path.stat().st_size for path in tmp_path.glob("*.json"))
+        assert cache.stats()["disk_bytes"] == on_disk
+        assert on_disk <= 2000
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_key_depends_on_every_input(self):
+
+        base = LLMResponseCache.make_key("model", "system", "user", temperature=0.1, max_tokens=500)
+
+        assert base == LLMResponseCache.make_key("model", "system", "user", max_tokens=500, temperature=0.1)
+        assert base != LLMResponseCache.make_key("other-model", "system", "user", temperature=0.1, max_tokens=500)
+        assert base != LLMResponseCache.make_key("model", "system 2", "user", temperature=0.1, max_tokens=500)
+        assert base != LLMResponseCache.make_key("model", "system", "user 2", temperature=0.1, max_tokens=500)
+        assert base != LLMResponseCache.make_key("model", "system", "user", temperature=0.2, max_tokens=500)
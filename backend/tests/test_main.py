@@ -0,0 +1,81 @@
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+from fastapi import BackgroundTasks, UploadFile
+
+from app.config import Settings
+
+LEASE_PDF = b"%PDF-1.4\n" + "Bail commercial entre les soussignés. ".encode() * 20
+
+
+@pytest.fixture
+def main_module(tmp_path, monkeypatch):
+    # the application logs to ./logs and needs an OpenAI key to build its client
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Settings, "openai_api_key", Settings.openai_api_key or "sk-test-key")
+    import app.main as main_module
+    monkeypatch.setattr(main_module.leaseboost_service, "get_market_data_version", lambda: None)
+    return main_module
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_first_request_keeps_the_shared_analysis(main_module, monkeypatch):
+
+    extraction_started = asyncio.Event()
+    release_extraction = asyncio.Event()
+
+    async def stream_text_chunks(file_content, filename, file_format=None):
+        extraction_started.set()
+        await release_extraction.wait()
+        # fails with "operation forbidden on released memoryview object" if the upload was closed
+        yield bytes(file_content)[len(b"%PDF-1.4\n"):].decode()
+
+    async def analyze_lease(text_stream, filename):
+        return SimpleNamespace(summary=f"analysis of {len(await text_stream.text('validation'))} characters",
+                               degraded_stages=[])
+
+    monkeypatch.setattr(main_module.document_parser, "stream_text_chunks", stream_text_chunks)
+    monkeypatch.setattr(main_module.leaseboost_service, "analyze_lease", analyze_lease)
+
+    def upload():
+        return UploadFile(file=io.BytesIO(LEASE_PDF), filename="bail.pdf")
+
+    first = asyncio.create_task(main_module._analyze_upload(upload(), BackgroundTasks(), False))
+    await extraction_started.wait()
+    second = asyncio.create_task(main_module._analyze_upload(upload(), BackgroundTasks(), False))
+    await asyncio.sleep(0.01)
+
+    # the request that started the analysis goes away while the second one waits for it
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    release_extraction.set()
+
+    assert (await second).summary == "analysis of 200 characters"
+    assert main_module.analysis_single_flight.stats()["coalesced"] >= 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("degraded_stages, cached", [([], True), (["legal_compliance.clauses"], False)])
+async def test_partial_analysis_not_cached(main_module, monkeypatch, degraded_stages, cached):
+
+    async def stream_text_chunks(file_content, filename, file_format=None):
+        yield bytes(file_content)[len(b"%PDF-1.4\n"):].decode()
+
+    async def analyze_lease(text_stream, filename):
+        return SimpleNamespace(degraded_stages=degraded_stages)
+
+    monkeypatch.setattr(main_module.document_parser, "stream_text_chunks", stream_text_chunks)
+    monkeypatch.setattr(main_module.leaseboost_service, "analyze_lease", analyze_lease)
+    monkeypatch.setattr(main_module.leaseboost_service, "get_market_data_version", lambda: 1)
+    monkeypatch.setattr(main_module, "analysis_result_cache", type(main_module.analysis_result_cache)())
+
+    lease = LEASE_PDF + b" " + "".join(degraded_stages).encode()
+    analysis = await main_module._analyze_upload(UploadFile(file=io.BytesIO(lease), filename="bail.pdf"),
+                                                 BackgroundTasks(), False)
+
+    cache = main_module.analysis_result_cache
+    key = cache.make_key(cache.hash_document(lease), 1, main_module.Settings.openai_model)
+    assert (cache.get(key) is analysis) is cached
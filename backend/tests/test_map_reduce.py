@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+
+from app.utils.map_reduce import dedupe, map_concurrently
+
+
+@pytest.mark.asyncio
+async def test_map_concurrently_keeps_order_and_limit():
+
+    running = 0
+    max_running = 0
+
+    async def double(item):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # later items finish first
+        await asyncio.sleep(0.01 * (5 - item))
+        running -= 1
+        if item == 3:
+            raise ValueError("chunk failed")
+        return item * 2
+
+    results = await map_concurrently([0, 1, 2, 3, 4], double, concurrency=2)
+
+    assert results == [0, 2, 4, None, 8]
+    assert max_running == 2
+
+
+def test_dedupe_keeps_first_occurrence():
+
+    items = [("ICC", 1), ("ilc", 2), ("icc", 3), ("ILC", 4)]
+    assert dedupe(items, key=lambda item: item[0].upper()) == [("ICC", 1), ("ilc", 2)]
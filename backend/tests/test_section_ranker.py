@@ -0,0 +1,56 @@
+from app.models.schemas import LeaseSection
+from app.services.lease_segmenter import LeaseSegmenter
+from app.services.section_ranker import BM25SectionRanker, stem_terms
+
+
+def sections(*texts):
+    return [LeaseSection(index=index, title=text.split("\n")[0], text=text, start=0)
+            for index, text in enumerate(texts)]
+
+
+def test_stemming_groups_inflected_forms():
+
+    assert stem_terms("L'indexation du loyer indexé") == ["index", "loyer", "index"]
+    assert stem_terms("résilié") == stem_terms("résiliation")
+
+
+def test_bm25_ranks_the_most_specific_section_first():
+
+    ranker = BM25SectionRanker(sections(
+        "ARTICLE 1 - DÉSIGNATION\nLocaux à usage de commerce, loyer payable par trimestre.",
+        "ARTICLE 2 - INDEXATION\nLe loyer est indexé chaque année sur l'indice ILC, indexation de plein droit.",
+        "ARTICLE 3 - CHARGES\nLes charges sont payées en sus du loyer.",
+        "ARTICLE 4 - DESTINATION\nActivité de boulangerie."
+    ))
+
+    ranked = ranker.rank("indexation indice ilc révision")
+
+    assert [section.index for section in ranked] == [1]
+
+    # the section repeating both terms first, the section without any of them is not returned
+    ranked = ranker.rank("loyer indexation")
+    assert ranked[0].index == 1
+    assert 3 not in [section.index for section in ranked]
+
+    # same frequency: the shorter sections first
+    assert [section.index for section in ranker.rank("loyer", top_k=2)] == [2, 0]
+
+
+def test_context_keeps_best_sections_within_token_budget():
+
+    filler = "Cette stipulation ne concerne que les parties communes. " * 30
+    lease = "\n".join(
+        [f"ARTICLE {number} - STIPULATION\n{filler}" for number in range(1, 40)]
+        + ["ARTICLE 40 - INDEXATION\nLe loyer sera indexé selon l'indice ILC publié par l'INSEE.",
+           "ARTICLE 41 - RÉVISION\nLa révision triennale du loyer suit l'article L145-38."]
+    )
+
+    segmentation = LeaseSegmenter().segment(lease)
+    context = segmentation.context_for("indexation", max_tokens=100, top_k=3)
+
+    assert "ARTICLE 40 - INDEXATION" in context
+    assert "ARTICLE 41 - RÉVISION" in context
+    # document order
+    assert context.index("ARTICLE 40") < context.index("ARTICLE 41")
+    assert "STIPULATION" not in context
+    assert len(context) <= 100 * 4
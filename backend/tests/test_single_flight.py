@@ -0,0 +1,87 @@
+import pytest
+import asyncio
+from app.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_computation():
+
+    single_flight = SingleFlight()
+    runs = 0
+
+    async def compute():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.05)
+        return "analysis"
+
+    results = await asyncio.gather(*[single_flight.run("hash", compute) for _ in range(3)])
+
+    assert results == ["analysis"] * 3
+    assert runs == 1
+    assert single_flight.stats() == {"in_flight": 0, "coalesced": 2}
+
+
+@pytest.mark.asyncio
+async def test_different_keys_run_separately():
+
+    single_flight = SingleFlight()
+    runs = []
+
+    async def compute(key):
+        runs.append(key)
+        await asyncio.sleep(0.01)
+        return key
+
+    results = await asyncio.gather(single_flight.run("a", lambda: compute("a")),
+                                   single_flight.run("b", lambda: compute("b")))
+
+    assert results == ["a", "b"]
+    assert sorted(runs) == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_shared_computation():
+
+    single_flight = SingleFlight()
+    finished = asyncio.Event()
+
+    async def compute():
+        await asyncio.sleep(0.1)
+        finished.set()
+        return "analysis"
+
+    first = asyncio.create_task(single_flight.run("hash", compute))
+    second = asyncio.create_task(single_flight.run("hash", compute))
+    await asyncio.sleep(0.01)
+
+    first.cancel()
+
+    assert await second == "analysis"
+    assert finished.is_set()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_key_released():
+
+    single_flight = SingleFlight()
+    runs = 0
+
+    async def failing():
+        nonlocal runs
+        runs += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("analysis failed")
+
+    results = await asyncio.gather(single_flight.run("hash", failing), single_flight.run("hash", failing),
+                                   return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert runs == 1
+
+    # the next request starts a new computation
+    with pytest.raises(ValueError):
+        await single_flight.run("hash", failing)
+    assert runs == 2
@@ -0,0 +1,87 @@
+import pytest
+
+from app.services.text_normalizer import LeaseTextNormalizer
+from app.utils.french_parser import find_durations
+
+
+def lease_page(page_num: int, body: str) -> str:
+    return (f"BAIL COMMERCIAL - SCI DES LILAS\n"
+            f"{body}\n"
+            f"Paraphes :          Page {page_num} / 3")
+
+
+def test_dehyphenation_and_whitespace():
+
+    normalizer = LeaseTextNormalizer()
+
+    text = normalizer.normalize_page("Le loyer   sera indexé  selon l'indice des loyers com-\nmerciaux.\n\n\n\nFin de l'article.")
+
+    assert text == "Le loyer sera indexé selon l'indice des loyers commerciaux.\n\nFin de l'article."
+    # a hyphen followed by an upper case word is kept
+    assert normalizer.normalize_page("SCI-\nDupont") == "SCI-\nDupont"
+
+
+def test_compound_words_keep_their_hyphen():
+
+    normalizer = LeaseTextNormalizer()
+
+    text = normalizer.normalize_page("La sous-\nlocation est interdite, sauf accord ci-\naprès.\n"
+                                     "Un préavis de dix-\nhuit mois est dû par celui-\nci pour la rési-\nliation.")
+
+    assert text == ("La sous-location est interdite, sauf accord ci-après.\n"
+                    "Un préavis de dix-huit mois est dû par celui-ci pour la résiliation.")
+    assert [duration.months for duration in find_durations(text)] == [18]
+
+
+def test_running_headers_footers_and_page_numbers_removed():
+
+    normalizer = LeaseTextNormalizer()
+    pages = [
+        lease_page(1, "ARTICLE 1 - DÉSIGNATION\nLocaux de 120 m²."),
+        lease_page(2, "ARTICLE 2 - DURÉE\nNeuf années entières.\n- 2 -"),
+        lease_page(3, "ARTICLE 3 - LOYER\n24 000 € HT par an.")
+    ]
+
+    text = normalizer.normalize_pages(pages)
+
+    # kept once, where it first appears
+    assert text.count("BAIL COMMERCIAL - SCI DES LILAS") == 1
+    assert text.count("Paraphes") == 1
+    assert "- 2 -" not in text
+    for heading in ("ARTICLE 1 - DÉSIGNATION", "ARTICLE 2 - DURÉE", "ARTICLE 3 - LOYER"):
+        assert heading in text
+
+    stats = normalizer.stats()
+    assert stats["chars_in"] == sum(len(page) for page in pages)
+    # the two page separators are not counted as normalized text
+    assert stats["chars_saved"] == stats["chars_in"] - (len(text) - 2)
+    assert stats["chars_saved"] > 0
+
+
+def test_numbers_alone_on_a_line_inside_the_page_are_kept():
+
+    normalizer = LeaseTextNormalizer()
+    page = ("BAIL COMMERCIAL\nARTICLE 2 - DURÉE\nLe bail prendra effet le 1er janvier\n2024\n"
+            "Surface :\n250\nm²\nFin de l'article.\nParaphes\n12")
+
+    text = normalizer.normalize_page(page)
+
+    assert "janvier\n2024" in text
+    assert "Surface :\n250\nm²" in text
+    assert not text.endswith("12")
+
+
+@pytest.mark.asyncio
+async def test_normalize_streamed_pages():
+
+    async def pages():
+        yield lease_page(1, "ARTICLE 1\nPremière page.")
+        yield "Page 2 / 3"
+        yield lease_page(3, "ARTICLE 3\nDernière page.")
+
+    normalizer = LeaseTextNormalizer()
+    chunks = [chunk async for chunk in normalizer.normalize_chunks(pages())]
+
+    # the page left empty is not streamed
+    assert len(chunks) == 2
+    assert chunks[1] == "ARTICLE 3\nDernière page."
@@ -0,0 +1,83 @@
+import io
+import pytest
+from fastapi import UploadFile
+
+from app.utils.upload_reader import read_upload, sniff_format, UploadFormatError, UploadTooLargeError
+
+
+class CountingUpload(UploadFile):
+    """ UploadFile counting the bytes actually read """
+
+    def __init__(self, content: bytes, filename: str):
+        super().__init__(file=io.BytesIO(content), filename=filename)
+        self.bytes_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = await super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def test_sniff_format():
+
+    assert sniff_format(b"%PDF-1.7\n...") == "pdf"
+    # some generators write a few bytes before the PDF header
+    assert sniff_format(b"\xef\xbb\xbf%PDF-1.4") == "pdf"
+    assert sniff_format(b"PK\x03\x04\x14\x00") == "docx"
+    assert sniff_format(b"<html>") is None
+
+
+@pytest.mark.asyncio
+async def test_small_upload_stays_in_memory():
+
+    content = b"%PDF-1.4\n" + b"x" * 1000
+    upload = await read_upload(CountingUpload(content, "bail.pdf"), max_bytes=10_000, chunk_size=256,
+                               spool_memory_bytes=4096)
+
+    try:
+        assert upload.file_format == "pdf"
+        assert upload.size == len(content)
+        assert not upload.on_disk
+        assert upload.view() == content
+    finally:
+        upload.close()
+
+
+@pytest.mark.asyncio
+async def test_large_upload_spooled_to_disk():
+
+    content = b"PK\x03\x04" + bytes(range(256)) * 100
+    upload = await read_upload(CountingUpload(content, "bail.docx"), max_bytes=100_000, chunk_size=1024,
+                               spool_memory_bytes=4096)
+
+    try:
+        assert upload.file_format == "docx"
+        assert upload.on_disk
+        assert upload.view() == content
+    finally:
+        upload.close()
+    # closing twice is harmless
+    upload.close()
+
+
+@pytest.mark.asyncio
+async def test_oversized_upload_rejected_while_reading():
+
+    file = CountingUpload(b"%PDF-1.4\n" + b"x" * 100_000, "bail.pdf")
+
+    with pytest.raises(UploadTooLargeError):
+        await read_upload(file, max_bytes=10_000, chunk_size=1024, spool_memory_bytes=4096)
+
+    # reading stopped at the first chunk over the limit
+    assert file.bytes_read <= 10_000 + 1024
+
+
+@pytest.mark.asyncio
+async def test_unknown_format_rejected_on_first_chunk():
+
+    file = CountingUpload(b"MZ\x90\x00" + b"\x00" * 10_000, "bail.pdf")
+
+    with pytest.raises(UploadFormatError):
+        await read_upload(file, max_bytes=100_000, chunk_size=1024)
+
+    assert file.bytes_read == 1024
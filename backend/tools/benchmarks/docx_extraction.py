@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+compare the in-memory DOCX extraction with the previous temporary file + docx2txt path
+
+usage (from backend/): python tools/benchmarks/docx_extraction.py [--paragraphs 2000] [--runs 20] [file.docx ...]
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import docx2txt
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.services.document_parser import extract_docx_text  # noqa: E402
+
+
+def temp_file_extraction(file_content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp_file:
+        tmp_file.write(file_content)
+        tmp_path = tmp_file.name
+    try:
+        return docx2txt.process(tmp_path).strip()
+    finally:
+        os.unlink(tmp_path)
+
+
+def in_memory_extraction(file_content: bytes) -> str:
+    text, _ = extract_docx_text(file_content)
+    return text
+
+
+def generated_lease(paragraphs: int) -> bytes:
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = "BAIL COMMERCIAL"
+    for i in range(paragraphs):
+        if i % 20 == 0:
+            doc.add_heading(f"ARTICLE {i // 20 + 1}", level=1)
+        doc.add_paragraph(f"Le loyer annuel est fixé à {24000 + i} euros hors taxes, indexé\tsur l'indice ILC "
+                          f"publié par l'INSEE, payable trimestriellement et d'avance.")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def measure(extraction, file_content: bytes, runs: int):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        extraction(file_content)
+        durations.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    extraction(file_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(durations), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DOCX extraction benchmark")
+    parser.add_argument("files", nargs="*", help="DOCX files, a generated lease is used by default")
+    parser.add_argument("--paragraphs", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = [(path, open(path, "rb").read()) for path in args.files] or \
+                [(f"generated ({args.paragraphs} paragraphs)", generated_lease(args.paragraphs))]
+
+    for name, file_content in documents:
+        same_text = temp_file_extraction(file_content) == in_memory_extraction(file_content)
+        print(f"{name}: {len(file_content) / 1024:.0f} KB, identical text: {same_text}")
+
+        for label, extraction in (("temp file + docx2txt", temp_file_extraction),
+                                  ("in-memory iterparse", in_memory_extraction)):
+            median, peak = measure(extraction, file_content, args.runs)
+            print(f"  {label:22} median {median * 1000:8.2f} ms   peak memory {peak / 1024:8.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+micro-benchmark of the french date, duration and amount parser over generated leases,
+checks that every generated value is found
+
+usage (from backend/): python tools/benchmarks/french_parser.py [--leases 200] [--articles 40] [--runs 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from app.utils.french_parser import find_amounts, find_dates, find_durations  # noqa: E402
+
+MONTH_NAMES = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre",
+               "novembre", "décembre"]
+DURATION_WORDS = {3: "trois", 6: "six", 9: "neuf", 10: "dix", 12: "douze", 18: "dix-huit", 24: "vingt-quatre"}
+FILLER = ("Le preneur s'engage à maintenir les lieux loués en bon état d'entretien et de réparations locatives, "
+          "conformément aux dispositions de l'article L145-40 du Code de commerce. ")
+
+
+def written_date(day: date, rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return day.strftime(rng.choice(["%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y"]))
+    day_text = "1er" if day.day == 1 else str(day.day)
+    return f"{day_text} {MONTH_NAMES[day.month - 1]} {day.year}"
+
+
+def written_duration(count: int, unit: str, rng: random.Random) -> str:
+    if count in DURATION_WORDS and rng.random() < 0.7:
+        return f"{DURATION_WORDS[count]} ({count}) {unit}" if rng.random() < 0.5 else f"{DURATION_WORDS[count]} {unit}"
+    return f"{count} {unit}"
+
+
+def written_amount(value: int, rng: random.Random) -> str:
+    thousands, units = divmod(value, 1000)
+    separator = rng.choice([" ", "\u00a0", "."])
+    integer = f"{thousands}{separator}{units:03d}" if thousands else str(units)
+    cents = rng.choice(["", ",00", ",50"])
+    return f"{integer}{cents} {rng.choice(['€', 'euros', 'EUR'])} {rng.choice(['HT', 'TTC', 'hors taxes', ''])}".strip()
+
+
+def generated_lease(articles: int, rng: random.Random):
+    """ lease text and the number of dates, durations and amounts written in it """
+
+    paragraphs = []
+    counts = {"dates": 0, "durations": 0, "amounts": 0}
+    for number in range(1, articles + 1):
+        start = date(2015, 1, 1) + timedelta(days=rng.randrange(4000))
+        paragraphs.append(
+            f"ARTICLE {number} - STIPULATIONS\n{FILLER * rng.randint(1, 4)}"
+            f"Cette clause prend effet à compter du {written_date(start, rng)} pour une durée de "
+            f"{written_duration(rng.choice([3, 6, 9, 10, 12]), rng.choice(['ans', 'années']), rng)}, avec un préavis de "
+            f"{written_duration(rng.choice([6, 18, 24]), 'mois', rng)}. Le loyer est fixé à "
+            f"{written_amount(rng.randrange(1000, 250000), rng)} par an."
+        )
+        counts["dates"] += 1
+        counts["durations"] += 2
+        counts["amounts"] += 1
+    return "\n\n".join(paragraphs), counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="French parser benchmark")
+    parser.add_argument("--leases", type=int, default=200)
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [generated_lease(args.articles, rng) for _ in range(args.leases)]
+    total_chars = sum(len(text) for text, _ in corpus)
+    print(f"{args.leases} generated leases, {total_chars / args.leases / 1000:.0f} K characters each")
+
+    for name, finder in (("dates", find_dates), ("durations", find_durations), ("amounts", find_amounts)):
+        found = sum(len(finder(text)) for text, _ in corpus)
+        expected = sum(counts[name] for _, counts in corpus)
+
+        durations = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            for text, _ in corpus:
+                finder(text)
+            durations.append(time.perf_counter() - start)
+        median = statistics.median(durations)
+
+        print(f"  {name:10} found {found}/{expected}   {median / args.leases * 1e6:8.0f} µs per lease   "
+              f"{total_chars / median / 1e6:6.1f} M characters/s")
+
+
+if __name__ == "__main__":
+    main()